@@ -31,6 +31,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "appointment",
     "rest_framework",
     "rest_framework_simplejwt.token_blacklist",
@@ -47,6 +48,24 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Opt-in request profiling, see appointment.profiling.ProfilingMiddleware.
+# The sample rate is the share of requests profiled (0.0 to 1.0).
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "False") == "True"
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 0.01))
+PROFILING_SLOW_QUERIES = int(os.getenv("PROFILING_SLOW_QUERIES", 3))
+if PROFILING_ENABLED:
+    MIDDLEWARE.insert(0, "appointment.profiling.ProfilingMiddleware")
+
+# Per-view Prometheus metrics, exposed on api/metrics/. Set
+# PROMETHEUS_MULTIPROC_DIR when running several gunicorn workers, and
+# METRICS_TOKEN to the token the scraper sends as "Authorization: Bearer
+# <token>". The endpoint is only mounted with METRICS_ENABLED and answers
+# 403 until a token is set.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "False") == "True"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+if METRICS_ENABLED:
+    MIDDLEWARE.insert(0, "appointment.metrics.MetricsMiddleware")
+
 ROOT_URLCONF = 'CareConnect.urls'
 
 TEMPLATES = [
@@ -77,6 +96,53 @@ DATABASES = {
     )
 }
 
+# Tests that need concurrent connections are skipped on SQLite's in-memory
+# test database; point this at a file to run them locally.
+if os.getenv("TEST_DATABASE_NAME"):
+    DATABASES["default"]["TEST"] = {"NAME": os.getenv("TEST_DATABASE_NAME")}
+
+# Read replicas, as a comma-separated list of database URLs. Views using
+# appointment.replicas.ReplicaReadMixin read from a healthy replica; a user
+# who wrote is pinned to the primary for REPLICA_PIN_SECONDS, and a replica
+# that refuses connections is skipped for REPLICA_RETRY_SECONDS. Reference
+# cache misses also read from the primary for REPLICA_PIN_SECONDS after an
+# invalidation, so keep the replication lag under it. The pins are stored in
+# the reference cache, which must be shared by all processes (check
+# appointment.E001). Without real replication, e.g. two local SQLite files,
+# create the replica's schema with "migrate --database replica1". Run the
+# test suite without replicas.
+REPLICA_DATABASES = []
+for number, url in enumerate(
+    filter(None, os.getenv("REPLICA_DATABASE_URLS", "").split(",")), start=1
+):
+    alias = f"replica{number}"
+    DATABASES[alias] = dj_database_url.parse(url)
+    DATABASES[alias]["TEST"] = {"MIRROR": "default"}
+    REPLICA_DATABASES.append(alias)
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", 5))
+REPLICA_RETRY_SECONDS = int(os.getenv("REPLICA_RETRY_SECONDS", 30))
+if REPLICA_DATABASES:
+    DATABASE_ROUTERS = ["appointment.replicas.ReplicaRouter"]
+    MIDDLEWARE.insert(0, "appointment.replicas.ReplicaRoutingMiddleware")
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Local memory by default; point CACHE_BACKEND/CACHE_LOCATION at a shared
+# backend (e.g. django.core.cache.backends.redis.RedisCache) in production.
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", "careconnect"),
+    }
+}
+
+# Cache used for doctor and specialization responses, see appointment.cache
+REFERENCE_CACHE_ALIAS = "default"
+REFERENCE_CACHE_TIMEOUT = int(os.getenv("REFERENCE_CACHE_TIMEOUT", 300))
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -131,14 +197,33 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = "appointment.User"
 
 ############################################## REST FRAMEWORK SETTINGS ##############################################
+# Opt-in: authorize from token claims instead of loading the user on every
+# request, see appointment.authentication.StatelessJWTAuthentication
+STATELESS_JWT_AUTH = os.getenv("STATELESS_JWT_AUTH", "False") == "True"
+# Seconds a user's active flag is trusted before it is re-read
+STATELESS_JWT_ACTIVE_TTL = int(os.getenv("STATELESS_JWT_ACTIVE_TTL", 60))
+
+# Threads hashing passwords for the async login endpoint, and how many
+# logins may wait for them before new ones are turned away with 429.
+LOGIN_HASH_WORKERS = int(os.getenv("LOGIN_HASH_WORKERS", 4))
+LOGIN_MAX_PENDING = int(os.getenv("LOGIN_MAX_PENDING", 64))
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "appointment.authentication.StatelessJWTAuthentication"
+        if STATELESS_JWT_AUTH
+        else "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 100
 }
 
+# Serve specialization doctor counts from the counter column kept up to date by
+# appointment.signals instead of annotating a COUNT on every list query.
+CACHED_SPECIALIZATION_DOCTOR_COUNT = (
+    os.getenv("CACHED_SPECIALIZATION_DOCTOR_COUNT", "False") == "True"
+)
+
 ############################################## SIMPLE JWT SETTINGS ##############################################
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=7),
@@ -150,6 +235,16 @@ SIMPLE_JWT = {
     "AUTH_HEADER_TYPES": ("Bearer",),
 }
 
+# Blacklisted refresh-token jtis remembered per process, so replayed tokens
+# are refused without a query (see appointment.tokens.BlacklistFilter)
+TOKEN_BLACKLIST_FILTER_SIZE = int(os.getenv("TOKEN_BLACKLIST_FILTER_SIZE", 10000))
+
+# Appointments cancelled, completed or soft-deleted longer ago than this are
+# moved to ArchivedAppointment by the archive_appointments command, which also
+# writes them to a gzipped JSONL snapshot in ARCHIVE_SNAPSHOT_DIR when set.
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", 365))
+ARCHIVE_SNAPSHOT_DIR = os.getenv("ARCHIVE_SNAPSHOT_DIR", "")
+
 
 #################################################### CORS SETTINGS ###############################################
 CORS_ALLOW_ALL_ORIGINS = True # TODO: Change this to False in production and add the allowed origins
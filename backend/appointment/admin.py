@@ -4,8 +4,10 @@ from .models import (
     DoctorProfile,
     PatientProfile,
     Appointment,
+    ArchivedAppointment,
     Specialization,
     TimeSlot,
+    ScheduleTemplate,
 )
 from django.db import IntegrityError
 
@@ -81,6 +83,27 @@ class TimeSlotAdmin(admin.ModelAdmin):
     search_fields = ["doctor__user__first_name", "doctor__user__last_name"]
 
 
+@admin.register(ScheduleTemplate)
+class ScheduleTemplateAdmin(admin.ModelAdmin):
+
+    def get_queryset(self, request):
+        return ScheduleTemplate.all_objects.all()
+
+    list_display = [
+        "id",
+        "doctor",
+        "weekday",
+        "start_time",
+        "end_time",
+        "slot_minutes",
+        "start_date",
+        "end_date",
+        "is_deleted",
+    ]
+    list_filter = ["weekday"]
+    search_fields = ["doctor__user__first_name", "doctor__user__last_name"]
+
+
 @admin.register(Appointment)
 class AppointmentAdmin(admin.ModelAdmin):
     
@@ -99,3 +122,31 @@ class AppointmentAdmin(admin.ModelAdmin):
     ]
     list_filter = ["status"]
     search_fields = ["patient__user__first_name", "doctor__user__first_name"]
+
+
+@admin.register(ArchivedAppointment)
+class ArchivedAppointmentAdmin(admin.ModelAdmin):
+    """
+    Read-only: archived rows are only written by archive_appointments.
+    """
+
+    list_display = [
+        "id",
+        "patient",
+        "doctor",
+        "appointment_date",
+        "status",
+        "is_deleted",
+        "archived_at",
+    ]
+    list_filter = ["status"]
+    search_fields = ["patient__user__first_name", "doctor__user__first_name"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
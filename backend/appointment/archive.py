@@ -0,0 +1,88 @@
+import gzip
+import json
+import time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Appointment, ArchivedAppointment
+
+
+# Cancelled and completed appointments never change again.
+FINISHED_STATUSES = (3, 4)
+ARCHIVED_FIELDS = [
+    field.attname
+    for field in ArchivedAppointment._meta.concrete_fields
+    if field.name != "archived_at"
+]
+
+
+def archivable_appointments(cutoff):
+    """
+    Appointments soft-deleted before ``cutoff``, and finished appointments
+    dated before it.
+    """
+    return Appointment.all_objects.filter(
+        Q(is_deleted=True, deleted_at__lt=cutoff)
+        | Q(status__in=FINISHED_STATUSES, appointment_date__lt=cutoff)
+    )
+
+
+def archive_batch(cutoff, ids):
+    """
+    Copy the archivable appointments among ``ids`` into ArchivedAppointment
+    and remove them from the live table, in one transaction. Returns the
+    archived rows as dicts.
+    """
+    with transaction.atomic():
+        # Re-check under the lock: a row may have been restored since it was
+        # picked.
+        rows = list(
+            archivable_appointments(cutoff)
+            .filter(id__in=ids)
+            .select_for_update()
+            .values(*ARCHIVED_FIELDS)
+        )
+        ArchivedAppointment.objects.bulk_create(
+            ArchivedAppointment(**row) for row in rows
+        )
+        archived_ids = [row["id"] for row in rows]
+        Appointment.all_objects.filter(id__in=archived_ids).hard_delete()
+    return rows
+
+
+def archive_appointments(cutoff, batch_size=1000, snapshot=None, sleep=0):
+    """
+    Archive everything archivable_appointments(cutoff) selects, batch_size
+    rows per transaction, walking the primary key so each batch starts
+    where the previous one stopped. Archived rows are also written as JSON
+    lines to ``snapshot``, a text file object, when one is given. ``sleep``
+    seconds pass between batches.
+
+    Returns (archived, batches).
+    """
+    candidates = archivable_appointments(cutoff).order_by("id")
+    archived = batches = 0
+    last_id = 0
+    while True:
+        ids = list(
+            candidates.filter(id__gt=last_id).values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        last_id = ids[-1]
+        rows = archive_batch(cutoff, ids)
+        if snapshot is not None:
+            snapshot.writelines(
+                json.dumps(row, cls=DjangoJSONEncoder) + "\n" for row in rows
+            )
+        archived += len(rows)
+        batches += 1
+        if sleep:
+            time.sleep(sleep)
+    return archived, batches
+
+
+def open_snapshot(path):
+    return gzip.open(path, "wt", encoding="utf-8")
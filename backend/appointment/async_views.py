@@ -0,0 +1,344 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponseBase, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.exceptions import (
+    APIException,
+    NotAuthenticated,
+    NotFound,
+    PermissionDenied,
+    ValidationError,
+)
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from . import cache
+from .conditional import (
+    not_modified,
+    scope_etag,
+    set_validator,
+    version_aggregates,
+)
+from .models import Appointment, DoctorProfile, PatientProfile
+from .pagination import KeysetPagination, TimeSlotPagination
+from .replicas import read_from_replica
+from .serializers import (
+    CustomTokenObtainPairSerializer,
+    DoctorSerializer,
+    PatientAppointmentsSerializer,
+    TimeSlotSerializer,
+)
+from .views import (
+    STATUS_SUMMARY,
+    get_doctor_dashboard_data,
+    get_doctor_dashboard_queryset,
+    get_owner_filter,
+    get_time_slot_queryset,
+    get_today_bounds,
+)
+
+
+def _error_response(exc):
+    if isinstance(exc, ValidationError):
+        return JsonResponse(exc.detail, status=exc.status_code, safe=False)
+    return JsonResponse({"detail": exc.detail}, status=exc.status_code)
+
+
+async def authenticate(request):
+    """
+    Run the configured DRF authenticators. Their user lookup is sync, so it
+    runs in a worker thread.
+    """
+    for authenticator_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        result = await sync_to_async(authenticator_class().authenticate)(request)
+        if result is not None:
+            return result[0]
+    raise NotAuthenticated()
+
+
+def async_api_view(view=None, *, read_replica=False):
+    """
+    Turn an async function into an authenticated, GET-only API view. The view
+    receives a DRF Request, so paginators and query_params work as in the
+    sync views, and raised API exceptions become JSON error responses. The
+    view returns the payload, or a response of its own.
+
+    With ``read_replica`` the view reads from a replica, like sync views with
+    ReplicaReadMixin.
+    """
+    if view is None:
+        return partial(async_api_view, read_replica=read_replica)
+
+    @require_GET
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            user = await authenticate(request)
+            if read_replica:
+                # Checks the user's pin and the replica's connection.
+                await sync_to_async(read_from_replica)(user)
+            drf_request = Request(request)
+            drf_request.user = user
+            result = await view(drf_request, *args, **kwargs)
+            if isinstance(result, HttpResponseBase):
+                return result
+            return JsonResponse(result, safe=False)
+        except APIException as exc:
+            return _error_response(exc)
+
+    return wrapper
+
+
+################################ USER API VIEWS ################################
+
+# Password hashing gets its own bounded pool so a burst of logins queues here
+# instead of occupying the threads that serve every other request.
+login_executor = ThreadPoolExecutor(
+    max_workers=settings.LOGIN_HASH_WORKERS, thread_name_prefix="login-hash"
+)
+# Logins waiting for or running on login_executor. Only the event loop thread
+# touches it, which assumes one event loop per process, as ASGI servers run.
+_pending_logins = 0
+
+
+def _obtain_token_pair(data, request):
+    # The executor's threads keep their own connections; recycle them like
+    # Django does around every request, so a dropped connection (e.g. after a
+    # database restart) is replaced instead of failing every later login.
+    close_old_connections()
+    try:
+        serializer = CustomTokenObtainPairSerializer(
+            data=data, context={"request": request}
+        )
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+    finally:
+        close_old_connections()
+
+
+@csrf_exempt
+@require_POST
+async def user_login(request):
+    """
+    Async variant of UserLogin for ASGI deployments.
+
+    The user lookup and PBKDF2 check run on ``login_executor``. Once
+    LOGIN_MAX_PENDING logins are queued, further ones get 429 with Retry-After.
+    """
+    global _pending_logins
+
+    try:
+        data = json.loads(request.body) if request.body else {}
+    except ValueError:
+        return JsonResponse({"detail": "Malformed JSON."}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse({"detail": "Expected a JSON object."}, status=400)
+
+    if _pending_logins >= settings.LOGIN_MAX_PENDING:
+        response = JsonResponse(
+            {"detail": "Too many concurrent logins, try again shortly."}, status=429
+        )
+        response["Retry-After"] = "1"
+        return response
+
+    _pending_logins += 1
+    try:
+        user_data = await sync_to_async(
+            _obtain_token_pair, thread_sensitive=False, executor=login_executor
+        )(data, request)
+    except APIException as exc:
+        return _error_response(exc)
+    finally:
+        _pending_logins -= 1
+
+    return JsonResponse(user_data)
+
+
+# The views below are async counterparts of the read-heavy sync views for ASGI
+# deployments. They return the same payloads and run their independent
+# queries with asyncio.gather.
+
+
+async def _ensure_exists(queryset, message):
+    if not await queryset.aexists():
+        raise NotFound(message)
+
+
+async def _rows(queryset):
+    return [row async for row in queryset]
+
+
+async def _rows_unless_conditional(request, queryset):
+    """
+    The rows of ``queryset``, or None for a conditional request: it may get a
+    304, so its rows are only loaded once that is ruled out.
+    """
+    if "HTTP_IF_NONE_MATCH" in request.META:
+        return None
+    return await _rows(queryset)
+
+
+############################### PATIENT API VIEWS ###############################
+
+
+@async_api_view(read_replica=True)
+async def patient_appointments(request):
+    """
+    Async variant of PatientAppointments.
+    """
+    user = request.user
+    lookups = []
+    if user.is_staff:
+        patient_id = request.query_params.get("patient_id")
+        if not patient_id:
+            raise ValidationError({"patient_id": "patient_id parameter is required"})
+        appointments = Appointment.objects.filter(patient_id=patient_id)
+        lookups.append(
+            _ensure_exists(
+                PatientProfile.objects.filter(id=patient_id), "Patient not found."
+            )
+        )
+    elif user.is_patient:
+        appointments = Appointment.objects.filter(**get_owner_filter(user, "patient"))
+    else:
+        raise PermissionDenied("You do not have permission to access this endpoint.")
+
+    upcoming_appointments = appointments.filter(status=2).select_related(
+        "doctor__user"
+    )
+
+    version = version_aggregates("doctor")
+    summary, upcoming, *_ = await asyncio.gather(
+        appointments.aaggregate(**STATUS_SUMMARY, **version),
+        _rows_unless_conditional(request, upcoming_appointments),
+        *lookups,
+    )
+    etag = scope_etag(request, {name: summary.pop(name) for name in version})
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+    if upcoming is None:
+        upcoming = await _rows(upcoming_appointments)
+
+    data = {
+        "summary": summary,
+        "upcoming_appointments": PatientAppointmentsSerializer(
+            upcoming, many=True
+        ).data,
+    }
+    return set_validator(JsonResponse(data), etag)
+
+
+############################### DOCTOR API VIEWS ###############################
+
+
+@async_api_view(read_replica=True)
+async def doctor_list(request):
+    """
+    Async variant of DoctorList, sharing its pagination and response cache.
+    """
+    key, data = await sync_to_async(cache.lookup_response)(
+        cache.DOCTORS, (), request.get_full_path()
+    )
+    if data is not None:
+        return data
+
+    paginator = KeysetPagination()
+    serializer = DoctorSerializer(context={"request": request})
+    doctors = await paginator.apaginate_queryset(
+        serializer.values_queryset(DoctorProfile.objects, extra=paginator.ordering),
+        request,
+    )
+    data = paginator.get_paginated_response(
+        serializer.represent_values(doctors)
+    ).data
+    await cache.get_cache().aset(key, data, timeout=settings.REFERENCE_CACHE_TIMEOUT)
+    return data
+
+
+@async_api_view(read_replica=True)
+async def doctor_appointments(request):
+    """
+    Async variant of DoctorAppointments.
+    """
+    user = request.user
+    lookups = []
+    if user.is_staff:
+        doctor_id = request.query_params.get("doctor_id")
+        if not doctor_id:
+            raise ValidationError({"doctor_id": "doctor_id parameter is required"})
+        appointments = Appointment.objects.filter(doctor_id=doctor_id)
+        lookups.append(
+            _ensure_exists(
+                DoctorProfile.objects.filter(id=doctor_id), "Doctor not found."
+            )
+        )
+    elif user.is_doctor:
+        appointments = Appointment.objects.filter(**get_owner_filter(user, "doctor"))
+    else:
+        raise PermissionDenied("You do not have permission to access this endpoint.")
+
+    today_start, today_end = get_today_bounds()
+    dashboard_appointments = get_doctor_dashboard_queryset(
+        appointments, today_start, today_end
+    )
+
+    version = version_aggregates("patient")
+    summary, dashboard, *_ = await asyncio.gather(
+        appointments.aaggregate(**STATUS_SUMMARY, **version),
+        _rows_unless_conditional(request, dashboard_appointments),
+        *lookups,
+    )
+    etag = scope_etag(
+        request, {name: summary.pop(name) for name in version}, today_start
+    )
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+    if dashboard is None:
+        dashboard = await _rows(dashboard_appointments)
+
+    data = {
+        "summary": summary,
+        **get_doctor_dashboard_data(dashboard, today_start, today_end),
+    }
+    return set_validator(JsonResponse(data), etag)
+
+
+############################## TIME SLOT API VIEWS ##############################
+
+
+@async_api_view
+async def time_slot_list(request):
+    """
+    Async variant of the TimeSlotListCreate list.
+    """
+    queryset = get_time_slot_queryset(request.query_params)
+    paginator = TimeSlotPagination()
+    etag = None
+    # As in TimeSlotListCreate, only counted pages carry an ETag.
+    if paginator.include_count(request):
+        version = await queryset.aaggregate(**version_aggregates("doctor"))
+        etag = scope_etag(request, version)
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        paginator.known_count = version["rows"]
+
+    serializer = TimeSlotSerializer(context={"request": request})
+    time_slots = await paginator.apaginate_queryset(
+        serializer.values_queryset(queryset, extra=paginator.ordering), request
+    )
+    data = paginator.get_paginated_response(
+        serializer.represent_values(time_slots)
+    ).data
+    if etag is None:
+        return data
+    return set_validator(JsonResponse(data), etag)
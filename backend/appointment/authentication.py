@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+
+from .models import User
+
+
+def _active_key(user_id):
+    return f"auth:user:{user_id}:active"
+
+
+def is_user_active(user_id):
+    """
+    Whether the user may still authenticate. The answer is cached for
+    STATELESS_JWT_ACTIVE_TTL seconds and cleared when the user is saved.
+    """
+    cache = caches[settings.REFERENCE_CACHE_ALIAS]
+    active = cache.get(_active_key(user_id))
+    if active is None:
+        active = User.objects.filter(pk=user_id, is_active=True).exists()
+        cache.set(
+            _active_key(user_id), active, timeout=settings.STATELESS_JWT_ACTIVE_TTL
+        )
+    return active
+
+
+def forget_user_active(user_id):
+    caches[settings.REFERENCE_CACHE_ALIAS].delete(_active_key(user_id))
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    Authenticate from the access token's claims without loading the User row.
+
+    request.user is a TokenUser whose is_staff, is_patient, is_doctor,
+    patient_id and doctor_id come from the claims added by
+    CustomTokenObtainPairSerializer.get_token. Deactivated users are rejected
+    once their cached active flag expires or the user is saved.
+    """
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        if not is_user_active(user.id):
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        return user
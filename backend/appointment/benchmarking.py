@@ -0,0 +1,7 @@
+def percentile_ms(sorted_seconds, fraction):
+    """
+    The ``fraction`` percentile of ascending latencies in seconds, in
+    milliseconds. Used by the benchmark management commands.
+    """
+    index = min(len(sorted_seconds) - 1, int(len(sorted_seconds) * fraction))
+    return round(sorted_seconds[index] * 1000, 2)
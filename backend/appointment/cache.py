@@ -0,0 +1,151 @@
+import time
+from hashlib import md5
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from .metrics import REFERENCE_CACHE_REQUESTS
+from .replicas import read_from_primary
+
+
+DOCTORS = "doctors"
+SPECIALIZATIONS = "specializations"
+NAMESPACES = (DOCTORS, SPECIALIZATIONS)
+
+
+def get_cache():
+    return caches[settings.REFERENCE_CACHE_ALIAS]
+
+
+def _generation_key(namespace):
+    return f"reference:{namespace}:generation"
+
+
+def _counter_key(namespace, outcome):
+    return f"reference:{namespace}:{outcome}"
+
+
+def get_generations(namespaces):
+    """
+    Return the current generation token of each namespace. Entries are keyed
+    by these tokens, so replacing a token orphans everything cached under it.
+    """
+    cache = get_cache()
+    keys = [_generation_key(namespace) for namespace in namespaces]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            # add() keeps whichever token another process stored first.
+            cache.add(key, uuid4().hex, timeout=None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def invalidate(*namespaces):
+    cache = get_cache()
+    # Tokens set by an invalidation carry its time, see recently_invalidated.
+    cache.set_many(
+        {
+            _generation_key(namespace): f"{time.time():.3f}-{uuid4().hex}"
+            for namespace in namespaces
+        },
+        timeout=None,
+    )
+
+
+def recently_invalidated(generations):
+    """
+    Whether any of the generations was set by an invalidation less than
+    REPLICA_PIN_SECONDS ago, i.e. replicas may still serve the old data.
+    """
+    cutoff = time.time() - settings.REPLICA_PIN_SECONDS
+    for generation in generations:
+        stamp, invalidated, _ = generation.partition("-")
+        if invalidated and float(stamp) > cutoff:
+            return True
+    return False
+
+
+def _increment(key):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def record(namespace, hit):
+    _increment(_counter_key(namespace, "hits" if hit else "misses"))
+    REFERENCE_CACHE_REQUESTS.labels(namespace, "hit" if hit else "miss").inc()
+
+
+def lookup_response(namespace, depends_on, full_path):
+    """
+    Return the cache key of a response built from ``namespace`` and
+    ``depends_on``, and the cached data if there is any.
+
+    On a miss shortly after an invalidation the rest of the request reads from
+    the primary, so a lagging replica cannot put the old data back into the
+    cache under the new generation.
+    """
+    generations = get_generations((namespace, *depends_on))
+    path = md5(full_path.encode()).hexdigest()
+    key = "reference:{}:{}:{}".format(namespace, ":".join(generations), path)
+    data = get_cache().get(key)
+    record(namespace, hit=data is not None)
+    if data is None and recently_invalidated(generations):
+        read_from_primary()
+    return key, data
+
+
+def get_stats():
+    cache = get_cache()
+    counters = cache.get_many(
+        [
+            _counter_key(namespace, outcome)
+            for namespace in NAMESPACES
+            for outcome in ("hits", "misses")
+        ]
+    )
+    stats = {}
+    for namespace in NAMESPACES:
+        hits = counters.get(_counter_key(namespace, "hits"), 0)
+        misses = counters.get(_counter_key(namespace, "misses"), 0)
+        total = hits + misses
+        stats[namespace] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 4) if total else None,
+        }
+    return stats
+
+
+class CachedResponseMixin:
+    """
+    Cache successful GET responses of read-heavy reference endpoints.
+
+    ``cache_namespace`` names the data the response is built from; the entry is
+    dropped when appointment.signals invalidates that namespace or any of
+    ``cache_depends_on``. Authentication and permissions still run on every
+    request because ``get`` is only called after ``APIView.initial``.
+    """
+
+    cache_namespace = None
+    cache_depends_on = ()
+
+    def get(self, request, *args, **kwargs):
+        key, data = lookup_response(
+            self.cache_namespace, self.cache_depends_on, request.get_full_path()
+        )
+        if data is not None:
+            return Response(data)
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            get_cache().set(
+                key, response.data, timeout=settings.REFERENCE_CACHE_TIMEOUT
+            )
+        return response
@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+from django.db import connections
+
+from .search import missing_fts_triggers
+
+
+# Backends whose entries are only seen by the process that stored them.
+PROCESS_LOCAL_CACHES = {
+    "django.core.cache.backends.dummy.DummyCache",
+    "django.core.cache.backends.locmem.LocMemCache",
+}
+
+
+@register(Tags.caches)
+def check_replica_pin_cache(app_configs, **kwargs):
+    """
+    Replica routing keeps its read-after-write pins in the reference cache,
+    which every worker process must share.
+    """
+    if not settings.REPLICA_DATABASES:
+        return []
+    backend = settings.CACHES[settings.REFERENCE_CACHE_ALIAS]["BACKEND"]
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [
+        Error(
+            "REPLICA_DATABASES needs a cache shared by all processes, the "
+            f"reference cache uses {backend}.",
+            hint="Point CACHE_BACKEND and CACHE_LOCATION at a shared backend "
+            "such as django.core.cache.backends.redis.RedisCache.",
+            obj="REFERENCE_CACHE_ALIAS",
+            id="appointment.E001",
+        )
+    ]
+
+
+@register(Tags.database)
+def check_doctor_search_triggers(app_configs, databases=None, **kwargs):
+    """
+    The SQLite doctor search index is kept up to date by triggers that a
+    migration rebuilding appointment_doctorprofile silently drops.
+    """
+    warnings = []
+    for alias in databases or ():
+        missing = missing_fts_triggers(connections[alias])
+        if missing:
+            warnings.append(
+                Warning(
+                    f"Database {alias!r} lacks the doctor search triggers "
+                    f"{', '.join(missing)}, so search results go stale.",
+                    hint="Create them again with "
+                    "appointment.search.create_fts_triggers in a migration.",
+                    id="appointment.W001",
+                )
+            )
+    return warnings
@@ -0,0 +1,70 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Appointment
+
+
+# Column name -> ORM path, in export order.
+APPOINTMENT_EXPORT_COLUMNS = {
+    "id": "id",
+    "appointment_date": "appointment_date",
+    "status": "status",
+    "doctor_id": "doctor_id",
+    "doctor_first_name": "doctor__user__first_name",
+    "doctor_last_name": "doctor__user__last_name",
+    "patient_id": "patient_id",
+    "patient_first_name": "patient__user__first_name",
+    "patient_last_name": "patient__user__last_name",
+    "reason": "reason",
+    "created_at": "created_at",
+}
+STATUS_LABELS = dict(Appointment.STATUS_CHOICES)
+# Spreadsheets evaluate cells starting with these as formulas.
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def iter_appointment_rows(queryset, chunk_size=2000):
+    """
+    Yield one dict per appointment. Rows are read with ``iterator`` so only
+    ``chunk_size`` of them are in memory at a time; on PostgreSQL they come
+    from a server-side cursor.
+    """
+    columns = list(APPOINTMENT_EXPORT_COLUMNS)
+    rows = queryset.order_by("id").values_list(*APPOINTMENT_EXPORT_COLUMNS.values())
+    for values in rows.iterator(chunk_size=chunk_size):
+        row = dict(zip(columns, values))
+        row["status"] = STATUS_LABELS.get(row["status"], row["status"])
+        yield row
+
+
+class _Echo:
+    """
+    File-like object whose write() hands the line back to csv.writer's caller.
+    """
+
+    def write(self, value):
+        return value
+
+
+def _csv_cell(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    # Names and reasons are user input; a leading quote keeps a value such as
+    # =HYPERLINK(...) text when staff open the export in a spreadsheet.
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(APPOINTMENT_EXPORT_COLUMNS)
+    for row in rows:
+        yield writer.writerow(_csv_cell(value) for value in row.values())
+
+
+def stream_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
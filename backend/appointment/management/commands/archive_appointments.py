@@ -0,0 +1,77 @@
+import json
+from contextlib import nullcontext
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from appointment.archive import (
+    archivable_appointments,
+    archive_appointments,
+    open_snapshot,
+)
+from appointment.models import Appointment, ArchivedAppointment
+
+
+class Command(BaseCommand):
+    help = (
+        "Move appointments that were soft-deleted, cancelled or completed more "
+        "than --days ago into the archive table, in batches, so the live table "
+        "only holds active data. Meant to run regularly from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.ARCHIVE_AFTER_DAYS,
+            help="Archive rows older than this many days.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0,
+            help="Seconds to pause between batches.",
+        )
+        parser.add_argument(
+            "--snapshot-dir",
+            default=settings.ARCHIVE_SNAPSHOT_DIR,
+            help="Also write the archived rows to a gzipped JSONL file here.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many rows would be archived.",
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        cutoff = now - timedelta(days=options["days"])
+        report = {"cutoff": cutoff.isoformat()}
+
+        if options["dry_run"]:
+            report["archivable"] = archivable_appointments(cutoff).count()
+        else:
+            path = None
+            if options["snapshot_dir"]:
+                directory = Path(options["snapshot_dir"])
+                directory.mkdir(parents=True, exist_ok=True)
+                path = directory / f"appointments-{now:%Y%m%dT%H%M%S}.jsonl.gz"
+            with open_snapshot(path) if path else nullcontext() as snapshot:
+                archived, batches = archive_appointments(
+                    cutoff, options["batch_size"], snapshot, options["sleep"]
+                )
+            report.update(
+                archived=archived,
+                batches=batches,
+                snapshot=str(path) if path else None,
+            )
+
+        report.update(
+            live=Appointment.all_objects.count(),
+            archive=ArchivedAppointment.objects.count(),
+        )
+        self.stdout.write(json.dumps(report, indent=2))
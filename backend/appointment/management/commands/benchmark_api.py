@@ -0,0 +1,279 @@
+import json
+import time
+from collections import namedtuple
+from datetime import timedelta
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from appointment.benchmarking import percentile_ms
+from appointment.models import Appointment, TimeSlot, User
+from appointment.pagination import AppointmentPagination
+
+
+# user is who sends the request (None: unauthenticated); data builds a fresh
+# JSON body per request; iterations defaults to --iterations.
+Scenario = namedtuple(
+    "Scenario", "method url user data iterations", defaults=(None, None, None)
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the hot API paths against the current (seeded) database and "
+        "report latency percentiles, throughput and queries per request as "
+        "JSON. Every write is rolled back, so runs are repeatable. Seed the "
+        "database with seed_data first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument(
+            "--login-iterations",
+            type=int,
+            default=10,
+            help="Login hashes a password, so it gets fewer iterations.",
+        )
+        parser.add_argument("--warmup", type=int, default=3)
+        parser.add_argument(
+            "--depths",
+            default="0,1000,10000",
+            help="Comma-separated offsets at which the appointment list is read.",
+        )
+        parser.add_argument(
+            "--prefix", default="seed", help="--prefix the data was seeded with."
+        )
+        parser.add_argument("--password", default="password123")
+        parser.add_argument("--only", help="Run only scenarios containing this text.")
+        parser.add_argument("--output", help="Write the results to this JSON file.")
+        parser.add_argument(
+            "--baseline", help="Compare against results saved with --output."
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.2,
+            help="Allowed p50 slowdown against the baseline (0.2 = 20%%).",
+        )
+        parser.add_argument(
+            "--fail-on-regression",
+            action="store_true",
+            help="Exit with an error when any scenario regressed.",
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.client = Client()
+        try:
+            with override_settings(ALLOWED_HOSTS=["testserver"]):
+                with transaction.atomic():
+                    results = self.run_scenarios()
+                    raise Rollback
+        except Rollback:
+            pass
+
+        output = json.dumps(results, indent=2)
+        if options["output"]:
+            Path(options["output"]).write_text(output + "\n")
+        self.stdout.write(output)
+
+        if options["baseline"]:
+            regressions = self.compare(
+                results, json.loads(Path(options["baseline"]).read_text())
+            )
+            if regressions and options["fail_on_regression"]:
+                raise CommandError(f"{len(regressions)} scenario(s) regressed.")
+
+    def fixtures(self):
+        prefix = self.options["prefix"]
+        busiest = (
+            Appointment.objects.filter(
+                patient__user__email__startswith=f"{prefix}-patient-",
+                doctor__user__email__startswith=f"{prefix}-doctor-",
+            )
+            .values("doctor__user", "patient__user")
+            .annotate(total=Count("id"))
+            .order_by("-total")
+            .first()
+        )
+        if busiest is None:
+            raise CommandError(
+                f"No appointments seeded with the prefix '{prefix}'; run seed_data."
+            )
+        doctor = User.objects.select_related("doctor_profile").get(
+            pk=busiest["doctor__user"]
+        )
+        patient = User.objects.select_related("patient_profile").get(
+            pk=busiest["patient__user"]
+        )
+        admin = User.objects.create_superuser(
+            email=f"{prefix}-benchmark-admin@example.com",
+            password=self.options["password"],
+            first_name="Bench",
+            last_name="Admin",
+        )
+        return admin, doctor, patient
+
+    def run_scenarios(self):
+        admin, doctor, patient = self.fixtures()
+        tokens = {
+            user: f"Bearer {AccessToken.for_user(user)}"
+            for user in (admin, doctor, patient)
+        }
+        iterations = self.options["iterations"]
+        warmup = self.options["warmup"]
+        password = self.options["password"]
+        today = timezone.localdate()
+        slot = (
+            TimeSlot.objects.filter(doctor=doctor.doctor_profile, date__gte=today)
+            .order_by("date")
+            .first()
+        )
+        open_slots = list(
+            TimeSlot.objects.filter(is_available=True, date__gte=today).values_list(
+                "id", flat=True
+            )[: iterations + warmup]
+        )
+        refresh_tokens = iter(
+            [
+                str(RefreshToken.for_user(patient))
+                for _ in range(iterations + warmup)
+            ]
+        )
+        booking_slots = iter(open_slots)
+        next_week = (timezone.now() + timedelta(days=7)).isoformat()
+
+        scenarios = {
+            "login": Scenario(
+                "post",
+                reverse("login"),
+                data=lambda: {"email": patient.email, "password": password},
+                iterations=self.options["login_iterations"],
+            ),
+            "token-refresh": Scenario(
+                "post",
+                reverse("token_refresh"),
+                data=lambda: {"refresh": next(refresh_tokens)},
+            ),
+            "patient-dashboard": Scenario(
+                "get", reverse("patient-appointments"), patient
+            ),
+            "doctor-dashboard": Scenario("get", reverse("doctor-appointments"), doctor),
+            "specializations-list": Scenario(
+                "get", reverse("specializations-list-create"), patient
+            ),
+            "appointments-create": Scenario(
+                "post",
+                reverse("appointments-create"),
+                patient,
+                data=lambda: {
+                    "doctor": doctor.doctor_profile.id,
+                    "appointment_date": next_week,
+                },
+            ),
+            "appointments-book": Scenario(
+                "post",
+                reverse("appointments-book"),
+                patient,
+                data=lambda: {"time_slot": next(booking_slots)},
+                iterations=min(iterations, max(len(open_slots) - warmup, 0)),
+            ),
+        }
+        if slot is not None:
+            scenarios["time-slots-by-doctor-and-date"] = Scenario(
+                "get",
+                f"{reverse('time-slots-list')}?doctor_id={slot.doctor_id}"
+                f"&date={slot.date}",
+                patient,
+            )
+
+        appointments = Appointment.objects.order_by(*AppointmentPagination.ordering)
+        for depth in [int(depth) for depth in self.options["depths"].split(",")]:
+            url = f"{reverse('appointments-list')}?limit=100&offset={depth}"
+            scenarios[f"appointments-list offset={depth}"] = Scenario("get", url, admin)
+            row = appointments[depth : depth + 1].first() if depth else None
+            cursor = AppointmentPagination().encode_cursor(row) if row else ""
+            url = f"{reverse('appointments-list')}?limit=100&cursor={cursor}"
+            scenarios[f"appointments-list keyset depth={depth}"] = Scenario(
+                "get", url, admin
+            )
+
+        results = {}
+        for name, scenario in scenarios.items():
+            if self.options["only"] and self.options["only"] not in name:
+                continue
+            headers = {}
+            if scenario.user is not None:
+                headers["Authorization"] = tokens[scenario.user]
+            results[name] = self.measure(
+                scenario.method,
+                scenario.url,
+                headers,
+                scenario.data,
+                iterations if scenario.iterations is None else scenario.iterations,
+            )
+        return results
+
+    def measure(self, method, url, headers, data, iterations):
+        send = getattr(self.client, method)
+        latencies, queries, errors = [], [], 0
+        for i in range(self.options["warmup"] + iterations):
+            kwargs = {"headers": headers}
+            if data is not None:
+                kwargs.update(data=data(), content_type="application/json")
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                response = send(url, **kwargs)
+                elapsed = time.perf_counter() - start
+            if i < self.options["warmup"]:
+                continue
+            latencies.append(elapsed)
+            queries.append(len(ctx.captured_queries))
+            errors += response.status_code >= 400
+
+        if not latencies:
+            return {"iterations": 0}
+        latencies.sort()
+        return {
+            "iterations": len(latencies),
+            "errors": errors,
+            "p50_ms": percentile_ms(latencies, 0.50),
+            "p90_ms": percentile_ms(latencies, 0.90),
+            "p99_ms": percentile_ms(latencies, 0.99),
+            "max_ms": percentile_ms(latencies, 1),
+            "requests_per_second": round(len(latencies) / sum(latencies), 2),
+            "queries_per_request": round(sum(queries) / len(queries), 2),
+            "max_queries": max(queries),
+        }
+
+    def compare(self, results, baseline):
+        tolerance = self.options["tolerance"]
+        regressions = []
+        self.stdout.write("\nscenario: p50 ms (baseline) / queries (baseline)")
+        for name, current in results.items():
+            previous = baseline.get(name)
+            if not previous or not current.get("iterations"):
+                continue
+            slower = current["p50_ms"] > previous["p50_ms"] * (1 + tolerance)
+            more_queries = current["max_queries"] > previous["max_queries"]
+            line = (
+                f"{name}: {current['p50_ms']} ({previous['p50_ms']}) / "
+                f"{current['max_queries']} ({previous['max_queries']})"
+            )
+            if slower or more_queries:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(f"{line}  REGRESSION"))
+            else:
+                self.stdout.write(line)
+        return regressions
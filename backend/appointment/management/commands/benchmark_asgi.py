@@ -0,0 +1,146 @@
+import asyncio
+import json
+import time
+from datetime import time as clock, timedelta
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import AsyncClient
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from appointment.benchmarking import percentile_ms
+from appointment.models import (
+    Appointment,
+    DoctorProfile,
+    PatientProfile,
+    TimeSlot,
+    User,
+)
+
+
+# (sync url name, async url name, which user calls it)
+ENDPOINTS = [
+    ("patient-appointments", "patient-appointments-async", "patient"),
+    ("doctor-appointments", "doctor-appointments-async", "doctor"),
+    ("doctors-list", "doctors-list-async", "patient"),
+    ("time-slots-list", "time-slots-list-async", "patient"),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Load the sync and async variants of the dashboard and list endpoints "
+        "through the ASGI handler at a fixed concurrency and print throughput "
+        "and latency percentiles as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument(
+            "--rows",
+            type=int,
+            default=50,
+            help="Appointments and time slots created for the temporary users.",
+        )
+
+    def handle(self, *args, **options):
+        # Atomic, so a failure part-way leaves nothing behind to clean up.
+        with transaction.atomic():
+            doctor, patient = self.create_fixtures(options["rows"])
+        try:
+            tokens = {
+                "doctor": str(AccessToken.for_user(doctor.user)),
+                "patient": str(AccessToken.for_user(patient.user)),
+            }
+            with override_settings(ALLOWED_HOSTS=["testserver"]):
+                results = asyncio.run(
+                    self.run_all(tokens, options["requests"], options["concurrency"])
+                )
+        finally:
+            User.objects.filter(pk__in=[doctor.user_id, patient.user_id]).delete()
+
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def create_fixtures(self, rows):
+        suffix = uuid4().hex
+        users = []
+        for role in ("doctor", "patient"):
+            user = User(
+                email=f"benchmark-{role}-{suffix}@example.com",
+                first_name="Bench",
+                last_name=role.title(),
+                is_doctor=role == "doctor",
+                is_patient=role == "patient",
+            )
+            user.set_unusable_password()
+            user.save()
+            users.append(user)
+
+        doctor = DoctorProfile.objects.create(
+            user=users[0], experience_years=1, address="Benchmark"
+        )
+        patient = PatientProfile.objects.create(
+            user=users[1], date_of_birth=timezone.localdate(), address="Benchmark"
+        )
+        now = timezone.now()
+        Appointment.objects.bulk_create(
+            Appointment(
+                doctor=doctor,
+                patient=patient,
+                status=i % 4 + 1,
+                appointment_date=now + timedelta(hours=i),
+            )
+            for i in range(rows)
+        )
+        start = timezone.localdate() + timedelta(days=3650)
+        TimeSlot.objects.bulk_create(
+            TimeSlot(
+                doctor=doctor,
+                date=start + timedelta(days=i // 16),
+                start_time=clock(6 + i % 16),
+                end_time=clock(6 + i % 16, 30),
+            )
+            for i in range(rows)
+        )
+        return doctor, patient
+
+    async def run_all(self, tokens, requests, concurrency):
+        results = {}
+        for sync_name, async_name, role in ENDPOINTS:
+            headers = {"Authorization": f"Bearer {tokens[role]}"}
+            results[sync_name] = {
+                variant: await self.run(reverse(name), headers, requests, concurrency)
+                for variant, name in (("sync", sync_name), ("async", async_name))
+            }
+        return results
+
+    async def run(self, url, headers, requests, concurrency):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies, statuses = [], []
+
+        async def fetch():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(url, headers=headers)
+                latencies.append(time.perf_counter() - start)
+                statuses.append(response.status_code)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(fetch() for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        return {
+            "requests": requests,
+            "ok": statuses.count(200),
+            "requests_per_second": round(requests / elapsed, 2),
+            "p50_ms": percentile_ms(latencies, 0.50),
+            "p95_ms": percentile_ms(latencies, 0.95),
+            "max_ms": percentile_ms(latencies, 1),
+        }
@@ -0,0 +1,90 @@
+import asyncio
+import json
+import time
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from appointment.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure login throughput of one worker process for the sync (login/) "
+        "and async (login-async/) endpoints and print the results as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=50)
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=8,
+            help="Concurrent logins issued against the async endpoint.",
+        )
+        parser.add_argument("--email", help="Existing user to log in as.")
+        parser.add_argument("--password", help="Password of --email.")
+
+    def handle(self, *args, **options):
+        email, password = options["email"], options["password"]
+        temporary_user = None
+        if not email:
+            email, password = f"benchmark-{uuid4().hex}@example.com", uuid4().hex
+            temporary_user = User.objects.create_superuser(
+                email=email, password=password, first_name="Bench", last_name="Mark"
+            )
+
+        credentials = {"email": email, "password": password}
+        try:
+            with override_settings(ALLOWED_HOSTS=["testserver"]):
+                results = {
+                    "sync": self.run_sync(credentials, options["requests"]),
+                    "async": asyncio.run(
+                        self.run_async(
+                            credentials, options["requests"], options["concurrency"]
+                        )
+                    ),
+                }
+        finally:
+            if temporary_user is not None:
+                temporary_user.delete()
+
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run_sync(self, credentials, requests):
+        client = Client()
+        statuses = []
+        start = time.perf_counter()
+        for _ in range(requests):
+            statuses.append(client.post(reverse("login"), credentials).status_code)
+        return self.summarize(statuses, time.perf_counter() - start, concurrency=1)
+
+    async def run_async(self, credentials, requests, concurrency):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def login():
+            async with semaphore:
+                response = await client.post(
+                    reverse("login-async"),
+                    credentials,
+                    content_type="application/json",
+                )
+                return response.status_code
+
+        start = time.perf_counter()
+        statuses = await asyncio.gather(*(login() for _ in range(requests)))
+        return self.summarize(statuses, time.perf_counter() - start, concurrency)
+
+    def summarize(self, statuses, elapsed, concurrency):
+        ok = sum(1 for code in statuses if code == 200)
+        return {
+            "requests": len(statuses),
+            "ok": ok,
+            "concurrency": concurrency,
+            "seconds": round(elapsed, 3),
+            "logins_per_second": round(ok / elapsed, 2) if elapsed else None,
+        }
@@ -0,0 +1,158 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework import serializers
+from rest_framework.request import Request
+
+from appointment.models import Appointment, DoctorProfile, PatientProfile, TimeSlot
+from appointment.serializers import (
+    AppointmentSerializer,
+    DoctorSerializer,
+    PatientSerializer,
+    TimeSlotSerializer,
+)
+
+
+# The to_representation overrides the list views serialized with before
+# SparseFieldsMixin, kept as the baseline.
+
+
+def _model_representation(serializer, instance):
+    return serializers.ModelSerializer.to_representation(serializer, instance)
+
+
+class LegacyAppointmentSerializer(AppointmentSerializer):
+    def to_representation(self, instance):
+        response = _model_representation(self, instance)
+        response["status"] = instance.get_status_display()
+        response["doctor"] = instance.doctor.user.get_full_name()
+        response["patient"] = instance.patient.user.get_full_name()
+        return response
+
+
+class LegacyDoctorSerializer(DoctorSerializer):
+    def to_representation(self, instance):
+        response = _model_representation(self, instance)
+        response["email"] = instance.user.email
+        response["first_name"] = instance.user.first_name
+        response["last_name"] = instance.user.last_name
+        response["phone_number"] = instance.user.phone_number
+        return response
+
+
+class LegacyPatientSerializer(PatientSerializer):
+    to_representation = LegacyDoctorSerializer.to_representation
+
+
+class LegacyTimeSlotSerializer(TimeSlotSerializer):
+    def to_representation(self, instance):
+        response = _model_representation(self, instance)
+        response["doctor"] = instance.doctor.user.get_full_name()
+        return response
+
+
+# name -> (serializer, baseline serializer, queryset as the list view reads
+# it, sparse fields).
+LISTS = {
+    "appointments": (
+        AppointmentSerializer,
+        LegacyAppointmentSerializer,
+        Appointment.objects.select_related("doctor__user", "patient__user"),
+        "id,status,appointment_date",
+    ),
+    "doctors": (
+        DoctorSerializer,
+        LegacyDoctorSerializer,
+        DoctorProfile.objects.select_related("user"),
+        "first_name,last_name",
+    ),
+    "patients": (
+        PatientSerializer,
+        LegacyPatientSerializer,
+        PatientProfile.objects.select_related("user"),
+        "id,email",
+    ),
+    "time-slots": (
+        TimeSlotSerializer,
+        LegacyTimeSlotSerializer,
+        TimeSlot.objects.select_related("doctor__user"),
+        "id,date,start_time",
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the CPU time spent reading and serializing list rows, per "
+        "1,000 rows: from model instances with the serializers list views used "
+        "before sparse fieldsets (the baseline) and with the current ones, and "
+        "from .values() rows with all and with sparse fields. Prints JSON. "
+        "Seed the database with seed_data first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000)
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Runs per measurement; the fastest one is reported.",
+        )
+
+    def handle(self, *args, **options):
+        results = {}
+        for name, (serializer_class, legacy_class, queryset, sparse_fields) in (
+            LISTS.items()
+        ):
+            queryset = queryset.order_by("id")[: options["rows"]]
+            rows = queryset.count()
+            if not rows:
+                raise CommandError(f"No {name} to serialize, run seed_data first.")
+
+            # .all() so that every run reads the rows again.
+            def instances(serializer_class):
+                return serializer_class(list(queryset.all()), many=True).data
+
+            def values(fields=None):
+                serializer = serializer_class(context={"request": self.request(fields)})
+                return serializer.represent_values(serializer.values_queryset(queryset))
+
+            timings = {
+                "instances (before)": self.cpu_ms(
+                    lambda: instances(legacy_class), options["repeat"]
+                ),
+                "instances": self.cpu_ms(
+                    lambda: instances(serializer_class), options["repeat"]
+                ),
+                "values": self.cpu_ms(values, options["repeat"]),
+                f"values fields={sparse_fields}": self.cpu_ms(
+                    lambda: values(sparse_fields), options["repeat"]
+                ),
+            }
+            results[name] = {
+                "rows": rows,
+                "cpu_ms_per_1000_rows": {
+                    mode: round(ms * 1000 / rows, 2) for mode, ms in timings.items()
+                },
+                "speedup": {
+                    mode: round(timings["instances (before)"] / ms, 2)
+                    for mode, ms in timings.items()
+                    if mode != "instances (before)"
+                },
+            }
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def request(self, fields):
+        params = {"fields": fields} if fields else {}
+        return Request(RequestFactory().get("/", params))
+
+    def cpu_ms(self, run, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.process_time()
+            run()
+            elapsed = (time.process_time() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,340 @@
+import random
+import time
+from datetime import date, datetime, time as clock, timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from appointment import cache
+from appointment.models import (
+    Appointment,
+    DoctorProfile,
+    PatientProfile,
+    Specialization,
+    TimeSlot,
+    User,
+)
+from appointment.search import refresh_search_documents
+
+
+SPECIALIZATIONS = [
+    "General Practice",
+    "Pediatrics",
+    "Internal Medicine",
+    "Dermatology",
+    "Cardiology",
+    "Gynecology",
+    "Orthopedics",
+    "Psychiatry",
+    "Ophthalmology",
+    "ENT",
+    "Neurology",
+    "Oncology",
+]
+FIRST_NAMES = [
+    "Amina", "Ben", "Chloe", "David", "Esi", "Farah", "George", "Hana", "Ivan",
+    "Jade", "Kofi", "Lena", "Marco", "Nia", "Omar", "Priya", "Quinn", "Rosa",
+    "Samuel", "Tariq", "Uma", "Victor", "Wanjiru", "Xavier", "Yara", "Zane",
+]
+LAST_NAMES = [
+    "Adams", "Banda", "Chen", "Diallo", "Evans", "Fischer", "Garcia", "Haddad",
+    "Ito", "Johnson", "Kamau", "Lopez", "Mensah", "Nguyen", "Okafor", "Patel",
+    "Quispe", "Rossi", "Smith", "Tanaka", "Usman", "Varga", "Wright", "Zulu",
+]
+STREETS = ["Main Street", "Station Road", "Park Avenue", "Hill View", "Market Lane"]
+
+# 30-minute slots from 09:00 to 17:00.
+DAY_SLOTS = [
+    (clock(9 + i // 2, 30 * (i % 2)), clock(9 + (i + 1) // 2, 30 * ((i + 1) % 2)))
+    for i in range(16)
+]
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Create a deterministic, production-shaped dataset: patients, doctors "
+        "across specializations, their time slots and appointment history. "
+        "The same --seed and --anchor always produce the same data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--patients", type=int, default=1000)
+        parser.add_argument("--doctors", type=int, default=100)
+        parser.add_argument("--appointments", type=int, default=10000)
+        parser.add_argument(
+            "--slot-days", type=int, default=30, help="Days of time slots ahead."
+        )
+        parser.add_argument(
+            "--history-days",
+            type=int,
+            default=365,
+            help="How far back the appointment history goes.",
+        )
+        parser.add_argument(
+            "--future-share",
+            type=float,
+            default=0.1,
+            help="Share of appointments booked into upcoming time slots.",
+        )
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument(
+            "--anchor",
+            type=date.fromisoformat,
+            default=None,
+            help="Date treated as today (YYYY-MM-DD). Defaults to today.",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--password", default="password123")
+        parser.add_argument(
+            "--prefix", default="seed", help="Prefix of the seeded users' emails."
+        )
+        parser.add_argument(
+            "--flush",
+            action="store_true",
+            help="Delete users created by an earlier run with the same --prefix.",
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.prefix = options["prefix"]
+        self.anchor = options["anchor"] or timezone.localdate()
+        started = time.perf_counter()
+
+        existing = User.objects.filter(
+            email__startswith=f"{self.prefix}-", email__endswith="@example.com"
+        )
+        if options["flush"]:
+            existing.delete()
+        elif existing.exists():
+            raise CommandError(
+                f"Users with the prefix '{self.prefix}' exist; pass --flush to "
+                "replace them or choose another --prefix."
+            )
+
+        # One hash for every user: hashing is what makes user seeding slow.
+        self.password = make_password(options["password"])
+        specializations = self.seed_specializations()
+        doctors = self.seed_doctors(options["doctors"], specializations)
+        patients = self.seed_patients(options["patients"])
+        slots = self.seed_time_slots(doctors, options["slot_days"])
+        appointments = self.seed_appointments(
+            doctors,
+            patients,
+            slots,
+            options["appointments"],
+            options["history_days"],
+            options["future_share"],
+        )
+
+        self.recount_doctors()
+        # bulk_create skips the signals that keep search documents current.
+        refresh_search_documents(
+            DoctorProfile.objects.filter(**self.seeded_users("doctor", "user__"))
+        )
+        cache.invalidate(cache.DOCTORS, cache.SPECIALIZATIONS)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Seeded {len(doctors)} doctors, {len(patients)} patients, "
+                f"{len(slots)} time slots and {appointments} appointments in "
+                f"{time.perf_counter() - started:.1f}s."
+            )
+        )
+
+    def bulk_create(self, model, objects):
+        # Consumes ``objects`` lazily so at most one batch is held in memory.
+        for batch in batched(objects, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+
+    def picker(self, values, skew=1.0):
+        """
+        Return a function picking from ``values`` with Zipf-like popularity,
+        so a few doctors and patients account for most visits.
+        """
+        weights = [1 / (rank + 1) ** skew for rank in range(len(values))]
+        self.rng.shuffle(weights)
+        cum_weights = list(accumulate(weights))
+        return lambda: self.rng.choices(values, cum_weights=cum_weights)[0]
+
+    def seed_specializations(self):
+        existing = {
+            specialization.name: specialization
+            for specialization in Specialization.objects.filter(
+                name__in=SPECIALIZATIONS
+            )
+        }
+        self.bulk_create(
+            Specialization,
+            (
+                Specialization(name=name, description=f"{name} services.")
+                for name in SPECIALIZATIONS
+                if name not in existing
+            ),
+        )
+        return list(
+            Specialization.objects.filter(name__in=SPECIALIZATIONS).order_by("name")
+        )
+
+    def create_users(self, role, count):
+        users = (
+            User(
+                email=f"{self.prefix}-{role}-{i}@example.com",
+                first_name=self.rng.choice(FIRST_NAMES),
+                last_name=self.rng.choice(LAST_NAMES),
+                phone_number=f"07{self.rng.randrange(10**8):08d}",
+                password=self.password,
+                is_doctor=role == "doctor",
+                is_patient=role == "patient",
+            )
+            for i in range(count)
+        )
+        self.bulk_create(User, users)
+        # Not every backend returns primary keys from bulk inserts.
+        return list(
+            User.objects.filter(**self.seeded_users(role))
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+
+    def seeded_users(self, role, path=""):
+        return {
+            f"{path}email__startswith": f"{self.prefix}-{role}-",
+            f"{path}email__endswith": "@example.com",
+        }
+
+    def address(self):
+        return f"{self.rng.randint(1, 400)} {self.rng.choice(STREETS)}"
+
+    def seed_doctors(self, count, specializations):
+        user_ids = self.create_users("doctor", count)
+        pick_specialization = self.picker(specializations, skew=0.7)
+        self.bulk_create(
+            DoctorProfile,
+            (
+                DoctorProfile(
+                    user_id=user_id,
+                    specialization=pick_specialization(),
+                    experience_years=self.rng.randint(1, 35),
+                    address=self.address(),
+                    availability=self.rng.random() < 0.9,
+                )
+                for user_id in user_ids
+            ),
+        )
+        return list(
+            DoctorProfile.objects.filter(**self.seeded_users("doctor", "user__"))
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+
+    def seed_patients(self, count):
+        user_ids = self.create_users("patient", count)
+        self.bulk_create(
+            PatientProfile,
+            (
+                PatientProfile(
+                    user_id=user_id,
+                    date_of_birth=self.anchor
+                    - timedelta(days=self.rng.randint(365, 90 * 365)),
+                    address=self.address(),
+                )
+                for user_id in user_ids
+            ),
+        )
+        return list(
+            PatientProfile.objects.filter(**self.seeded_users("patient", "user__"))
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+
+    def seed_time_slots(self, doctors, days):
+        def slots():
+            for doctor_id in doctors:
+                # Each doctor works four or five fixed weekdays.
+                weekdays = set(self.rng.sample(range(6), self.rng.choice([4, 5])))
+                for offset in range(days):
+                    day = self.anchor + timedelta(days=offset)
+                    if day.weekday() not in weekdays:
+                        continue
+                    for start, end in DAY_SLOTS:
+                        yield TimeSlot(
+                            doctor_id=doctor_id,
+                            date=day,
+                            start_time=start,
+                            end_time=end,
+                        )
+
+        self.bulk_create(TimeSlot, slots())
+        return list(
+            TimeSlot.objects.filter(**self.seeded_users("doctor", "doctor__user__"))
+            .order_by("id")
+            .values_list("id", "doctor_id", "date", "start_time")
+        )
+
+    def seed_appointments(
+        self, doctors, patients, slots, count, history_days, future_share
+    ):
+        if not (doctors and patients):
+            return 0
+        future = min(int(count * future_share), len(slots))
+        booked = sorted(self.rng.sample(range(len(slots)), future))
+        pick_doctor = self.picker(doctors)
+        pick_patient = self.picker(patients, skew=0.5)
+        anchor = timezone.make_aware(datetime.combine(self.anchor, clock(9)))
+
+        def history():
+            for _ in range(count - future):
+                when = anchor - timedelta(
+                    days=self.rng.randint(1, history_days),
+                    minutes=30 * self.rng.randrange(16),
+                )
+                yield Appointment(
+                    doctor_id=pick_doctor(),
+                    patient_id=pick_patient(),
+                    appointment_date=when,
+                    status=self.rng.choices([4, 3, 1], [75, 20, 5])[0],
+                    reason="Follow-up" if self.rng.random() < 0.4 else "Consultation",
+                )
+
+        def upcoming():
+            for index in booked:
+                slot_id, doctor_id, day, start = slots[index]
+                yield Appointment(
+                    doctor_id=doctor_id,
+                    patient_id=pick_patient(),
+                    time_slot_id=slot_id,
+                    appointment_date=timezone.make_aware(datetime.combine(day, start)),
+                    status=self.rng.choices([2, 1], [60, 40])[0],
+                    reason="Consultation",
+                )
+
+        self.bulk_create(Appointment, history())
+        self.bulk_create(Appointment, upcoming())
+        for batch in batched((slots[index][0] for index in booked), self.batch_size):
+            TimeSlot.objects.filter(id__in=batch).update(
+                is_available=False, updated_at=timezone.now()
+            )
+        return count
+
+    def recount_doctors(self):
+        specializations = list(
+            Specialization.objects.annotate(
+                active_doctor_count=Count(
+                    "doctors", filter=Q(doctors__is_deleted=False)
+                )
+            )
+        )
+        for specialization in specializations:
+            specialization.doctor_count = specialization.active_doctor_count
+        Specialization.objects.bulk_update(specializations, ["doctor_count"])
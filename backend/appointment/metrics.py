@@ -0,0 +1,139 @@
+import os
+import time
+from contextvars import ContextVar
+from hmac import compare_digest
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from .profiling import watch_connections, wrap_thread_connections
+
+
+# With PROMETHEUS_MULTIPROC_DIR set (to an empty directory shared by all
+# gunicorn workers), prometheus_client keeps each worker's values in files
+# there and the metrics view sums them, so every scrape sees all workers.
+
+REQUEST_LATENCY = Histogram(
+    "careconnect_request_duration_seconds",
+    "Time spent handling a request, by URL name.",
+    ["view", "method"],
+)
+REQUESTS = Counter(
+    "careconnect_requests_total",
+    "Responses sent, by URL name and status code.",
+    ["view", "method", "status"],
+)
+REQUEST_QUERIES = Histogram(
+    "careconnect_request_db_queries",
+    "Database queries run by a request, by URL name.",
+    ["view"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+BOOKING_CONFLICTS = Counter(
+    "careconnect_booking_conflicts_total",
+    "Bookings refused because the time slot was already taken.",
+)
+REFERENCE_CACHE_REQUESTS = Counter(
+    "careconnect_reference_cache_requests_total",
+    "Reference cache lookups, by namespace and result (hit or miss).",
+    ["namespace", "result"],
+)
+
+_query_count = ContextVar("metrics_query_count", default=None)
+
+
+def _count_query(execute, sql, params, many, context):
+    counter = _query_count.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """
+    Record latency, status code and query count of every request, labelled
+    with the URL name so the label set stays small. Enabled with
+    METRICS_ENABLED.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        watch_connections(_count_query)
+        wrap_thread_connections(_count_query)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if _query_count.get() is not None:
+            return self.get_response(request)  # already measured further out
+        wrap_thread_connections(_count_query)
+        counter = [0]
+        token = _query_count.set(counter)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _query_count.reset(token)
+        self.observe(request, response, time.perf_counter() - start, counter[0])
+        return response
+
+    async def __acall__(self, request):
+        # Sync threads serving async views open their connections after
+        # startup, so watch_connections has already wrapped them.
+        if _query_count.get() is not None:
+            return await self.get_response(request)
+        counter = [0]
+        token = _query_count.set(counter)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _query_count.reset(token)
+        self.observe(request, response, time.perf_counter() - start, counter[0])
+        return response
+
+    def observe(self, request, response, seconds, queries):
+        match = request.resolver_match
+        view = match.url_name if match and match.url_name else "unmatched"
+        REQUEST_LATENCY.labels(view, request.method).observe(seconds)
+        REQUESTS.labels(view, request.method, response.status_code).inc()
+        REQUEST_QUERIES.labels(view).observe(queries)
+
+
+def get_registry():
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def metrics_view(request):
+    """
+    Prometheus text exposition. Only served with METRICS_ENABLED on and a
+    METRICS_TOKEN configured, which the scraper sends as a Bearer token.
+    """
+    token = settings.METRICS_TOKEN
+    if not (settings.METRICS_ENABLED and token) or not compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST
+    )
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:43
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_doctor_count(apps, schema_editor):
+    Specialization = apps.get_model("appointment", "Specialization")
+    specializations = list(
+        Specialization.objects.annotate(
+            active_doctor_count=Count("doctors", filter=Q(doctors__is_deleted=False))
+        )
+    )
+    for specialization in specializations:
+        specialization.doctor_count = specialization.active_doctor_count
+    Specialization.objects.bulk_update(
+        specializations, ["doctor_count"], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointment', '0002_remove_doctorprofile_phone_number_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='specialization',
+            name='doctor_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_doctor_count, migrations.RunPython.noop),
+    ]
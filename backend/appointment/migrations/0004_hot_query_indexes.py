@@ -0,0 +1,25 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointment', '0003_specialization_doctor_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['doctor', 'status', 'appointment_date'], name='appt_doctor_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['patient', 'status', 'appointment_date'], name='appt_patient_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['doctor', 'date'], name='timeslot_doctor_date_idx'),
+        ),
+    ]
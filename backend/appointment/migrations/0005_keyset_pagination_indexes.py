@@ -0,0 +1,37 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointment', '0004_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='timeslot',
+            name='timeslot_doctor_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['appointment_date', 'id'], name='appt_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['doctor', 'appointment_date', 'id'], name='appt_doctor_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['patient', 'appointment_date', 'id'], name='appt_patient_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['doctor', 'date', 'start_time', 'id'], name='timeslot_doctor_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['date', 'start_time', 'id'], name='timeslot_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointment', '0005_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(condition=models.Q(('is_available', True), ('is_deleted', False)), fields=['date', 'start_time', 'id', 'doctor'], name='timeslot_available_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointment', '0007_scheduletemplate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='time_slot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='appointments', to='appointment.timeslot'),
+        ),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_deleted', False), ('status__in', [1, 2])), fields=('time_slot',), name='appt_active_time_slot_uniq'),
+        ),
+    ]
@@ -0,0 +1,108 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Concat, Lower
+
+from appointment.search import FTS_TRIGGERS
+
+
+def backfill_search_document(apps, schema_editor):
+    DoctorProfile = apps.get_model("appointment", "DoctorProfile")
+    User = apps.get_model("appointment", "User")
+    Specialization = apps.get_model("appointment", "Specialization")
+    name = User.objects.filter(pk=OuterRef("user_id")).annotate(
+        name=Concat("first_name", Value(" "), "last_name")
+    )
+    specialization = Specialization.objects.filter(pk=OuterRef("specialization_id"))
+    DoctorProfile.objects.update(
+        search_document=Lower(
+            Concat(
+                Subquery(name.values("name")[:1]),
+                Value(" "),
+                Coalesce(Subquery(specialization.values("name")[:1]), Value("")),
+                Value(" "),
+                F("address"),
+            )
+        )
+    )
+
+
+# The index triggers live in appointment.search, which later migrations
+# altering appointment_doctorprofile use to create them again.
+SQLITE_FTS = [
+    """
+    CREATE VIRTUAL TABLE appointment_doctorsearch USING fts5(
+        search_document,
+        content='appointment_doctorprofile',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE appointment_doctorsearch_vocab
+    USING fts5vocab(appointment_doctorsearch, row)
+    """,
+    *FTS_TRIGGERS.values(),
+    "INSERT INTO appointment_doctorsearch (appointment_doctorsearch) "
+    "VALUES ('rebuild')",
+]
+SQLITE_FTS_REVERSE = [
+    *(f"DROP TRIGGER IF EXISTS {name}" for name in FTS_TRIGGERS),
+    "DROP TABLE IF EXISTS appointment_doctorsearch_vocab",
+    "DROP TABLE IF EXISTS appointment_doctorsearch",
+]
+POSTGRESQL_TRIGRAM = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX doctor_search_trgm_idx ON appointment_doctorprofile "
+    "USING gin (search_document gin_trgm_ops)",
+]
+POSTGRESQL_TRIGRAM_REVERSE = ["DROP INDEX IF EXISTS doctor_search_trgm_idx"]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointment', '0009_archivedappointment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctorprofile',
+            name='search_document',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.RunPython(backfill_search_document, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='DoctorSearchEntry',
+            fields=[
+                ('doctor', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='appointment.doctorprofile')),
+                ('search_document', models.TextField()),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'appointment_doctorsearch',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(
+            run_for_vendor(
+                {"sqlite": SQLITE_FTS, "postgresql": POSTGRESQL_TRIGRAM}
+            ),
+            run_for_vendor(
+                {
+                    "sqlite": SQLITE_FTS_REVERSE,
+                    "postgresql": POSTGRESQL_TRIGRAM_REVERSE,
+                }
+            ),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+from appointment import search
+
+
+# Adding a column rebuilds appointment_doctorprofile on SQLite, which drops the
+# full-text index triggers created in 0010; they are created again here.
+def create_fts_triggers(apps, schema_editor):
+    search.create_fts_triggers(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointment', '0010_doctor_search'),
+    ]
+
+    operations = [
+        # Runs last when unapplying, after RemoveField rebuilt the table again.
+        migrations.RunPython(migrations.RunPython.noop, create_fts_triggers),
+        migrations.AddField(
+            model_name='doctorprofile',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='patientprofile',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='specialization',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='timeslot',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(create_fts_triggers, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='timeslot',
+            name='timeslot_available_idx',
+        ),
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(condition=models.Q(('is_available', True), ('is_deleted', False)), fields=['date', 'start_time', 'id'], name='timeslot_available_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['doctor', 'updated_at'], name='timeslot_version_idx'),
+        ),
+    ]
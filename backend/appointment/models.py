@@ -1,6 +1,8 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.dispatch import Signal
 from django.contrib.auth.models import AbstractUser, BaseUserManager
-from datetime import timedelta
+from datetime import datetime, timedelta
 from django.utils.timezone import now
 
 
@@ -22,6 +24,13 @@ class CustomUserManager(BaseUserManager):
         user.save(using=self._db)
         return user
 
+    def get_by_natural_key(self, email):
+        # Authentication loads the profiles in the same query so the login
+        # response can tell patients from doctors without further lookups.
+        return self.select_related("patient_profile", "doctor_profile").get(
+            **{self.model.USERNAME_FIELD: email}
+        )
+
     def create_superuser(
         self, email, password, first_name, last_name, phone_number=None
     ):
@@ -39,7 +48,72 @@ class CustomUserManager(BaseUserManager):
         return user
 
 
-class SoftDeleteManager(models.Manager):
+# Sent before a SoftDeleteQuerySet soft-deletes (deleted=True) or restores
+# rows. ``queryset`` holds the rows about to change; the UPDATE bypasses the
+# model save signals, so receivers keep derived data in step here.
+soft_delete_changed = Signal()
+
+
+class SoftDeleteQuerySet(models.QuerySet):
+    def delete(self):
+        """
+        Soft delete the rows and, through ``soft_delete_cascade``, their
+        dependents, with one UPDATE per model. Returns the number of rows
+        deleted.
+        """
+        with transaction.atomic(using=self.db):
+            return self._soft_delete(now())
+
+    def restore(self):
+        """
+        Restore the rows and the dependents that were soft-deleted along with
+        them, with one UPDATE per model. Returns the number of rows restored.
+        """
+        with transaction.atomic(using=self.db):
+            return self._restore()
+
+    def hard_delete(self):
+        return super().delete()
+
+    def _soft_delete(self, deleted_at):
+        rows = self.filter(is_deleted=False)
+        rows._cascade_delete(deleted_at)
+        soft_delete_changed.send(sender=self.model, queryset=rows, deleted=True)
+        return rows._stamped_update(is_deleted=True, deleted_at=deleted_at)
+
+    def _restore(self):
+        rows = self.filter(is_deleted=True)
+        rows._cascade_restore()
+        soft_delete_changed.send(sender=self.model, queryset=rows, deleted=False)
+        return rows._stamped_update(is_deleted=False, deleted_at=None)
+
+    def _stamped_update(self, **values):
+        # update() skips auto_now, so models tracking changes are stamped here.
+        if any(field.name == "updated_at" for field in self.model._meta.fields):
+            values["updated_at"] = now()
+        return self.update(**values)
+
+    def _dependents(self):
+        for related_name, filters in self.model.soft_delete_cascade.items():
+            relation = self.model._meta.get_field(related_name)
+            field = relation.field.name
+            dependents = relation.related_model.all_objects.filter(
+                **{f"{field}__in": self.values("pk")}, **filters
+            )
+            yield field, dependents
+
+    def _cascade_delete(self, deleted_at):
+        # Dependents share the parent's deleted_at, which is how restore
+        # tells them from rows that were deleted on their own.
+        for field, dependents in self._dependents():
+            dependents._soft_delete(deleted_at)
+
+    def _cascade_restore(self):
+        for field, dependents in self._dependents():
+            dependents.filter(deleted_at=F(f"{field}__deleted_at"))._restore()
+
+
+class SoftDeleteManager(models.Manager.from_queryset(SoftDeleteQuerySet)):
     def get_queryset(self):
         return super().get_queryset().filter(is_deleted=False)
 
@@ -49,17 +123,28 @@ class SoftDeleteModel(models.Model):
     deleted_at = models.DateTimeField(blank=True, null=True)
 
     objects = SoftDeleteManager()
-    all_objects = models.Manager()  # Includes deleted objects
+    all_objects = SoftDeleteQuerySet.as_manager()  # Includes deleted objects
+
+    # Related name -> lookups selecting the dependents that are soft-deleted
+    # and restored together with this object.
+    soft_delete_cascade = {}
 
     def delete(self, *args, **kwargs):
-        self.is_deleted = True
-        self.deleted_at = now()
-        self.save()
+        with transaction.atomic():
+            if not self.is_deleted:
+                self.deleted_at = now()
+                type(self).all_objects.filter(pk=self.pk)._cascade_delete(
+                    self.deleted_at
+                )
+            self.is_deleted = True
+            self.save()
 
     def restore(self):
-        self.is_deleted = False
-        self.deleted_at = None
-        self.save()
+        with transaction.atomic():
+            type(self).all_objects.filter(pk=self.pk)._cascade_restore()
+            self.is_deleted = False
+            self.deleted_at = None
+            self.save()
 
     class Meta:
         abstract = True
@@ -85,6 +170,9 @@ class User(AbstractUser):
 class Specialization(SoftDeleteModel):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True, null=True)
+    # Number of active (not soft-deleted) doctors, maintained by signals.
+    doctor_count = models.PositiveIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -96,6 +184,8 @@ class PatientProfile(SoftDeleteModel):
     )
     date_of_birth = models.DateField()
     address = models.TextField()
+    # Also moved when the user's name or contact details change.
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.user.get_full_name()}"
@@ -111,11 +201,46 @@ class DoctorProfile(SoftDeleteModel):
     experience_years = models.PositiveIntegerField()
     address = models.TextField()
     availability = models.BooleanField(default=True)
+    # Lowercased name, specialization and address, indexed for search (see
+    # appointment.search) and kept current by appointment.signals.
+    search_document = models.TextField(default="", editable=False)
+    # Also moved when the user's name or contact details change.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    soft_delete_cascade = {
+        "time_slots": {},
+        "schedule_templates": {},
+        "appointments": {"status": 1},
+    }
 
     def __str__(self):
         return f"Dr. {self.user.get_full_name()} - {self.specialization}"
 
 
+class DoctorSearchEntry(models.Model):
+    """
+    A row of the SQLite FTS5 index over DoctorProfile.search_document, created
+    by migration 0010 and used by appointment.search. Not available on other
+    databases.
+    """
+
+    doctor = models.OneToOneField(
+        DoctorProfile,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column="rowid",
+        db_constraint=False,
+        related_name="search_entry",
+    )
+    search_document = models.TextField()
+    # FTS5's hidden bm25 column: lower is a better match.
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = "appointment_doctorsearch"
+
+
 class TimeSlot(SoftDeleteModel):
     doctor = models.ForeignKey(
         DoctorProfile, on_delete=models.CASCADE, related_name="time_slots"
@@ -124,11 +249,128 @@ class TimeSlot(SoftDeleteModel):
     start_time = models.TimeField()
     end_time = models.TimeField()
     is_available = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    soft_delete_cascade = {"appointments": {"status": 1}}
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["doctor", "date", "start_time", "id"],
+                name="timeslot_doctor_date_idx",
+                condition=models.Q(is_deleted=False),
+            ),
+            # Keyset pagination order, see appointment.pagination.TimeSlotPagination
+            models.Index(
+                fields=["date", "start_time", "id"],
+                name="timeslot_keyset_idx",
+                condition=models.Q(is_deleted=False),
+            ),
+            # Earliest open slots, see views.NextAvailableTimeSlots. Kept as
+            # narrow as timeslot_keyset_idx so SQLite prefers it without stats.
+            models.Index(
+                fields=["date", "start_time", "id"],
+                name="timeslot_available_idx",
+                condition=models.Q(is_deleted=False, is_available=True),
+            ),
+            # Covers the ETag version of the time slot list, see
+            # appointment.conditional.ConditionalListMixin
+            models.Index(
+                fields=["doctor", "updated_at"],
+                name="timeslot_version_idx",
+                condition=models.Q(is_deleted=False),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.date} {self.start_time}-{self.end_time} ({'Available' if self.is_available else 'Unavailable'})"
 
 
+class ScheduleTemplate(SoftDeleteModel):
+    """
+    A recurring weekly block of working hours that expands into TimeSlots.
+    """
+
+    WEEKDAY_CHOICES = [
+        (0, "Monday"),
+        (1, "Tuesday"),
+        (2, "Wednesday"),
+        (3, "Thursday"),
+        (4, "Friday"),
+        (5, "Saturday"),
+        (6, "Sunday"),
+    ]
+
+    doctor = models.ForeignKey(
+        DoctorProfile, on_delete=models.CASCADE, related_name="schedule_templates"
+    )
+    weekday = models.IntegerField(choices=WEEKDAY_CHOICES)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    slot_minutes = models.PositiveIntegerField(default=30)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    # ISO dates on which the template does not apply, e.g. holidays.
+    exceptions = models.JSONField(default=list, blank=True)
+
+    def __str__(self):
+        return f"{self.get_weekday_display()} {self.start_time}-{self.end_time} ({self.start_date} to {self.end_date})"
+
+    def expand(self):
+        """
+        Yield (date, start_time, end_time) for every slot the template describes.
+        """
+        exceptions = set(self.exceptions)
+        slot_length = timedelta(minutes=self.slot_minutes)
+        days_ahead = (self.weekday - self.start_date.weekday()) % 7
+        day = self.start_date + timedelta(days=days_ahead)
+        while day <= self.end_date:
+            if day.isoformat() not in exceptions:
+                start = datetime.combine(day, self.start_time)
+                block_end = datetime.combine(day, self.end_time)
+                while start + slot_length <= block_end:
+                    yield day, start.time(), (start + slot_length).time()
+                    start += slot_length
+            day += timedelta(days=7)
+
+    def generate_time_slots(self, batch_size=1000):
+        """
+        Create the template's TimeSlots, skipping any that overlap slots the
+        doctor already has. Existing slots are loaded with one range query, so
+        running the template again creates nothing new.
+
+        Returns a (created, skipped) tuple of counts.
+        """
+        existing = {}
+        for day, start_time, end_time in TimeSlot.objects.filter(
+            doctor_id=self.doctor_id,
+            date__gte=self.start_date,
+            date__lte=self.end_date,
+        ).values_list("date", "start_time", "end_time"):
+            existing.setdefault(day, []).append((start_time, end_time))
+
+        new_slots = []
+        skipped = 0
+        for day, start_time, end_time in self.expand():
+            if any(
+                start_time < taken_end and taken_start < end_time
+                for taken_start, taken_end in existing.get(day, ())
+            ):
+                skipped += 1
+                continue
+            new_slots.append(
+                TimeSlot(
+                    doctor_id=self.doctor_id,
+                    date=day,
+                    start_time=start_time,
+                    end_time=end_time,
+                )
+            )
+
+        TimeSlot.objects.bulk_create(new_slots, batch_size=batch_size)
+        return len(new_slots), skipped
+
+
 class Appointment(SoftDeleteModel):
     STATUS_CHOICES = [
         (1, "Pending"),
@@ -136,6 +378,16 @@ class Appointment(SoftDeleteModel):
         (3, "Cancelled"),
         (4, "Completed"),
     ]
+    # Target status -> statuses an appointment may move to it from.
+    ALLOWED_TRANSITIONS = {
+        2: (1,),
+        3: (1, 2),
+        4: (2,),
+    }
+    # The subset open to patients on their own appointments.
+    PATIENT_TRANSITIONS = {
+        3: (1,),
+    }
 
     patient = models.ForeignKey(
         PatientProfile, on_delete=models.CASCADE, related_name="appointments"
@@ -143,11 +395,113 @@ class Appointment(SoftDeleteModel):
     doctor = models.ForeignKey(
         DoctorProfile, on_delete=models.CASCADE, related_name="appointments"
     )
+    time_slot = models.ForeignKey(
+        TimeSlot,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="appointments",
+    )
     appointment_date = models.DateTimeField()
     status = models.IntegerField(choices=STATUS_CHOICES, default=1)
     reason = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["doctor", "status", "appointment_date"],
+                name="appt_doctor_status_date_idx",
+                condition=models.Q(is_deleted=False),
+            ),
+            models.Index(
+                fields=["patient", "status", "appointment_date"],
+                name="appt_patient_status_date_idx",
+                condition=models.Q(is_deleted=False),
+            ),
+            # Keyset pagination order, see appointment.pagination.AppointmentPagination
+            models.Index(
+                fields=["appointment_date", "id"],
+                name="appt_keyset_idx",
+                condition=models.Q(is_deleted=False),
+            ),
+            models.Index(
+                fields=["doctor", "appointment_date", "id"],
+                name="appt_doctor_keyset_idx",
+                condition=models.Q(is_deleted=False),
+            ),
+            models.Index(
+                fields=["patient", "appointment_date", "id"],
+                name="appt_patient_keyset_idx",
+                condition=models.Q(is_deleted=False),
+            ),
+        ]
+        constraints = [
+            # A time slot backs at most one pending or confirmed appointment.
+            models.UniqueConstraint(
+                fields=["time_slot"],
+                condition=models.Q(is_deleted=False, status__in=[1, 2]),
+                name="appt_active_time_slot_uniq",
+            ),
+        ]
+
     def __str__(self):
         return f"Appointment with Dr. {self.doctor.user.get_full_name()} by {self.patient.user.get_full_name()} on {self.appointment_date}"
+
+
+class ArchivedAppointment(models.Model):
+    """
+    An appointment moved out of the live table by archive_appointments. The
+    id is the original appointment id. Foreign keys carry no database
+    constraint, so profiles and slots can still be removed later.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    patient = models.ForeignKey(
+        PatientProfile,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        related_name="+",
+    )
+    doctor = models.ForeignKey(
+        DoctorProfile,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        related_name="+",
+    )
+    time_slot = models.ForeignKey(
+        TimeSlot,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        related_name="+",
+    )
+    appointment_date = models.DateTimeField()
+    status = models.IntegerField(choices=Appointment.STATUS_CHOICES)
+    reason = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    is_deleted = models.BooleanField(default=False)
+    deleted_at = models.DateTimeField(blank=True, null=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["doctor", "appointment_date", "id"],
+                name="archived_appt_doctor_idx",
+            ),
+            models.Index(
+                fields=["patient", "appointment_date", "id"],
+                name="archived_appt_patient_idx",
+            ),
+            models.Index(
+                fields=["appointment_date", "id"], name="archived_appt_date_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"Archived appointment {self.id} on {self.appointment_date}"
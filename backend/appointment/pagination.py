@@ -0,0 +1,174 @@
+import asyncio
+import binascii
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination with an opt-in keyset (cursor) mode.
+
+    Passing ``cursor`` (empty for the first page) switches to keyset paging:
+    the next page is found with a range condition on ``ordering`` instead of
+    an OFFSET, so a deep page costs the same as the first one. Keyset pages
+    only move forward.
+
+    ``count=false`` skips the COUNT(*) in offset mode. Keyset mode skips it
+    unless ``count=true`` is passed.
+    """
+
+    ordering = ("id",)
+    # Set by views that counted the rows already, to skip the COUNT query.
+    known_count = None
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page = self.get_page_queryset(queryset, request)
+        if page is None:
+            return None
+        self.count = None
+        if self.include_count(request):
+            self.count = self.known_count
+            if self.count is None:
+                self.count = self.get_count(self.counted_queryset)
+        return self.set_page(list(page))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset for async views. The COUNT and the page are
+        independent, so they are awaited together.
+        """
+        page = self.get_page_queryset(queryset, request)
+        if page is None:
+            return None
+
+        async def fetch_count():
+            if self.include_count(request):
+                if self.known_count is not None:
+                    return self.known_count
+                return await self.counted_queryset.acount()
+
+        async def fetch_rows():
+            return [row async for row in page]
+
+        self.count, rows = await asyncio.gather(fetch_count(), fetch_rows())
+        return self.set_page(rows)
+
+    def get_page_queryset(self, queryset, request):
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+
+        queryset = queryset.order_by(*self.ordering)
+        self.use_keyset = self.cursor_query_param in request.query_params
+        self.counted_queryset = queryset
+
+        if self.use_keyset:
+            self.offset = 0
+            position = self.decode_cursor(request, queryset.model)
+            if position is not None:
+                queryset = queryset.filter(self.get_keyset_filter(position))
+        else:
+            self.offset = self.get_offset(request)
+
+        # Fetch one extra row to know whether there is a next page without counting.
+        return queryset[self.offset : self.offset + self.limit + 1]
+
+    def set_page(self, rows):
+        self.has_next = len(rows) > self.limit
+        rows = rows[: self.limit]
+        self.last_row = rows[-1] if rows else None
+        return rows
+
+    def include_count(self, request):
+        value = request.query_params.get(self.count_query_param)
+        if value is None:
+            return self.cursor_query_param not in request.query_params
+        return value.lower() not in ("false", "0", "no")
+
+    def get_keyset_filter(self, position):
+        """
+        Build ``(f1, f2, ...) > (v1, v2, ...)`` as OR-ed equality prefixes. The
+        leading ``f1 >= v1`` term lets the database use a range scan on the index.
+        """
+        keyset = Q()
+        for i, field in enumerate(self.ordering):
+            term = Q(**{f"{field}__gt": position[i]})
+            for previous_field, value in zip(self.ordering[:i], position[:i]):
+                term &= Q(**{previous_field: value})
+            keyset |= term
+        return Q(**{f"{self.ordering[0]}__gte": position[0]}) & keyset
+
+    def encode_cursor(self, row):
+        values = []
+        for field in self.ordering:
+            # Rows are model instances, or dicts from .values() querysets.
+            value = row[field] if isinstance(row, dict) else getattr(row, field)
+            values.append(value.isoformat() if hasattr(value, "isoformat") else value)
+        return urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(urlsafe_b64decode(encoded.encode()))
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError
+            return [
+                model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (TypeError, ValueError, binascii.Error, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        if self.use_keyset:
+            return replace_query_param(
+                url, self.cursor_query_param, self.encode_cursor(self.last_row)
+            )
+        return replace_query_param(
+            url, self.offset_query_param, self.offset + self.limit
+        )
+
+    def get_previous_link(self):
+        if self.use_keyset:
+            return None
+        return super().get_previous_link()
+
+    def get_paginated_response(self, data):
+        response = {}
+        if self.count is not None:
+            response["count"] = self.count
+        response["next"] = self.get_next_link()
+        response["previous"] = self.get_previous_link()
+        response["results"] = data
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["required"] = ["results"]
+        return response_schema
+
+
+class AppointmentPagination(KeysetPagination):
+    ordering = ("appointment_date", "id")
+
+
+class TimeSlotPagination(KeysetPagination):
+    ordering = ("date", "start_time", "id")
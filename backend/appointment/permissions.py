@@ -19,3 +19,12 @@ class IsPatient(permissions.BasePermission):
     def has_permission(self, request, view):
         # Check if the user is authenticated and is a staff member
         return request.user and request.user.is_authenticated and request.user.is_patient
+
+
+class IsDoctor(permissions.BasePermission):
+    """
+    Custom permission to allow access only to doctors (is_doctor=True).
+    """
+
+    def has_permission(self, request, view):
+        return request.user and request.user.is_authenticated and request.user.is_doctor
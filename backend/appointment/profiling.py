@@ -0,0 +1,227 @@
+import heapq
+import json
+import logging
+import random
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework.serializers import BaseSerializer
+
+from .serializers import SparseFieldsMixin
+
+
+logger = logging.getLogger("appointment.profiling")
+
+# The profile of the request being handled, if it was sampled. Context
+# variables follow the request into sync_to_async threads, so queries run by
+# async views are attributed to the right request too.
+_current_profile = ContextVar("current_profile", default=None)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.slowest = []  # min-heap of (seconds, sql)
+        self.serialize_seconds = 0.0
+        self.serializing = False
+        self.render_seconds = 0.0
+        self.render_started = None
+
+    def add_query(self, sql, seconds):
+        self.queries += 1
+        self.sql_seconds += seconds
+        entry = (seconds, sql[:500])
+        if len(self.slowest) < settings.PROFILING_SLOW_QUERIES:
+            heapq.heappush(self.slowest, entry)
+        elif self.slowest and seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def finish_render(self, response):
+        if self.render_started is not None:
+            self.render_seconds += time.perf_counter() - self.render_started
+            self.render_started = None
+        return response
+
+
+def _record_query(execute, sql, params, many, context):
+    profile = _current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.add_query(sql, time.perf_counter() - start)
+
+
+def add_execute_wrapper(wrapper, connection):
+    if wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(wrapper)
+
+
+def watch_connections(wrapper):
+    """
+    Run ``wrapper`` around the queries of every connection opened from now
+    on, in any thread.
+    """
+    connection_created.connect(
+        lambda connection, **kwargs: add_execute_wrapper(wrapper, connection),
+        weak=False,
+        dispatch_uid=f"{wrapper.__module__}.{wrapper.__qualname__}",
+    )
+
+
+def wrap_thread_connections(wrapper):
+    # Connections are per thread; cover the ones this thread already has.
+    for alias in connections:
+        add_execute_wrapper(wrapper, connections[alias])
+
+
+def _install_query_recorders():
+    wrap_thread_connections(_record_query)
+
+
+def _timed_serialization(serialize):
+    """
+    Count the time spent in ``serialize`` as the profiled request's serializer
+    time.
+    """
+
+    @wraps(serialize)
+    def timed(*args, **kwargs):
+        profile = _current_profile.get()
+        # Nested serializers run inside the outermost one; time that once.
+        if profile is None or profile.serializing:
+            return serialize(*args, **kwargs)
+        profile.serializing = True
+        start = time.perf_counter()
+        try:
+            return serialize(*args, **kwargs)
+        finally:
+            profile.serialize_seconds += time.perf_counter() - start
+            profile.serializing = False
+
+    return timed
+
+
+# Serializers produce output through .data, and list views built from
+# .values() rows through represent_values.
+_serializer_data = BaseSerializer.data
+_represent_values = SparseFieldsMixin.represent_values
+
+
+def install():
+    """
+    Hook query and serializer timing in. The hooks do nothing unless the
+    current request is being profiled.
+    """
+    watch_connections(_record_query)
+    BaseSerializer.data = property(_timed_serialization(_serializer_data.fget))
+    SparseFieldsMixin.represent_values = _timed_serialization(_represent_values)
+
+
+class ProfilingMiddleware:
+    """
+    Profile a sample of requests: query count, SQL time, the slowest queries,
+    serializer time and render time. The numbers go out as a Server-Timing
+    header and as one JSON log line on the ``appointment.profiling`` logger.
+
+    Enabled with PROFILING_ENABLED; PROFILING_SAMPLE_RATE is the share of
+    requests profiled. Queries a streaming response runs after the view has
+    returned are not counted.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        install()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        _install_query_recorders()
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_profile.reset(token)
+        return self.report(request, response, profile)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        # Sync code of this request, the ORM included, runs on one worker thread.
+        await sync_to_async(_install_query_recorders)()
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_profile.reset(token)
+        return self.report(request, response, profile)
+
+    def sampled(self):
+        if _current_profile.get() is not None:
+            return False  # already profiled further out
+        return random.random() < settings.PROFILING_SAMPLE_RATE
+
+    def process_template_response(self, request, response):
+        # DRF responses render right after this hook returns.
+        profile = _current_profile.get()
+        if profile is not None:
+            profile.render_started = time.perf_counter()
+            response.add_post_render_callback(profile.finish_render)
+        return response
+
+    def report(self, request, response, profile):
+        total_ms = (time.perf_counter() - profile.started) * 1000
+        sql_ms = profile.sql_seconds * 1000
+        serialize_ms = profile.serialize_seconds * 1000
+        render_ms = profile.render_seconds * 1000
+        response["Server-Timing"] = ", ".join(
+            [
+                f'db;dur={sql_ms:.2f};desc="{profile.queries} queries"',
+                f"serialize;dur={serialize_ms:.2f}",
+                f"render;dur={render_ms:.2f}",
+                f"total;dur={total_ms:.2f}",
+            ]
+        )
+
+        match = request.resolver_match
+        logger.info(
+            json.dumps(
+                {
+                    "method": request.method,
+                    "path": request.path,
+                    "view": match.url_name if match else None,
+                    "status": response.status_code,
+                    "total_ms": round(total_ms, 2),
+                    "queries": profile.queries,
+                    "sql_ms": round(sql_ms, 2),
+                    "serialize_ms": round(serialize_ms, 2),
+                    "render_ms": round(render_ms, 2),
+                    "slowest_queries": [
+                        {"ms": round(seconds * 1000, 2), "sql": sql}
+                        for seconds, sql in sorted(profile.slowest, reverse=True)
+                    ],
+                }
+            )
+        )
+        return response
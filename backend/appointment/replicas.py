@@ -0,0 +1,174 @@
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from rest_framework.permissions import SAFE_METHODS
+
+
+logger = logging.getLogger("appointment.replicas")
+
+# Routing state of the request being handled; None outside requests, where
+# everything goes to the primary.
+_routing = ContextVar("replica_routing", default=None)
+
+# Replica alias -> time.monotonic() before which it is not tried again.
+_down_until = {}
+
+
+class RequestRouting:
+    def __init__(self):
+        self.read_alias = None
+        self.wrote = False
+
+
+def _pin_key(user_id):
+    return f"replica:pinned:{user_id}"
+
+
+def pin_to_primary(user_id):
+    """
+    Send the user's reads to the primary for REPLICA_PIN_SECONDS, so they see
+    their own writes while the replicas catch up.
+    """
+    caches[settings.REFERENCE_CACHE_ALIAS].set(
+        _pin_key(user_id), True, timeout=settings.REPLICA_PIN_SECONDS
+    )
+
+
+def is_pinned(user_id):
+    return caches[settings.REFERENCE_CACHE_ALIAS].get(_pin_key(user_id), False)
+
+
+def replica_is_healthy(alias):
+    """
+    Whether ``alias`` accepts connections. A replica that does not is skipped
+    for REPLICA_RETRY_SECONDS.
+    """
+    if _down_until.get(alias, 0) > time.monotonic():
+        return False
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError:
+        logger.warning("Replica %s is unavailable, reading from the primary", alias)
+        _down_until[alias] = time.monotonic() + settings.REPLICA_RETRY_SECONDS
+        return False
+    return True
+
+
+def choose_replica():
+    replicas = list(settings.REPLICA_DATABASES)
+    random.shuffle(replicas)
+    for alias in replicas:
+        if replica_is_healthy(alias):
+            return alias
+    return None
+
+
+def read_from_replica(user):
+    """
+    Route the rest of the current request's reads to a healthy replica,
+    unless the user wrote recently or the request has written already.
+    """
+    routing = _routing.get()
+    if routing is None or routing.wrote:
+        return
+    if user.is_authenticated and is_pinned(user.pk):
+        return
+    routing.read_alias = choose_replica()
+
+
+def read_from_primary():
+    """
+    Route the rest of the current request's reads back to the primary.
+    """
+    routing = _routing.get()
+    if routing is not None:
+        routing.read_alias = None
+
+
+class ReplicaRouter:
+    """
+    Send reads to the replica chosen for the current request, if any, and
+    everything else to the primary. The first write of a request moves its
+    remaining reads back to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        return routing.read_alias if routing is not None else None
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None:
+            routing.wrote = True
+            routing.read_alias = None
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        databases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Track whether a request writes and pin its user to the primary when it
+    does. Views opt in to replica reads with ReplicaReadMixin.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        routing = RequestRouting()
+        token = _routing.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        if routing.wrote:
+            self.pin_writer(request)
+        return response
+
+    async def __acall__(self, request):
+        routing = RequestRouting()
+        token = _routing.set(routing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        if routing.wrote:
+            await sync_to_async(self.pin_writer)(request)
+        return response
+
+    def pin_writer(self, request):
+        # DRF copies the authenticated user onto the Django request.
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            pin_to_primary(user.pk)
+
+
+class ReplicaReadMixin:
+    """
+    Serve the view's GET and HEAD requests from a read replica.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS:
+            read_from_replica(request.user)
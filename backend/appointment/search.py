@@ -0,0 +1,198 @@
+import difflib
+import re
+
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import F, Lookup, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Concat, Lower
+
+from .models import DoctorSearchEntry, Specialization, User
+
+
+# Vocabulary of the SQLite FTS5 index (DoctorSearchEntry), created by
+# migration 0010. PostgreSQL uses a pg_trgm GIN index instead.
+FTS_VOCAB_TABLE = "appointment_doctorsearch_vocab"
+# Triggers keeping the FTS5 index in step with appointment_doctorprofile.
+# Django rebuilds SQLite tables for most schema changes, which drops their
+# triggers: a migration altering appointment_doctorprofile has to call
+# create_fts_triggers, and check appointment.W001 reports missing ones.
+FTS_TRIGGERS = {
+    "appointment_doctorsearch_insert": """
+        CREATE TRIGGER appointment_doctorsearch_insert
+        AFTER INSERT ON appointment_doctorprofile BEGIN
+            INSERT INTO appointment_doctorsearch (rowid, search_document)
+            VALUES (new.id, new.search_document);
+        END
+    """,
+    "appointment_doctorsearch_delete": """
+        CREATE TRIGGER appointment_doctorsearch_delete
+        AFTER DELETE ON appointment_doctorprofile BEGIN
+            INSERT INTO appointment_doctorsearch
+                (appointment_doctorsearch, rowid, search_document)
+            VALUES ('delete', old.id, old.search_document);
+        END
+    """,
+    "appointment_doctorsearch_update": """
+        CREATE TRIGGER appointment_doctorsearch_update
+        AFTER UPDATE OF search_document ON appointment_doctorprofile BEGIN
+            INSERT INTO appointment_doctorsearch
+                (appointment_doctorsearch, rowid, search_document)
+            VALUES ('delete', old.id, old.search_document);
+            INSERT INTO appointment_doctorsearch (rowid, search_document)
+            VALUES (new.id, new.search_document);
+        END
+    """,
+}
+# Query terms this long or longer also match close misspellings on SQLite.
+FUZZY_MIN_LENGTH = 4
+FUZZY_CUTOFF = 0.75
+
+
+def create_fts_triggers(schema_editor):
+    """
+    Create the FTS5 index triggers on SQLite, replacing existing ones.
+    """
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for name, statement in FTS_TRIGGERS.items():
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        schema_editor.execute(statement)
+
+
+def missing_fts_triggers(connection):
+    """
+    Names of the FTS5 index triggers missing from a SQLite database that has
+    the index.
+    """
+    if connection.vendor != "sqlite":
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE name IN "
+            f"({', '.join(['%s'] * (len(FTS_TRIGGERS) + 1))})",
+            [DoctorSearchEntry._meta.db_table, *FTS_TRIGGERS],
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+    if DoctorSearchEntry._meta.db_table not in existing:
+        return []
+    return [name for name in FTS_TRIGGERS if name not in existing]
+
+
+@DoctorSearchEntry._meta.get_field("search_document").register_lookup
+class FullTextMatch(Lookup):
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", lhs_params + rhs_params
+
+
+def search_document():
+    """
+    Expression computing a doctor's search document: name, specialization
+    and address, lowercased.
+    """
+    name = User.objects.filter(pk=OuterRef("user_id")).annotate(
+        name=Concat("first_name", Value(" "), "last_name")
+    )
+    specialization = Specialization.objects.filter(pk=OuterRef("specialization_id"))
+    return Lower(
+        Concat(
+            Subquery(name.values("name")[:1]),
+            Value(" "),
+            Coalesce(Subquery(specialization.values("name")[:1]), Value("")),
+            Value(" "),
+            F("address"),
+        )
+    )
+
+
+def refresh_search_documents(queryset):
+    """
+    Recompute the search documents of the doctors in ``queryset`` with one
+    UPDATE.
+    """
+    return queryset.update(search_document=search_document())
+
+
+def search_terms(query):
+    return re.findall(r"\w+", query.lower())
+
+
+def _close_terms(connection, terms):
+    """
+    Map each term to up to three indexed terms spelled almost the same, read
+    from the FTS5 vocabulary in one query.
+    """
+    if not terms:
+        return {}
+    # fts5vocab answers range conditions on term from the index, so only
+    # terms sharing the first letter are read.
+    condition = "(term >= %s AND term < %s AND length(term) BETWEEN %s AND %s)"
+    params = []
+    for term in terms:
+        params += [term[0], chr(ord(term[0]) + 1), len(term) - 2, len(term) + 2]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT term FROM {FTS_VOCAB_TABLE} WHERE "
+            + " OR ".join([condition] * len(terms)),
+            params,
+        )
+        vocabulary = [row[0] for row in cursor.fetchall()]
+    return {
+        term: difflib.get_close_matches(term, vocabulary, n=3, cutoff=FUZZY_CUTOFF)
+        for term in terms
+    }
+
+
+def fts_match_expression(connection, terms):
+    """
+    FTS5 query requiring every term, each as a prefix or one of its close
+    misspellings found in the index vocabulary.
+    """
+    close_terms = _close_terms(
+        connection, [term for term in terms if len(term) >= FUZZY_MIN_LENGTH]
+    )
+    groups = []
+    for term in terms:
+        alternatives = [f'"{term}"*'] + [
+            f'"{match}"' for match in close_terms.get(term, ()) if match != term
+        ]
+        groups.append("(" + " OR ".join(alternatives) + ")")
+    return " AND ".join(groups)
+
+
+def search_doctors(queryset, query, connection):
+    """
+    Filter ``queryset`` to the doctors matching ``query`` and order them by
+    relevance, best first.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset.none()
+
+    if connection.vendor == "postgresql":
+        text = " ".join(terms)
+        # ``<%`` (trigram_word_similar) is answered by the GIN trigram index
+        # and tolerates typos and unfinished words.
+        return (
+            queryset.defer("search_document")
+            .filter(search_document__trigram_word_similar=text)
+            .annotate(rank=TrigramWordSimilarity(Value(text), "search_document"))
+            .order_by("-rank", "id")
+        )
+
+    if connection.vendor == "sqlite":
+        match = fts_match_expression(connection, terms)
+        # Joining the index lets SQLite drive the query from the MATCH.
+        return (
+            queryset.defer("search_document")
+            .filter(search_entry__search_document__match=match)
+            .annotate(rank=F("search_entry__rank") * -1)
+            .order_by("-rank", "id")
+        )
+
+    # Other databases: unindexed substring match on every term.
+    for term in terms:
+        queryset = queryset.filter(search_document__contains=term)
+    return queryset.annotate(rank=Value(0.0)).order_by("id")
@@ -5,15 +5,153 @@ from .models import (
     PatientProfile,
     DoctorProfile,
     TimeSlot,
+    ScheduleTemplate,
     Appointment,
+    ArchivedAppointment,
     Specialization,
 )
+from django.core.exceptions import ObjectDoesNotExist
 from django.utils import timezone
+from django.utils.functional import cached_property
+from datetime import timedelta
+from operator import itemgetter
+
+
+def _value(value):
+    return value
+
+
+def _full_name(first_name, last_name):
+    # Same as User.get_full_name(), from the two columns.
+    return f"{first_name} {last_name}".strip()
+
+
+def _status_label(status, labels=dict(Appointment.STATUS_CHOICES)):
+    return labels.get(status, status)
+
+
+def _none_or(build):
+    # DRF renders None as is, without calling the field.
+    return lambda value: None if value is None else build(value)
+
+
+def _follow(instance, path):
+    for attr in path.split("__"):
+        if instance is None:
+            return None
+        instance = getattr(instance, attr)
+    return instance
+
+
+class SparseFieldsMixin:
+    """
+    Limit the output to the comma separated ``fields`` query parameter, and
+    build it either from model instances or from ``.values()`` rows.
+
+    ``computed_fields`` maps output fields that are not plain model fields to
+    the ORM paths they are built from and the function building them.
+    """
+
+    fields_query_param = "fields"
+    computed_fields = {}
+
+    @cached_property
+    def output_fields(self):
+        """
+        Output field -> (ORM paths, function of their values), in response order.
+        """
+        output = {}
+        for field in self.fields.values():
+            if not field.write_only:
+                build = field.to_representation
+                output[field.field_name] = (
+                    ("__".join(field.source_attrs),),
+                    _none_or(build) if field.allow_null else build,
+                )
+        output.update(self.computed_fields)
+        return output
+
+    @cached_property
+    def requested_fields(self):
+        request = self.context.get("request")
+        value = request.query_params.get(self.fields_query_param) if request else None
+        names = {name.strip() for name in (value or "").split(",") if name.strip()}
+        if not names:
+            return self.output_fields
+        unknown = sorted(names - self.output_fields.keys())
+        if unknown:
+            raise serializers.ValidationError(
+                {self.fields_query_param: f"Unknown fields: {', '.join(unknown)}."}
+            )
+        return {
+            name: source
+            for name, source in self.output_fields.items()
+            if name in names
+        }
+
+    def to_representation(self, instance):
+        return {
+            name: build(*(_follow(instance, path) for path in paths))
+            for name, (paths, build) in self.requested_fields.items()
+        }
+
+    def values_queryset(self, queryset, extra=()):
+        """
+        ``queryset`` as ``.values()`` rows holding only the columns the
+        requested fields need, plus ``extra`` (e.g. the pagination ordering).
+        """
+        paths = [
+            path for paths, _ in self.requested_fields.values() for path in paths
+        ]
+        return queryset.values(*dict.fromkeys([*paths, *extra]))
+
+    @cached_property
+    def _row_readers(self):
+        # One callable per output field, reading its value from a row dict.
+        readers = []
+        for name, (paths, build) in self.requested_fields.items():
+            get = itemgetter(*paths)
+            if len(paths) > 1:
+                readers.append((name, lambda row, g=get, b=build: b(*g(row))))
+            elif build is _value:
+                readers.append((name, get))
+            else:
+                readers.append((name, lambda row, g=get, b=build: b(g(row))))
+        return readers
+
+    def represent_values(self, rows):
+        """
+        Build the output of ``values_queryset`` rows without model instances.
+        """
+        readers = self._row_readers
+        return [{name: read(row) for name, read in readers} for row in rows]
 
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
 
+    @classmethod
+    def get_token(cls, user):
+        """
+        Add role flags and profile ids as claims so StatelessJWTAuthentication
+        can authorize requests without loading the user.
+        """
+        token = super().get_token(user)
+        token["is_staff"] = user.is_staff
+        token["is_patient"] = user.is_patient
+        token["is_doctor"] = user.is_doctor
+        token["patient_id"] = cls.get_profile_id(user, "patient_profile")
+        token["doctor_id"] = cls.get_profile_id(user, "doctor_profile")
+        return token
+
+    @staticmethod
+    def get_profile_id(user, related_name):
+        try:
+            return getattr(user, related_name).id
+        except ObjectDoesNotExist:
+            return None
+
     def generalUserData(self, user):
+        user_type = None
         if hasattr(user, "patient_profile"):
             user_type = ("patient")
         if hasattr(user, "doctor_profile"):
@@ -51,7 +189,7 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ["email", "password", "first_name", "last_name", "phone_number"]
 
 
-class PatientSerializer(serializers.ModelSerializer):
+class PatientSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     email = serializers.EmailField(write_only=True)
     password = serializers.CharField(write_only=True, min_length=8)
     first_name = serializers.CharField(write_only=True)
@@ -76,17 +214,15 @@ class PatientSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Date of birth cannot be in the future.")
         return value
 
-    def to_representation(self, instance):
-        response = super().to_representation(instance)
-        response["email"] = instance.user.email
-        response["first_name"] = instance.user.first_name
-        response["last_name"] = instance.user.last_name
-        response["phone_number"] = instance.user.phone_number
-
-        return response
+    computed_fields = {
+        "email": (("user__email",), _value),
+        "first_name": (("user__first_name",), _value),
+        "last_name": (("user__last_name",), _value),
+        "phone_number": (("user__phone_number",), _value),
+    }
 
 
-class DoctorSerializer(serializers.ModelSerializer):
+class DoctorSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     email = serializers.EmailField(write_only=True)
     password = serializers.CharField(write_only=True, min_length=8)
     first_name = serializers.CharField(write_only=True)
@@ -109,13 +245,33 @@ class DoctorSerializer(serializers.ModelSerializer):
             "specialization",
         ]
 
-    def to_representation(self, instance):
-        response = super().to_representation(instance)
-        response["email"] = instance.user.email
-        response["first_name"] = instance.user.first_name
-        response["last_name"] = instance.user.last_name
-        response["phone_number"] = instance.user.phone_number
-        return response
+    computed_fields = PatientSerializer.computed_fields
+
+
+class DoctorSearchResultSerializer(serializers.ModelSerializer):
+    first_name = serializers.CharField(source="user.first_name")
+    last_name = serializers.CharField(source="user.last_name")
+    specialization = serializers.CharField(
+        source="specialization.name", default=None
+    )
+    rank = serializers.FloatField()
+
+    class Meta:
+        model = DoctorProfile
+        fields = [
+            "id",
+            "first_name",
+            "last_name",
+            "specialization",
+            "address",
+            "experience_years",
+            "availability",
+            "rank",
+        ]
+
+
+class DoctorSearchQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(min_length=2, max_length=100)
 
 
 class SpecializationSerializer(serializers.ModelSerializer):
@@ -125,33 +281,183 @@ class SpecializationSerializer(serializers.ModelSerializer):
         
     def to_representation(self, instance):
         response = super().to_representation(instance)
-        response["doctor_count"] = instance.doctors.count()
+        # Prefer the count annotated by the list view, else the cached counter.
+        doctor_count = getattr(instance, "active_doctor_count", None)
+        if doctor_count is None:
+            doctor_count = instance.doctor_count
+        response["doctor_count"] = doctor_count
         return response
 
-class TimeSlotSerializer(serializers.ModelSerializer):
+class TimeSlotSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = TimeSlot
         fields = ["id", "date", "start_time", "end_time", "is_available"]
 
-    def to_representation(self, instance):
-        response = super().to_representation(instance)
-        response["doctor"] = instance.doctor.user.get_full_name()
-        return response
+    computed_fields = {
+        "doctor": (
+            ("doctor__user__first_name", "doctor__user__last_name"),
+            _full_name,
+        ),
+    }
+
 
+class AvailableTimeSlotSerializer(TimeSlotSerializer):
+    computed_fields = {
+        **TimeSlotSerializer.computed_fields,
+        "doctor_id": (("doctor_id",), _value),
+        "specialization": (("doctor__specialization_id",), _value),
+    }
 
-class AppointmentSerializer(serializers.ModelSerializer):
+
+class NextAvailableTimeSlotsQuerySerializer(serializers.Serializer):
+    specialization = serializers.IntegerField(required=False, min_value=1)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    limit = serializers.IntegerField(
+        required=False, default=10, min_value=1, max_value=100
+    )
+
+    def validate(self, attrs):
+        today = timezone.now().date()
+        attrs.setdefault("date_from", today)
+        attrs.setdefault("date_to", attrs["date_from"] + timedelta(days=30))
+        if attrs["date_from"] < today:
+            attrs["date_from"] = today
+        if attrs["date_to"] < attrs["date_from"]:
+            raise serializers.ValidationError(
+                {"date_to": "date_to cannot be before date_from."}
+            )
+        return attrs
+
+
+class ScheduleTemplateSerializer(serializers.ModelSerializer):
+    exceptions = serializers.ListField(
+        child=serializers.DateField(), required=False, default=list
+    )
+
+    class Meta:
+        model = ScheduleTemplate
+        fields = [
+            "id",
+            "weekday",
+            "start_time",
+            "end_time",
+            "slot_minutes",
+            "start_date",
+            "end_date",
+            "exceptions",
+        ]
+
+    def validate_slot_minutes(self, value):
+        if not 5 <= value <= 480:
+            raise serializers.ValidationError(
+                "Slot length must be between 5 and 480 minutes."
+            )
+        return value
+
+    def validate_exceptions(self, value):
+        return sorted({day.isoformat() for day in value})
+
+    def validate(self, attrs):
+        if attrs["start_time"] >= attrs["end_time"]:
+            raise serializers.ValidationError(
+                {"end_time": "End time must be after start time."}
+            )
+        if attrs["start_date"] > attrs["end_date"]:
+            raise serializers.ValidationError(
+                {"end_date": "End date cannot be before start date."}
+            )
+        if attrs["end_date"] - attrs["start_date"] > timedelta(days=366):
+            raise serializers.ValidationError(
+                {"end_date": "A template cannot span more than a year."}
+            )
+        return attrs
+
+
+class AppointmentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Appointment
         fields = ["id", "doctor", "patient", "status", "appointment_date"]
 
-    def to_representation(self, instance):
-        response = super().to_representation(instance)
-        response["status"] = instance.get_status_display()
-        response["doctor"] = instance.doctor.user.get_full_name()
-        response["patient"] = instance.patient.user.get_full_name()
+    computed_fields = {
+        "doctor": (
+            ("doctor__user__first_name", "doctor__user__last_name"),
+            _full_name,
+        ),
+        "patient": (
+            ("patient__user__first_name", "patient__user__last_name"),
+            _full_name,
+        ),
+        "status": (("status",), _status_label),
+    }
+
+    def validate_status(self, value):
+        # Updates follow ALLOWED_TRANSITIONS, like the bulk status endpoint.
+        # Patients create pending appointments and may only cancel them.
+        request = self.context.get("request")
+        by_patient = request is not None and getattr(
+            request.user, "is_patient", False
+        )
+        if self.instance is None:
+            if by_patient and value != 1:
+                raise serializers.ValidationError(
+                    "New appointments start as Pending."
+                )
+            return value
+        if value == self.instance.status:
+            return value
+        transitions = (
+            Appointment.PATIENT_TRANSITIONS
+            if by_patient
+            else Appointment.ALLOWED_TRANSITIONS
+        )
+        if self.instance.status not in transitions.get(value, ()):
+            raise serializers.ValidationError(
+                f"Cannot move an appointment from "
+                f"{_status_label(self.instance.status)} to {_status_label(value)}."
+            )
+        return value
 
-        return response
+
+class AppointmentBookingSerializer(serializers.Serializer):
+    time_slot = serializers.IntegerField(min_value=1)
+    reason = serializers.CharField(required=False, allow_blank=True)
+
+
+class AppointmentStatusTransitionSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), min_length=1, max_length=500
+    )
+    status = serializers.ChoiceField(
+        choices=[
+            choice
+            for choice in Appointment.STATUS_CHOICES
+            if choice[0] in Appointment.ALLOWED_TRANSITIONS
+        ]
+    )
+
+
+class AppointmentExportQuerySerializer(serializers.Serializer):
+    output = serializers.ChoiceField(choices=["csv", "ndjson"], default="csv")
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    doctor = serializers.IntegerField(required=False, min_value=1)
+    patient = serializers.IntegerField(required=False, min_value=1)
+    status = serializers.ChoiceField(
+        choices=Appointment.STATUS_CHOICES, required=False
+    )
+
+    def validate(self, attrs):
+        if (
+            "date_from" in attrs
+            and "date_to" in attrs
+            and attrs["date_to"] < attrs["date_from"]
+        ):
+            raise serializers.ValidationError(
+                {"date_to": "date_to cannot be before date_from."}
+            )
+        return attrs
 
 
 class PatientAppointmentsSerializer(serializers.ModelSerializer):
@@ -178,3 +484,32 @@ class DoctorAppointmentsSerializer(serializers.ModelSerializer):
         response["patient"] = instance.patient.user.get_full_name()
 
         return response
+
+
+class ArchivedAppointmentSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = ArchivedAppointment
+        fields = [
+            "id",
+            "doctor",
+            "patient",
+            "status",
+            "appointment_date",
+            "reason",
+            "created_at",
+            "is_deleted",
+            "deleted_at",
+            "archived_at",
+        ]
+
+    def to_representation(self, instance):
+        response = super().to_representation(instance)
+        response["status"] = instance.get_status_display()
+        # The profiles may have been removed since the row was archived.
+        if instance.doctor is not None:
+            response["doctor"] = instance.doctor.user.get_full_name()
+        if instance.patient is not None:
+            response["patient"] = instance.patient.user.get_full_name()
+
+        return response
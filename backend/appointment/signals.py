@@ -0,0 +1,195 @@
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import cache
+from .authentication import forget_user_active
+from .models import (
+    User,
+    DoctorProfile,
+    PatientProfile,
+    Specialization,
+    soft_delete_changed,
+)
+from .search import refresh_search_documents
+
+
+def _adjust_doctor_count(specialization_id, delta):
+    if specialization_id is None or delta == 0:
+        return
+    Specialization.all_objects.filter(pk=specialization_id).update(
+        doctor_count=F("doctor_count") + delta, updated_at=timezone.now()
+    )
+
+
+@receiver(pre_save, sender=DoctorProfile)
+def remember_doctor_state(sender, instance, **kwargs):
+    """
+    Remember the stored specialization, address and deletion state so
+    post_save can work out how the cached specialization counters and the
+    search document change.
+    """
+    previous = None
+    if not instance._state.adding and instance.pk is not None:
+        previous = (
+            DoctorProfile.all_objects.filter(pk=instance.pk)
+            .values("specialization_id", "address", "is_deleted")
+            .first()
+        )
+    instance._previous_doctor_state = previous
+
+
+@receiver(post_save, sender=DoctorProfile)
+def update_specialization_doctor_count(sender, instance, **kwargs):
+    """
+    Keep Specialization.doctor_count in sync when a doctor is created,
+    soft-deleted, restored or moved to another specialization.
+    """
+    previous = getattr(instance, "_previous_doctor_state", None)
+
+    old_specialization_id = None
+    if previous and not previous["is_deleted"]:
+        old_specialization_id = previous["specialization_id"]
+    new_specialization_id = None if instance.is_deleted else instance.specialization_id
+
+    if old_specialization_id == new_specialization_id:
+        return
+    _adjust_doctor_count(old_specialization_id, -1)
+    _adjust_doctor_count(new_specialization_id, 1)
+
+
+@receiver(post_delete, sender=DoctorProfile)
+def release_specialization_doctor_count(sender, instance, **kwargs):
+    """
+    Hard deletes bypass SoftDeleteModel.delete, so release the counter here.
+    """
+    if not instance.is_deleted:
+        _adjust_doctor_count(instance.specialization_id, -1)
+
+
+def _invalidate_on_commit(*namespaces):
+    transaction.on_commit(lambda: cache.invalidate(*namespaces))
+
+
+@receiver(soft_delete_changed, sender=DoctorProfile)
+def update_doctor_counts_in_bulk(sender, queryset, deleted, **kwargs):
+    """
+    Queryset soft deletes and restores skip post_save, so adjust the
+    specialization counters with one UPDATE per specialization instead.
+    """
+    counts = (
+        queryset.exclude(specialization=None)
+        .values("specialization_id")
+        .annotate(doctors=Count("id"))
+        .order_by()
+    )
+    for row in counts:
+        delta = -row["doctors"] if deleted else row["doctors"]
+        _adjust_doctor_count(row["specialization_id"], delta)
+    _invalidate_on_commit(cache.DOCTORS, cache.SPECIALIZATIONS)
+
+
+@receiver(soft_delete_changed, sender=Specialization)
+def invalidate_specialization_cache_in_bulk(sender, **kwargs):
+    _invalidate_on_commit(cache.SPECIALIZATIONS)
+
+
+@receiver(post_save, sender=DoctorProfile)
+@receiver(post_delete, sender=DoctorProfile)
+def invalidate_doctor_cache(sender, instance, **kwargs):
+    # Doctor changes also move Specialization.doctor_count.
+    _invalidate_on_commit(cache.DOCTORS, cache.SPECIALIZATIONS)
+
+
+@receiver(post_save, sender=Specialization)
+@receiver(post_delete, sender=Specialization)
+def invalidate_specialization_cache(sender, instance, **kwargs):
+    _invalidate_on_commit(cache.SPECIALIZATIONS)
+
+
+@receiver(post_save, sender=User)
+def invalidate_doctor_user_cache(sender, instance, update_fields=None, **kwargs):
+    """
+    Doctor responses embed the user's name and contact details. Logins only
+    touch last_login, so they do not invalidate anything.
+    """
+    if not instance.is_doctor:
+        return
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        return
+    _invalidate_on_commit(cache.DOCTORS)
+
+
+@receiver(post_save, sender=User)
+def touch_user_profiles(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Profiles are rendered with their user's name and contact details, so their
+    updated_at (and the ETags built from it) moves when those change.
+    """
+    if created:
+        return
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        return
+    now = timezone.now()
+    if instance.is_doctor:
+        DoctorProfile.all_objects.filter(user_id=instance.pk).update(updated_at=now)
+    if instance.is_patient:
+        PatientProfile.all_objects.filter(user_id=instance.pk).update(updated_at=now)
+
+
+@receiver(post_save, sender=User)
+def forget_cached_user_active(sender, instance, created, **kwargs):
+    # Stateless JWT authentication caches is_active; re-read it after changes.
+    if not created:
+        transaction.on_commit(lambda: forget_user_active(instance.pk))
+
+
+@receiver(post_save, sender=DoctorProfile)
+def refresh_doctor_search_document(sender, instance, update_fields=None, **kwargs):
+    searched = {"address", "specialization", "specialization_id"}
+    if update_fields is not None and not searched & set(update_fields):
+        return
+    # The UPDATE also rewrites the FTS index row, so skip it when the
+    # searched fields are the ones remember_doctor_state read.
+    previous = getattr(instance, "_previous_doctor_state", None)
+    if previous is not None and (
+        previous["address"] == instance.address
+        and previous["specialization_id"] == instance.specialization_id
+    ):
+        return
+    refresh_search_documents(DoctorProfile.all_objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=User)
+def refresh_doctor_user_search_document(
+    sender, instance, update_fields=None, **kwargs
+):
+    if not instance.is_doctor:
+        return
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        return
+    refresh_search_documents(DoctorProfile.all_objects.filter(user_id=instance.pk))
+
+
+@receiver(pre_save, sender=Specialization)
+def remember_specialization_name(sender, instance, **kwargs):
+    previous = None
+    if not instance._state.adding and instance.pk is not None:
+        previous = (
+            Specialization.all_objects.filter(pk=instance.pk)
+            .values_list("name", flat=True)
+            .first()
+        )
+    instance._previous_name = previous
+
+
+@receiver(post_save, sender=Specialization)
+def refresh_specialization_search_documents(sender, instance, created, **kwargs):
+    # Only the name is searched; other edits leave the doctors' documents.
+    if created or getattr(instance, "_previous_name", None) == instance.name:
+        return
+    refresh_search_documents(
+        DoctorProfile.all_objects.filter(specialization_id=instance.pk)
+    )
@@ -1,3 +1,2257 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+import math
+import tempfile
+import threading
+import time as time_module
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from pathlib import Path
 
-# Create your tests here.
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, connections
+from django.test import (
+    AsyncClient,
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, reverse
+from django.utils import timezone
+from unittest import mock
+
+from prometheus_client import REGISTRY
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .models import (
+    User,
+    PatientProfile,
+    DoctorProfile,
+    TimeSlot,
+    ScheduleTemplate,
+    Appointment,
+    ArchivedAppointment,
+    Specialization,
+)
+from .pagination import AppointmentPagination
+from .serializers import (
+    AppointmentSerializer,
+    DoctorSerializer,
+    PatientSerializer,
+    TimeSlotSerializer,
+)
+from . import cache as reference_cache
+from .authentication import StatelessJWTAuthentication
+from .checks import check_doctor_search_triggers, check_replica_pin_cache
+from .search import FTS_TRIGGERS
+from .tokens import blacklist_filter
+from . import replicas
+from . import urls as appointment_urls
+from .metrics import metrics_view
+
+
+def create_patient(email, first_name="Pat", last_name="Ient"):
+    user = User.objects.create_user(
+        email=email, password="password123", first_name=first_name, last_name=last_name
+    )
+    user.is_patient = True
+    user.save()
+    return PatientProfile.objects.create(
+        user=user, date_of_birth=date(1990, 1, 1), address="1 Main Street"
+    )
+
+
+def create_doctor(email, specialization=None, first_name="Doc", last_name="Tor"):
+    user = User.objects.create_user(
+        email=email, password="password123", first_name=first_name, last_name=last_name
+    )
+    user.is_doctor = True
+    user.save()
+    return DoctorProfile.objects.create(
+        user=user,
+        specialization=specialization,
+        experience_years=5,
+        address="2 Clinic Road",
+    )
+
+
+def create_admin(email="admin@example.com"):
+    return User.objects.create_superuser(
+        email=email, password="password123", first_name="Ad", last_name="Min"
+    )
+
+
+# Hashing is not under test; keep fixtures fast.
+FAST_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class QueryBudgetTestCase(TestCase):
+    """
+    Base class for tests that assert an endpoint stays within a fixed query budget.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        # Cache invalidation runs on commit, which never happens inside TestCase.
+        reference_cache.get_cache().clear()
+
+    def assertMaxQueries(self, max_queries, url, user, params=None):
+        self.client.force_authenticate(user=user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertLessEqual(
+            len(ctx.captured_queries),
+            max_queries,
+            f"{url} ran {len(ctx.captured_queries)} queries (limit {max_queries}):\n"
+            + "\n".join(query["sql"] for query in ctx.captured_queries),
+        )
+        return response
+
+
+class ListEndpointQueryLimitTests(QueryBudgetTestCase):
+    """
+    Each list page must cost a fixed number of queries (COUNT + SELECT),
+    regardless of how many rows the page holds.
+    """
+
+    LIST_QUERY_LIMIT = 2
+    ROWS = 15
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_admin()
+        specialization = Specialization.objects.create(name="Cardiology")
+        doctors = [
+            create_doctor(f"doctor{i}@example.com", specialization)
+            for i in range(cls.ROWS)
+        ]
+        patients = [create_patient(f"patient{i}@example.com") for i in range(cls.ROWS)]
+        for i, (doctor, patient) in enumerate(zip(doctors, patients)):
+            TimeSlot.objects.create(
+                doctor=doctor,
+                date=date(2030, 1, 1),
+                start_time=time(9, 0),
+                end_time=time(9, 30),
+            )
+            Appointment.objects.create(
+                doctor=doctor,
+                patient=patient,
+                appointment_date=timezone.now() + timedelta(days=i + 1),
+            )
+
+    def test_appointments_list(self):
+        response = self.assertMaxQueries(
+            self.LIST_QUERY_LIMIT, reverse("appointments-list"), self.admin
+        )
+        self.assertEqual(len(response.data["results"]), self.ROWS)
+        self.assertEqual(response.data["results"][0]["doctor"], "Doc Tor")
+        self.assertEqual(response.data["results"][0]["patient"], "Pat Ient")
+
+    def test_time_slots_list(self):
+        response = self.assertMaxQueries(
+            self.LIST_QUERY_LIMIT, reverse("time-slots-list"), self.admin
+        )
+        self.assertEqual(len(response.data["results"]), self.ROWS)
+
+    def test_patients_list(self):
+        response = self.assertMaxQueries(
+            self.LIST_QUERY_LIMIT, reverse("patients-list"), self.admin
+        )
+        self.assertEqual(len(response.data["results"]), self.ROWS)
+
+    def test_doctors_list(self):
+        response = self.assertMaxQueries(
+            self.LIST_QUERY_LIMIT, reverse("doctors-list"), self.admin
+        )
+        self.assertEqual(len(response.data["results"]), self.ROWS)
+
+
+class DashboardQueryLimitTests(QueryBudgetTestCase):
+    """
+    Dashboards must cost the same number of queries however long the
+    patient's or doctor's appointment history is.
+    """
+
+    # One aggregate for the summary plus one query for the appointment lists.
+    DASHBOARD_QUERY_LIMIT = 2
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_admin()
+        cls.doctor = create_doctor("doctor@example.com")
+        cls.patient = create_patient("patient@example.com")
+        now = timezone.now()
+        for i, status in enumerate([1, 2, 2, 3, 4, 4, 4]):
+            Appointment.objects.create(
+                doctor=cls.doctor,
+                patient=cls.patient,
+                status=status,
+                appointment_date=now + timedelta(days=i + 1),
+            )
+        cls.todays_appointment = Appointment.objects.create(
+            doctor=cls.doctor,
+            patient=cls.patient,
+            status=1,
+            appointment_date=now.replace(hour=12, minute=0, second=0, microsecond=0),
+        )
+
+    def test_patient_dashboard(self):
+        response = self.assertMaxQueries(
+            self.DASHBOARD_QUERY_LIMIT,
+            reverse("patient-appointments"),
+            self.patient.user,
+        )
+        self.assertEqual(
+            response.data["summary"],
+            {"pending": 2, "confirmed": 2, "cancelled": 1, "completed": 3},
+        )
+        self.assertEqual(len(response.data["upcoming_appointments"]), 2)
+        self.assertEqual(response.data["upcoming_appointments"][0]["doctor"], "Doc Tor")
+
+    def test_doctor_dashboard(self):
+        response = self.assertMaxQueries(
+            self.DASHBOARD_QUERY_LIMIT,
+            reverse("doctor-appointments"),
+            self.doctor.user,
+        )
+        self.assertEqual(
+            response.data["summary"],
+            {"pending": 2, "confirmed": 2, "cancelled": 1, "completed": 3},
+        )
+        self.assertEqual(len(response.data["upcoming_appointments"]), 2)
+        self.assertEqual(
+            [row["id"] for row in response.data["todays_appointments"]],
+            [self.todays_appointment.id],
+        )
+        self.assertEqual(response.data["todays_appointments"][0]["patient"], "Pat Ient")
+
+    def test_admin_doctor_dashboard(self):
+        # The extra query resolves the requested doctor profile.
+        self.assertMaxQueries(
+            self.DASHBOARD_QUERY_LIMIT + 1,
+            reverse("doctor-appointments"),
+            self.admin,
+            {"doctor_id": self.doctor.id},
+        )
+
+
+class SpecializationDoctorCountTests(QueryBudgetTestCase):
+    """
+    doctor_count ignores soft-deleted doctors, and the list costs a fixed
+    number of queries whether the count is annotated or read from the counter.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_admin()
+        cls.cardiology = Specialization.objects.create(name="Cardiology")
+        cls.neurology = Specialization.objects.create(name="Neurology")
+        for i in range(3):
+            create_doctor(f"cardio{i}@example.com", cls.cardiology)
+        create_doctor("neuro@example.com", cls.neurology).delete()
+
+    def get_counts(self, response):
+        return {row["name"]: row["doctor_count"] for row in response.data["results"]}
+
+    def test_list_annotates_active_doctor_count(self):
+        response = self.assertMaxQueries(
+            2, reverse("specializations-list-create"), self.admin
+        )
+        self.assertEqual(self.get_counts(response), {"Cardiology": 3, "Neurology": 0})
+
+    @override_settings(CACHED_SPECIALIZATION_DOCTOR_COUNT=True)
+    def test_list_uses_cached_counter(self):
+        response = self.assertMaxQueries(
+            2, reverse("specializations-list-create"), self.admin
+        )
+        self.assertEqual(self.get_counts(response), {"Cardiology": 3, "Neurology": 0})
+
+    def test_counter_follows_doctor_lifecycle(self):
+        doctor = create_doctor("moving@example.com", self.cardiology)
+        self.cardiology.refresh_from_db()
+        self.assertEqual(self.cardiology.doctor_count, 4)
+
+        doctor.specialization = self.neurology
+        doctor.save()
+        self.cardiology.refresh_from_db()
+        self.neurology.refresh_from_db()
+        self.assertEqual(self.cardiology.doctor_count, 3)
+        self.assertEqual(self.neurology.doctor_count, 1)
+
+        doctor.delete()
+        self.neurology.refresh_from_db()
+        self.assertEqual(self.neurology.doctor_count, 0)
+
+        doctor.restore()
+        self.neurology.refresh_from_db()
+        self.assertEqual(self.neurology.doctor_count, 1)
+
+        DoctorProfile.all_objects.filter(pk=doctor.pk).get().user.delete()
+        self.neurology.refresh_from_db()
+        self.assertEqual(self.neurology.doctor_count, 0)
+
+
+class HotQueryIndexTests(TestCase):
+    """
+    EXPLAIN the hot dashboard and time-slot queries and check they are served
+    by the partial composite indexes rather than a table scan.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = create_doctor("doctor@example.com")
+        cls.patient = create_patient("patient@example.com")
+
+    def setUp(self):
+        if connection.vendor == "postgresql":
+            # Tiny test tables make a sequential scan look cheapest to the planner.
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+
+    def test_doctor_appointments_by_status_use_index(self):
+        self.assertUsesIndex(
+            Appointment.objects.filter(
+                doctor_id=self.doctor.id, status=2, appointment_date__gte=timezone.now()
+            ),
+            "appt_doctor_status_date_idx",
+        )
+
+    def test_patient_appointments_by_status_use_index(self):
+        self.assertUsesIndex(
+            Appointment.objects.filter(
+                patient_id=self.patient.id,
+                status=2,
+                appointment_date__gte=timezone.now(),
+            ),
+            "appt_patient_status_date_idx",
+        )
+
+    def test_time_slots_by_doctor_and_date_use_index(self):
+        self.assertUsesIndex(
+            TimeSlot.objects.filter(doctor_id=self.doctor.id, date=date(2030, 1, 1)),
+            "timeslot_doctor_date_idx",
+        )
+
+
+class KeysetPaginationTests(QueryBudgetTestCase):
+    """
+    Cursor pages walk the whole list in order without COUNT(*) or OFFSET.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_admin()
+        doctor = create_doctor("doctor@example.com")
+        patient = create_patient("patient@example.com")
+        start = timezone.now().replace(microsecond=123456)
+        # Pairs share an appointment_date so the id tie-breaker is exercised.
+        for i in range(9):
+            Appointment.objects.create(
+                doctor=doctor,
+                patient=patient,
+                appointment_date=start + timedelta(hours=i // 2),
+            )
+            TimeSlot.objects.create(
+                doctor=doctor,
+                date=date(2030, 1, 1) + timedelta(days=i // 3),
+                start_time=time(9 + i % 3, 0),
+                end_time=time(9 + i % 3, 30),
+            )
+
+    def walk(self, url, ordered_ids):
+        self.client.force_authenticate(user=self.admin)
+        seen = []
+        next_url = f"{url}?cursor=&limit=4"
+        while next_url:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(next_url)
+            self.assertEqual(response.status_code, 200, response.content)
+            self.assertEqual(len(ctx.captured_queries), 1)
+            self.assertNotIn("count", response.data)
+            self.assertIsNone(response.data["previous"])
+            seen.extend(row["id"] for row in response.data["results"])
+            next_url = response.data["next"]
+        self.assertEqual(seen, ordered_ids)
+
+    def test_appointment_cursor_pages(self):
+        ordered_ids = list(
+            Appointment.objects.order_by("appointment_date", "id").values_list(
+                "id", flat=True
+            )
+        )
+        self.walk(reverse("appointments-list"), ordered_ids)
+
+    def test_time_slot_cursor_pages(self):
+        ordered_ids = list(
+            TimeSlot.objects.order_by("date", "start_time", "id").values_list(
+                "id", flat=True
+            )
+        )
+        self.walk(reverse("time-slots-list"), ordered_ids)
+
+    def test_count_is_optional(self):
+        url = reverse("appointments-list")
+        response = self.assertMaxQueries(2, url, self.admin, {"cursor": "", "count": "true"})
+        self.assertEqual(response.data["count"], 9)
+        response = self.assertMaxQueries(1, url, self.admin, {"count": "false"})
+        self.assertNotIn("count", response.data)
+        self.assertEqual(len(response.data["results"]), 9)
+
+    def test_invalid_cursor(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(reverse("appointments-list"), {"cursor": "garbage"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_keyset_query_uses_index(self):
+        pagination = AppointmentPagination()
+        queryset = Appointment.objects.filter(
+            pagination.get_keyset_filter([timezone.now(), 1])
+        ).order_by("appointment_date", "id")[:100]
+        self.assertIn("appt_keyset_idx", queryset.explain())
+
+
+class NextAvailableTimeSlotsTests(QueryBudgetTestCase):
+    """
+    The availability search returns the earliest open slots across doctors
+    in a single query.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cardiology = Specialization.objects.create(name="Cardiology")
+        neurology = Specialization.objects.create(name="Neurology")
+        cls.patient = create_patient("patient@example.com")
+        first = create_doctor("first@example.com", cls.cardiology)
+        second = create_doctor("second@example.com", cls.cardiology)
+        other = create_doctor("other@example.com", neurology)
+        retired = create_doctor("retired@example.com", cls.cardiology)
+        inactive = create_doctor("inactive@example.com", cls.cardiology)
+        User.objects.filter(pk=inactive.user_id).update(is_active=False)
+
+        cls.day = timezone.now().date() + timedelta(days=1)
+        next_day = cls.day + timedelta(days=1)
+
+        def slot(doctor, day, hour, **kwargs):
+            return TimeSlot.objects.create(
+                doctor=doctor,
+                date=day,
+                start_time=time(hour, 0),
+                end_time=time(hour, 30),
+                **kwargs,
+            )
+
+        cls.expected = [
+            slot(second, cls.day, 9),
+            slot(first, cls.day, 10),
+            slot(first, next_day, 8),
+        ]
+        slot(first, cls.day, 8, is_available=False)
+        slot(other, cls.day, 7)
+        slot(retired, cls.day, 7)
+        slot(inactive, cls.day, 7)
+        # Started already.
+        TimeSlot.objects.create(
+            doctor=first,
+            date=timezone.localdate(),
+            start_time=time(0, 0),
+            end_time=time(0, 30),
+        )
+        slot(second, cls.day + timedelta(days=60), 7)
+        retired.delete()
+
+    def test_earliest_slots_for_specialization(self):
+        response = self.assertMaxQueries(
+            1,
+            reverse("time-slots-available"),
+            self.patient.user,
+            {"specialization": self.cardiology.id, "limit": 3},
+        )
+        self.assertEqual(
+            [row["id"] for row in response.data], [s.id for s in self.expected]
+        )
+        self.assertEqual(response.data[0]["doctor_id"], self.expected[0].doctor_id)
+
+    def test_limit_and_date_range(self):
+        response = self.assertMaxQueries(
+            1,
+            reverse("time-slots-available"),
+            self.patient.user,
+            {
+                "specialization": self.cardiology.id,
+                "date_from": self.day,
+                "date_to": self.day,
+                "limit": 1,
+            },
+        )
+        self.assertEqual([row["id"] for row in response.data], [self.expected[0].id])
+
+    def test_invalid_range(self):
+        self.client.force_authenticate(user=self.patient.user)
+        response = self.client.get(
+            reverse("time-slots-available"),
+            {"date_from": self.day, "date_to": self.day - timedelta(days=1)},
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_search_uses_available_index(self):
+        queryset = TimeSlot.objects.filter(
+            is_available=True, date__gte=self.day, date__lte=self.day
+        ).order_by("date", "start_time", "id")[:10]
+        self.assertIn("timeslot_available_idx", queryset.explain())
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class ScheduleTemplateTests(TestCase):
+    """
+    Schedule templates expand into time slots with batched inserts, skip
+    overlapping slots and are idempotent.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = create_doctor("doctor@example.com")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.doctor.user)
+
+    def create_template(self, **overrides):
+        data = {
+            "weekday": 0,
+            "start_time": "09:00",
+            "end_time": "12:00",
+            "slot_minutes": 30,
+            "start_date": "2030-01-01",  # a Tuesday
+            "end_date": "2030-01-31",
+            "exceptions": ["2030-01-14"],
+        }
+        data.update(overrides)
+        return self.client.post(reverse("schedule-templates-create"), data, format="json")
+
+    def test_create_generates_slots(self):
+        response = self.create_template()
+        self.assertEqual(response.status_code, 201, response.content)
+        # Mondays 7, 21 and 28 (the 14th is an exception), six slots each.
+        self.assertEqual(response.data["created_slots"], 18)
+        self.assertEqual(
+            sorted(set(TimeSlot.objects.values_list("date", flat=True))),
+            [date(2030, 1, 7), date(2030, 1, 21), date(2030, 1, 28)],
+        )
+        last = TimeSlot.objects.order_by("date", "start_time").last()
+        self.assertEqual((last.start_time, last.end_time), (time(11, 30), time(12, 0)))
+
+    def test_generate_is_idempotent_and_skips_overlaps(self):
+        TimeSlot.objects.create(
+            doctor=self.doctor,
+            date=date(2030, 1, 7),
+            start_time=time(9, 15),
+            end_time=time(9, 45),
+        )
+        response = self.create_template()
+        self.assertEqual(response.data["created_slots"], 16)
+        self.assertEqual(response.data["skipped_slots"], 2)
+
+        response = self.client.post(
+            reverse("schedule-template-generate", args=[response.data["id"]])
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {"created_slots": 0, "skipped_slots": 18})
+        self.assertEqual(TimeSlot.objects.count(), 17)
+
+    def test_large_template_uses_batched_queries(self):
+        template = ScheduleTemplate.objects.create(
+            doctor=self.doctor,
+            weekday=2,
+            start_time=time(0, 0),
+            end_time=time(23, 55),
+            slot_minutes=5,
+            start_date=date(2030, 1, 1),
+            end_date=date(2030, 12, 31),
+        )
+        with CaptureQueriesContext(connection) as ctx:
+            created, skipped = template.generate_time_slots()
+        self.assertEqual((created, skipped), (52 * 287, 0))
+        # One overlap lookup plus one INSERT per batch (SQLite caps batches
+        # by its bound-parameter limit).
+        fields = [f for f in TimeSlot._meta.concrete_fields if not f.primary_key]
+        batch_size = min(1000, connection.ops.bulk_batch_size(fields, range(created)))
+        self.assertLessEqual(
+            len(ctx.captured_queries), 1 + math.ceil(created / batch_size)
+        )
+
+    def test_only_doctors_create_templates(self):
+        self.client.force_authenticate(user=create_patient("p@example.com").user)
+        self.assertEqual(self.create_template().status_code, 403)
+
+    def test_invalid_template(self):
+        response = self.create_template(start_time="12:00", end_time="09:00")
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class AppointmentBookingTests(TestCase):
+    """
+    Booking claims the time slot and links it to the new appointment.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = create_doctor("doctor@example.com")
+        cls.patient = create_patient("patient@example.com")
+        cls.other_patient = create_patient("other@example.com")
+        cls.slot = TimeSlot.objects.create(
+            doctor=cls.doctor,
+            date=timezone.now().date() + timedelta(days=1),
+            start_time=time(9, 0),
+            end_time=time(9, 30),
+        )
+
+    def book(self, patient, slot_id):
+        client = APIClient()
+        client.force_authenticate(user=patient.user)
+        return client.post(
+            reverse("appointments-book"), {"time_slot": slot_id}, format="json"
+        )
+
+    def test_book_claims_slot(self):
+        response = self.book(self.patient, self.slot.id)
+        self.assertEqual(response.status_code, 201, response.content)
+        appointment = Appointment.objects.get(pk=response.data["id"])
+        self.assertEqual(appointment.time_slot_id, self.slot.id)
+        self.assertEqual(appointment.doctor_id, self.doctor.id)
+        self.assertEqual(appointment.appointment_date.time(), time(9, 0))
+        self.slot.refresh_from_db()
+        self.assertFalse(self.slot.is_available)
+
+    def test_second_booking_conflicts(self):
+        self.assertEqual(self.book(self.patient, self.slot.id).status_code, 201)
+        self.assertEqual(self.book(self.other_patient, self.slot.id).status_code, 409)
+        self.assertEqual(Appointment.objects.filter(time_slot=self.slot).count(), 1)
+
+    def test_reopened_slot_is_still_guarded(self):
+        self.assertEqual(self.book(self.patient, self.slot.id).status_code, 201)
+        TimeSlot.objects.filter(pk=self.slot.pk).update(is_available=True)
+        self.assertEqual(self.book(self.other_patient, self.slot.id).status_code, 409)
+
+    def test_missing_slot_is_not_a_conflict(self):
+        conflicts = REGISTRY.get_sample_value("careconnect_booking_conflicts_total")
+        self.assertEqual(self.book(self.patient, 999999).status_code, 404)
+        self.assertEqual(
+            REGISTRY.get_sample_value("careconnect_booking_conflicts_total"),
+            conflicts,
+        )
+
+    def test_started_slot_cannot_be_booked(self):
+        started = TimeSlot.objects.create(
+            doctor=self.doctor,
+            date=timezone.localdate(),
+            start_time=time(0, 0),
+            end_time=time(0, 30),
+        )
+        self.assertEqual(self.book(self.patient, started.id).status_code, 409)
+        self.assertFalse(Appointment.objects.filter(time_slot=started).exists())
+
+    def test_only_patients_book(self):
+        client = APIClient()
+        client.force_authenticate(user=self.doctor.user)
+        response = client.post(
+            reverse("appointments-book"), {"time_slot": self.slot.id}, format="json"
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class ConcurrentBookingTests(TransactionTestCase):
+    """
+    Many threads racing for the same slot produce exactly one appointment.
+
+    Threads need real concurrent connections, which SQLite's shared-cache
+    in-memory test database does not model; set TEST_DATABASE_NAME to a file
+    path (or use PostgreSQL) to run it.
+    """
+
+    THREADS = 8
+
+    def test_one_slot_one_appointment(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("needs a database that supports concurrent connections")
+
+        doctor = create_doctor("doctor@example.com")
+        patients = [
+            create_patient(f"patient{i}@example.com") for i in range(self.THREADS)
+        ]
+        slot = TimeSlot.objects.create(
+            doctor=doctor,
+            date=timezone.now().date() + timedelta(days=1),
+            start_time=time(9, 0),
+            end_time=time(9, 30),
+        )
+        barrier = threading.Barrier(self.THREADS)
+        results = []
+
+        def book(patient):
+            client = APIClient()
+            client.force_authenticate(user=patient.user)
+            barrier.wait()
+            try:
+                response = client.post(
+                    reverse("appointments-book"), {"time_slot": slot.id}, format="json"
+                )
+                results.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=book, args=(p,)) for p in patients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(results), [201] + [409] * (self.THREADS - 1))
+        self.assertEqual(Appointment.objects.filter(time_slot=slot).count(), 1)
+
+
+class ReferenceCacheTests(QueryBudgetTestCase):
+    """
+    Doctor and specialization responses are served from the cache until the
+    underlying rows change.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_admin()
+        cls.specialization = Specialization.objects.create(name="Cardiology")
+        cls.doctor = create_doctor("doctor@example.com", cls.specialization)
+
+    def test_doctor_list_is_cached_until_doctor_changes(self):
+        url = reverse("doctors-list")
+        self.assertMaxQueries(2, url, self.admin)
+        response = self.assertMaxQueries(0, url, self.admin)
+        self.assertEqual(response.data["results"][0]["first_name"], "Doc")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.doctor.user.first_name = "Changed"
+            self.doctor.user.save()
+        response = self.assertMaxQueries(2, url, self.admin)
+        self.assertEqual(response.data["results"][0]["first_name"], "Changed")
+
+    def test_specialization_list_invalidated_by_doctor_soft_delete(self):
+        url = reverse("specializations-list-create")
+        self.assertMaxQueries(2, url, self.admin)
+        self.assertMaxQueries(0, url, self.admin)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.doctor.delete()
+        response = self.assertMaxQueries(2, url, self.admin)
+        self.assertEqual(response.data["results"][0]["doctor_count"], 0)
+
+    def test_login_does_not_invalidate(self):
+        url = reverse("doctors-list")
+        self.assertMaxQueries(2, url, self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("login"),
+                {"email": "doctor@example.com", "password": "password123"},
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertMaxQueries(0, url, self.admin)
+
+    def test_stats_report_hits_and_misses(self):
+        url = reverse("specialization-detail", args=[self.specialization.id])
+        self.assertMaxQueries(1, url, self.admin)
+        self.assertMaxQueries(0, url, self.admin)
+        self.assertMaxQueries(0, url, self.admin)
+
+        response = self.assertMaxQueries(0, reverse("cache-stats"), self.admin)
+        self.assertEqual(
+            response.data["specializations"],
+            {"hits": 2, "misses": 1, "hit_rate": round(2 / 3, 4)},
+        )
+
+    def test_permissions_still_apply_to_cached_responses(self):
+        url = reverse("doctors-list")
+        self.assertMaxQueries(2, url, self.admin)
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+
+@mock.patch.object(APIView, "authentication_classes", [StatelessJWTAuthentication])
+class StatelessJWTAuthenticationTests(QueryBudgetTestCase):
+    """
+    With stateless JWT authentication, role checks on the hot paths read the
+    token claims and need no user or profile queries.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = create_doctor("doctor@example.com")
+        cls.patient = create_patient("patient@example.com")
+        cls.appointment = Appointment.objects.create(
+            doctor=cls.doctor,
+            patient=cls.patient,
+            status=2,
+            appointment_date=timezone.now() + timedelta(days=1),
+        )
+
+    def login(self, email):
+        response = self.client.post(
+            reverse("login"), {"email": email, "password": "password123"}
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data["access"]
+
+    def get(self, access, url, max_queries):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertLessEqual(len(ctx.captured_queries), max_queries)
+        return response
+
+    def test_token_carries_role_claims(self):
+        token = AccessToken(self.login("patient@example.com"))
+        self.assertTrue(token["is_patient"])
+        self.assertFalse(token["is_doctor"])
+        self.assertEqual(token["patient_id"], self.patient.id)
+        self.assertIsNone(token["doctor_id"])
+
+    def test_hot_paths_skip_user_and_profile_queries(self):
+        access = self.login("patient@example.com")
+        url = reverse("appointment-update", args=[self.appointment.id])
+        # The first request reads and caches the user's active flag.
+        self.assertEqual(self.get(access, url, 2).status_code, 200)
+        self.assertEqual(self.get(access, url, 1).status_code, 200)
+        self.assertEqual(
+            self.get(access, reverse("patient-appointments"), 2).status_code, 200
+        )
+
+        doctor_access = self.login("doctor@example.com")
+        self.get(doctor_access, url, 2)
+        response = self.get(doctor_access, url, 1)
+        self.assertEqual(response.data["patient"], "Pat Ient")
+
+    def test_other_patients_are_still_denied(self):
+        other = create_patient("other@example.com")
+        access = self.login(other.user.email)
+        url = reverse("appointment-update", args=[self.appointment.id])
+        self.assertEqual(self.get(access, url, 2).status_code, 403)
+
+    def test_deactivated_user_is_rejected(self):
+        access = self.login("patient@example.com")
+        url = reverse("patient-appointments")
+        self.assertEqual(self.get(access, url, 3).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.patient.user.is_active = False
+            self.patient.user.save()
+        self.assertEqual(self.get(access, url, 1).status_code, 401)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class LoginTests(QueryBudgetTestCase):
+    """
+    Login resolves the user and their role in a single query.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = create_doctor("doctor@example.com")
+        cls.patient = create_patient("patient@example.com")
+        cls.admin = create_admin()
+
+    def login(self, email):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(
+                reverse("login"), {"email": email, "password": "password123"}
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        # The only other statement records the refresh token for the blacklist.
+        selects = [q for q in ctx.captured_queries if q["sql"].startswith("SELECT")]
+        self.assertEqual(len(selects), 1)
+        return response.data
+
+    def test_login_user_types(self):
+        self.assertEqual(self.login("patient@example.com")["user_type"], "patient")
+        self.assertEqual(self.login("doctor@example.com")["user_type"], "doctor")
+        self.assertEqual(self.login("admin@example.com")["user_type"], "admin")
+
+    def test_wrong_password(self):
+        response = self.client.post(
+            reverse("login"), {"email": "patient@example.com", "password": "nope"}
+        )
+        self.assertEqual(response.status_code, 401)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class AsyncLoginTests(TransactionTestCase):
+    """
+    The async login hashes on its own thread pool, which uses separate
+    database connections, so the fixtures have to be committed.
+    """
+
+    def setUp(self):
+        create_patient("patient@example.com")
+
+    async def test_async_login(self):
+        client = AsyncClient()
+        response = await client.post(
+            reverse("login-async"),
+            {"email": "patient@example.com", "password": "password123"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        self.assertEqual(data["user_type"], "patient")
+        self.assertIn("access", data)
+
+        response = await client.post(
+            reverse("login-async"),
+            {"email": "patient@example.com", "password": "wrong"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 401)
+
+    async def test_login_threads_recycle_their_connections(self):
+        with mock.patch(
+            "appointment.async_views.close_old_connections"
+        ) as close_old_connections:
+            response = await AsyncClient().post(
+                reverse("login-async"),
+                {"email": "patient@example.com", "password": "password123"},
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        # Before and after the work, on the login thread.
+        self.assertEqual(close_old_connections.call_count, 2)
+
+    async def test_async_login_rejects_bad_input(self):
+        client = AsyncClient()
+        response = await client.post(
+            reverse("login-async"), "not json", content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+        response = await client.post(
+            reverse("login-async"), {}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("email", response.json())
+
+
+class TokenBlacklistTests(QueryBudgetTestCase):
+    """
+    Expired blacklist rows are pruned in batches, and replayed refresh tokens
+    are refused from the in-process filter.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_patient("patient@example.com").user
+        cls.admin = create_admin()
+
+    def setUp(self):
+        super().setUp()
+        blacklist_filter.clear()
+
+    def expire(self, token):
+        OutstandingToken.objects.filter(jti=token["jti"]).update(
+            expires_at=timezone.now() - timedelta(days=1)
+        )
+
+    def test_prune_deletes_expired_rows_in_batches(self):
+        tokens = [RefreshToken.for_user(self.user) for _ in range(7)]
+        for token in tokens[:5]:
+            token.blacklist()
+            self.expire(token)
+        tokens[5].blacklist()
+
+        out = StringIO()
+        call_command("prune_token_blacklist", batch_size=2, stdout=out)
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(
+            report["deleted"], {"outstanding": 5, "blacklisted": 5, "batches": 3}
+        )
+        self.assertEqual(report["outstanding"], 2)
+        self.assertEqual(report["blacklisted"], 1)
+        self.assertEqual(report["expired"], 0)
+        self.assertTrue(BlacklistedToken.objects.filter(token__jti=tokens[5]["jti"]))
+
+    def test_replayed_refresh_token_is_refused_without_queries(self):
+        refresh = str(RefreshToken.for_user(self.user))
+        url = reverse("token_refresh")
+
+        response = self.client.post(url, {"refresh": refresh})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertNotEqual(response.data["refresh"], refresh)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(url, {"refresh": refresh})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        # A token blacklisted by another worker is still found in the database.
+        other = RefreshToken.for_user(self.user)
+        RefreshToken(str(other)).blacklist()
+        response = self.client.post(url, {"refresh": str(other)})
+        self.assertEqual(response.status_code, 401)
+
+    def test_stats(self):
+        RefreshToken.for_user(self.user).blacklist()
+        self.client.force_authenticate(user=self.user)
+        url = reverse("token-blacklist-stats")
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["outstanding"], 1)
+        self.assertEqual(response.data["blacklisted"], 1)
+        self.assertIn("avg_check_ms", response.data["filter"])
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class AsyncListViewTests(TestCase):
+    """
+    The async list and dashboard views answer exactly like their sync
+    counterparts.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_admin()
+        cls.doctor = create_doctor("doctor@example.com")
+        cls.patient = create_patient("patient@example.com")
+        now = timezone.now()
+        for i, status in enumerate([1, 2, 2, 3, 4]):
+            Appointment.objects.create(
+                doctor=cls.doctor,
+                patient=cls.patient,
+                status=status,
+                appointment_date=now + timedelta(days=i),
+            )
+        for hour in range(9, 14):
+            TimeSlot.objects.create(
+                doctor=cls.doctor,
+                date=date(2030, 1, 1),
+                start_time=time(hour),
+                end_time=time(hour, 30),
+            )
+
+    def setUp(self):
+        reference_cache.get_cache().clear()
+
+    async def get(self, user, name, params=None):
+        headers = {}
+        if user is not None:
+            headers["Authorization"] = f"Bearer {AccessToken.for_user(user)}"
+        return await AsyncClient().get(reverse(name), params or {}, headers=headers)
+
+    async def assertSameResponse(self, user, name, params=None):
+        sync_response = await self.get(user, name, params)
+        async_response = await self.get(user, f"{name}-async", params)
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        # Pagination links point back at the endpoint that was called.
+        self.assertEqual(
+            json.loads(async_response.content.decode().replace("-async/", "/")),
+            sync_response.json(),
+        )
+        return async_response
+
+    async def test_dashboards(self):
+        response = await self.assertSameResponse(
+            self.patient.user, "patient-appointments"
+        )
+        self.assertEqual(response.json()["summary"]["confirmed"], 2)
+        await self.assertSameResponse(self.doctor.user, "doctor-appointments")
+        await self.assertSameResponse(
+            self.admin, "doctor-appointments", {"doctor_id": self.doctor.id}
+        )
+        await self.assertSameResponse(
+            self.admin, "patient-appointments", {"patient_id": self.patient.id}
+        )
+
+    async def test_lists(self):
+        await self.assertSameResponse(self.patient.user, "doctors-list")
+        response = await self.assertSameResponse(
+            self.patient.user, "time-slots-list", {"limit": 2, "cursor": ""}
+        )
+        cursor = response.json()["next"].split("cursor=")[1].split("&")[0]
+        await self.assertSameResponse(
+            self.patient.user, "time-slots-list", {"limit": 2, "cursor": cursor}
+        )
+        await self.assertSameResponse(
+            self.patient.user, "doctors-list", {"fields": "first_name,email"}
+        )
+        for params in ({"limit": 1, "cursor": ""}, {"limit": 1, "count": "false"}):
+            await self.assertSameResponse(self.patient.user, "doctors-list", params)
+        await self.assertSameResponse(
+            self.patient.user, "time-slots-list", {"fields": "id,doctor"}
+        )
+
+    async def test_errors(self):
+        response = await self.get(None, "patient-appointments-async")
+        self.assertEqual(response.status_code, 401)
+        response = await self.get(self.doctor.user, "patient-appointments-async")
+        self.assertEqual(response.status_code, 403)
+        response = await self.get(
+            self.admin, "patient-appointments-async", {"patient_id": 999999}
+        )
+        self.assertEqual(response.status_code, 404)
+        response = await self.get(self.admin, "doctor-appointments-async")
+        self.assertEqual(response.status_code, 400)
+        response = await AsyncClient().post(reverse("time-slots-list-async"))
+        self.assertEqual(response.status_code, 405)
+        response = await self.get(
+            self.admin, "time-slots-list-async", {"fields": "id,password"}
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class AppointmentStatusTransitionTests(QueryBudgetTestCase):
+    """
+    Doctors and admins change many appointments with one SELECT and one UPDATE.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_admin()
+        cls.doctor = create_doctor("doctor@example.com")
+        cls.other_doctor = create_doctor("other@example.com")
+        cls.patient = create_patient("patient@example.com")
+        when = timezone.now() + timedelta(days=1)
+        cls.slot = TimeSlot.objects.create(
+            doctor=cls.doctor,
+            date=when.date(),
+            start_time=time(9),
+            end_time=time(9, 30),
+            is_available=False,
+        )
+        cls.pending, cls.confirmed, cls.completed = [
+            Appointment.objects.create(
+                doctor=cls.doctor,
+                patient=cls.patient,
+                status=status,
+                appointment_date=when,
+                time_slot=cls.slot if status == 2 else None,
+            )
+            for status in (1, 2, 4)
+        ]
+        cls.others = Appointment.objects.create(
+            doctor=cls.other_doctor,
+            patient=cls.patient,
+            status=1,
+            appointment_date=when,
+        )
+
+    def transition(self, user, ids, target):
+        self.client.force_authenticate(user=user)
+        return self.client.post(
+            reverse("appointments-status"), {"ids": ids, "status": target}, format="json"
+        )
+
+    def test_doctor_confirms_own_pending_appointments(self):
+        ids = [self.pending.id, self.confirmed.id, self.completed.id, self.others.id]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.transition(self.doctor.user, ids + [999999], 2)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data["succeeded"], [self.pending.id])
+        self.assertEqual(
+            response.data["failed"],
+            sorted([self.confirmed.id, self.completed.id, self.others.id, 999999]),
+        )
+        statements = [q["sql"].split()[0] for q in ctx.captured_queries]
+        self.assertEqual(statements.count("SELECT"), 1)
+        self.assertEqual(statements.count("UPDATE"), 1)
+        self.pending.refresh_from_db()
+        self.assertEqual(self.pending.status, 2)
+
+    def test_cancelling_frees_time_slots(self):
+        response = self.transition(self.admin, [self.confirmed.id, self.others.id], 3)
+        self.assertEqual(
+            response.data["succeeded"], sorted([self.confirmed.id, self.others.id])
+        )
+        self.slot.refresh_from_db()
+        self.assertTrue(self.slot.is_available)
+
+    def test_rejected_requests(self):
+        response = self.transition(self.patient.user, [self.pending.id], 3)
+        self.assertEqual(response.status_code, 403)
+        response = self.transition(self.doctor.user, [self.pending.id], 1)
+        self.assertEqual(response.status_code, 400)
+
+    def test_doctor_updates_status_of_own_appointment(self):
+        self.client.force_authenticate(user=self.doctor.user)
+        url = reverse("appointment-update", args=[self.pending.id])
+        response = self.client.patch(url, {"status": 2})
+        self.assertEqual(response.status_code, 200, response.content)
+        response = self.client.patch(url, {"reason": "Changed"})
+        self.assertEqual(response.status_code, 403)
+
+    def test_patients_can_only_cancel_pending_appointments(self):
+        self.client.force_authenticate(user=self.patient.user)
+        url = reverse("appointment-update", args=[self.pending.id])
+        response = self.client.patch(url, {"status": 2})
+        self.assertEqual(response.status_code, 400)
+        self.pending.refresh_from_db()
+        self.assertEqual(self.pending.status, 1)
+        url = reverse("appointment-update", args=[self.confirmed.id])
+        self.assertEqual(self.client.patch(url, {"status": 3}).status_code, 400)
+        url = reverse("appointment-update", args=[self.pending.id])
+        self.assertEqual(self.client.patch(url, {"status": 3}).status_code, 200)
+
+        response = self.client.post(
+            reverse("appointments-create"),
+            {
+                "doctor": self.doctor.id,
+                "status": 2,
+                "appointment_date": (timezone.now() + timedelta(days=3)).isoformat(),
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_status_update_follows_allowed_transitions(self):
+        self.client.force_authenticate(user=self.doctor.user)
+        url = reverse("appointment-update", args=[self.confirmed.id])
+        response = self.client.patch(url, {"status": 1})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("status", response.data)
+        response = self.client.patch(url, {"status": 3})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.slot.refresh_from_db()
+        self.assertTrue(self.slot.is_available)
+        for target in (4, 1):
+            response = self.client.patch(url, {"status": target})
+            self.assertEqual(response.status_code, 400)
+        self.confirmed.refresh_from_db()
+        self.assertEqual(self.confirmed.status, 3)
+
+
+class AppointmentExportTests(QueryBudgetTestCase):
+    """
+    The export streams every matching row from a single query.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_admin()
+        cls.doctor = create_doctor("doctor@example.com")
+        cls.other_doctor = create_doctor("other@example.com", first_name="Oth")
+        cls.patient = create_patient("patient@example.com")
+        start = timezone.make_aware(datetime(2030, 1, 1, 9))
+        for i in range(6):
+            Appointment.objects.create(
+                doctor=cls.doctor if i % 2 else cls.other_doctor,
+                patient=cls.patient,
+                status=i % 4 + 1,
+                appointment_date=start + timedelta(days=i),
+            )
+
+    def export(self, params):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(reverse("appointments-export"), params)
+        self.assertEqual(response.status_code, 200)
+        with CaptureQueriesContext(connection) as ctx:
+            content = b"".join(response.streaming_content).decode()
+        self.assertEqual(len(ctx.captured_queries), 1)
+        return response, content
+
+    def test_csv(self):
+        response, content = self.export(
+            {"doctor": self.doctor.id, "date_from": "2030-01-02"}
+        )
+        self.assertEqual(response["Content-Type"], "text/csv")
+        lines = content.splitlines()
+        self.assertEqual(lines[0].split(",")[:3], ["id", "appointment_date", "status"])
+        self.assertEqual(len(lines), 4)
+        self.assertIn("Doc,Tor", lines[1])
+
+    def test_csv_escapes_formulas(self):
+        formula = '=HYPERLINK("http://example.com","Open")'
+        Appointment.objects.filter(doctor=self.doctor).update(reason=formula)
+        User.objects.filter(pk=self.patient.user_id).update(first_name="-1+2")
+        _, content = self.export({"doctor": self.doctor.id})
+        row = next(csv.DictReader(StringIO(content)))
+        self.assertEqual(row["reason"], "'" + formula)
+        self.assertEqual(row["patient_first_name"], "'-1+2")
+        self.assertEqual(row["doctor_first_name"], "Doc")
+
+    def test_ndjson(self):
+        _, content = self.export(
+            {"output": "ndjson", "status": 2, "date_to": "2030-01-05"}
+        )
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row["status"] for row in rows], ["Confirmed"])
+        self.assertEqual(rows[0]["patient_first_name"], "Pat")
+
+    def test_admin_only(self):
+        self.client.force_authenticate(user=self.doctor.user)
+        response = self.client.get(reverse("appointments-export"))
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class SeedDataTests(TestCase):
+    """
+    seed_data builds the same dataset for the same seed.
+    """
+
+    def seed(self, **options):
+        call_command(
+            "seed_data",
+            patients=20,
+            doctors=5,
+            appointments=200,
+            anchor=date(2030, 1, 1),
+            stdout=StringIO(),
+            **options,
+        )
+        return sorted(
+            Appointment.objects.values_list(
+                "status", "appointment_date", "doctor__user__email"
+            )
+        )
+
+    def test_seed(self):
+        appointments = self.seed()
+        self.assertEqual(len(appointments), 200)
+        self.assertEqual(PatientProfile.objects.count(), 20)
+        self.assertEqual(
+            sum(Specialization.objects.values_list("doctor_count", flat=True)), 5
+        )
+        booked = Appointment.objects.exclude(time_slot=None)
+        self.assertEqual(booked.count(), 20)
+        self.assertFalse(booked.filter(time_slot__is_available=True).exists())
+        self.assertTrue(
+            User.objects.get(email="seed-patient-0@example.com").check_password(
+                "password123"
+            )
+        )
+
+        with self.assertRaises(CommandError):
+            self.seed()
+        self.assertEqual(self.seed(flush=True), appointments)
+        self.assertNotEqual(self.seed(flush=True, seed=2), appointments)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class BenchmarkApiTests(TestCase):
+    """
+    benchmark_api runs every scenario cleanly and leaves the data untouched.
+    """
+
+    def test_benchmark(self):
+        call_command(
+            "seed_data", patients=10, doctors=3, appointments=150, stdout=StringIO()
+        )
+        appointments = Appointment.objects.count()
+        out = StringIO()
+        call_command(
+            "benchmark_api",
+            iterations=2,
+            login_iterations=1,
+            warmup=0,
+            depths="0,100",
+            stdout=out,
+        )
+        results = json.loads(out.getvalue())
+        self.assertIn("appointments-list keyset depth=100", results)
+        for name, result in results.items():
+            self.assertEqual(result["errors"], 0, name)
+            self.assertGreater(result["queries_per_request"], 0, name)
+        self.assertEqual(Appointment.objects.count(), appointments)
+
+    def test_asgi_benchmark_leaves_no_fixtures_when_setup_fails(self):
+        with mock.patch.object(
+            TimeSlot.objects, "bulk_create", side_effect=RuntimeError("disk full")
+        ):
+            with self.assertRaises(RuntimeError):
+                call_command("benchmark_asgi", requests=1, stdout=StringIO())
+        self.assertFalse(User.objects.filter(email__startswith="benchmark-").exists())
+        self.assertFalse(Appointment.objects.exists())
+
+
+@override_settings(
+    MIDDLEWARE=["appointment.profiling.ProfilingMiddleware", *settings.MIDDLEWARE],
+    PROFILING_SAMPLE_RATE=1.0,
+)
+class ProfilingMiddlewareTests(QueryBudgetTestCase):
+    """
+    Sampled requests report their SQL, serializer and render time.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient = create_patient("patient@example.com")
+        cls.doctor = create_doctor("doctor@example.com")
+        Appointment.objects.create(
+            doctor=cls.doctor,
+            patient=cls.patient,
+            status=2,
+            appointment_date=timezone.now() + timedelta(days=1),
+        )
+
+    def test_server_timing_and_log_line(self):
+        self.client.force_authenticate(user=self.patient.user)
+        with self.assertLogs("appointment.profiling", "INFO") as logs:
+            response = self.client.get(reverse("patient-appointments"))
+
+        timing = response["Server-Timing"]
+        self.assertIn('desc="2 queries"', timing)
+        for metric in ("db;dur=", "serialize;dur=", "render;dur=", "total;dur="):
+            self.assertIn(metric, timing)
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line["view"], "patient-appointments")
+        self.assertEqual(line["queries"], 2)
+        self.assertEqual(len(line["slowest_queries"]), 2)
+        self.assertGreater(line["serialize_ms"], 0)
+
+    def test_list_serialization_is_timed(self):
+        # List views serialize .values() rows with represent_values.
+        Appointment.objects.bulk_create(
+            Appointment(
+                doctor=self.doctor,
+                patient=self.patient,
+                appointment_date=timezone.now() + timedelta(days=2, minutes=i),
+            )
+            for i in range(100)
+        )
+        self.client.force_authenticate(user=self.patient.user)
+        with self.assertLogs("appointment.profiling", "INFO") as logs:
+            response = self.client.get(reverse("appointments-list"))
+        self.assertEqual(response.status_code, 200, response.content)
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line["view"], "appointments-list")
+        self.assertGreater(line["serialize_ms"], 0)
+        self.assertNotIn("serialize;dur=0.00", response["Server-Timing"])
+
+    async def test_async_view_queries_are_counted(self):
+        access = AccessToken.for_user(self.patient.user)
+        response = await AsyncClient().get(
+            reverse("patient-appointments-async"),
+            headers={"Authorization": f"Bearer {access}"},
+        )
+        # The user lookup, the summary and the upcoming appointments.
+        self.assertIn('desc="3 queries"', response["Server-Timing"])
+
+    @override_settings(PROFILING_SAMPLE_RATE=0.0)
+    def test_unsampled_requests_are_untouched(self):
+        self.client.force_authenticate(user=self.patient.user)
+        response = self.client.get(reverse("patient-appointments"))
+        self.assertNotIn("Server-Timing", response)
+
+
+class MetricsURLConf:
+    """
+    The API with the metrics route, which appointment.urls only mounts when
+    METRICS_ENABLED is on at import time.
+    """
+
+    urlpatterns = [
+        path(
+            "api/",
+            include(
+                [
+                    *appointment_urls.urlpatterns,
+                    path("metrics/", metrics_view, name="metrics"),
+                ]
+            ),
+        )
+    ]
+
+
+@override_settings(
+    MIDDLEWARE=["appointment.metrics.MetricsMiddleware", *settings.MIDDLEWARE],
+    ROOT_URLCONF=MetricsURLConf,
+    METRICS_ENABLED=True,
+    METRICS_TOKEN="scrape-secret",
+)
+class MetricsTests(QueryBudgetTestCase):
+    """
+    Requests, queries, booking conflicts and cache lookups are exported in the
+    Prometheus text format.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient = create_patient("patient@example.com")
+        cls.doctor = create_doctor("doctor@example.com")
+        cls.slot = TimeSlot.objects.create(
+            doctor=cls.doctor,
+            date=timezone.now().date() + timedelta(days=1),
+            start_time=time(9, 0),
+            end_time=time(9, 30),
+            is_available=False,
+        )
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def scrape(self):
+        return self.client.get(
+            reverse("metrics"), headers={"Authorization": "Bearer scrape-secret"}
+        )
+
+    def test_request_latency_and_query_count(self):
+        labels = {"view": "patient-appointments"}
+        requests = self.sample(
+            "careconnect_requests_total", method="GET", status="200", **labels
+        )
+        queries = self.sample("careconnect_request_db_queries_sum", **labels)
+        self.client.force_authenticate(user=self.patient.user)
+        self.client.get(reverse("patient-appointments"))
+
+        self.assertEqual(
+            self.sample(
+                "careconnect_requests_total", method="GET", status="200", **labels
+            ),
+            requests + 1,
+        )
+        self.assertEqual(
+            self.sample("careconnect_request_db_queries_sum", **labels), queries + 2
+        )
+        body = self.scrape().content.decode()
+        self.assertIn(
+            'careconnect_request_duration_seconds_count{method="GET",'
+            'view="patient-appointments"}',
+            body,
+        )
+
+    def test_booking_conflicts_and_cache_lookups(self):
+        conflicts = self.sample("careconnect_booking_conflicts_total")
+        misses = self.sample(
+            "careconnect_reference_cache_requests_total",
+            namespace="doctors",
+            result="miss",
+        )
+        self.client.force_authenticate(user=self.patient.user)
+        response = self.client.post(
+            reverse("appointments-book"), {"time_slot": self.slot.id}, format="json"
+        )
+        self.assertEqual(response.status_code, 409)
+        self.client.get(reverse("doctors-list"))
+
+        self.assertEqual(
+            self.sample("careconnect_booking_conflicts_total"), conflicts + 1
+        )
+        self.assertEqual(
+            self.sample(
+                "careconnect_reference_cache_requests_total",
+                namespace="doctors",
+                result="miss",
+            ),
+            misses + 1,
+        )
+
+    def test_token_required(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        self.assertEqual(self.scrape().status_code, 200)
+
+    @override_settings(DEBUG="False", METRICS_TOKEN="")
+    def test_closed_without_token(self):
+        # DEBUG comes from the environment as a string; it opens nothing.
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+
+    @override_settings(ROOT_URLCONF=settings.ROOT_URLCONF, METRICS_ENABLED=False)
+    def test_not_mounted_when_disabled(self):
+        self.assertEqual(self.client.get("/api/metrics/").status_code, 404)
+        # Mounted by hand, the view still refuses to serve.
+        request = RequestFactory().get(
+            "/api/metrics/", headers={"Authorization": "Bearer scrape-secret"}
+        )
+        self.assertEqual(metrics_view(request).status_code, 403)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class SoftDeleteQuerySetTests(TestCase):
+    """
+    Queryset delete and restore are set-based and cascade to the doctor's time
+    slots, schedule templates and pending appointments.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cardiology = Specialization.objects.create(name="Cardiology")
+        cls.doctor = create_doctor("doctor@example.com", cls.cardiology)
+        cls.patient = create_patient("patient@example.com")
+        tomorrow = timezone.now().date() + timedelta(days=1)
+        TimeSlot.objects.bulk_create(
+            TimeSlot(
+                doctor=cls.doctor,
+                date=tomorrow,
+                start_time=time(hour, 0),
+                end_time=time(hour, 30),
+            )
+            for hour in range(8, 18)
+        )
+        cls.slot = TimeSlot.objects.filter(doctor=cls.doctor).earliest("start_time")
+        cls.pending = Appointment.objects.create(
+            doctor=cls.doctor,
+            patient=cls.patient,
+            time_slot=cls.slot,
+            status=1,
+            appointment_date=timezone.now() + timedelta(days=1),
+        )
+        cls.completed = Appointment.objects.create(
+            doctor=cls.doctor,
+            patient=cls.patient,
+            status=4,
+            appointment_date=timezone.now() - timedelta(days=1),
+        )
+
+    def test_delete_cascades_in_a_fixed_number_of_queries(self):
+        doctors = DoctorProfile.objects.filter(pk=self.doctor.pk)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(doctors.delete(), 1)
+        updates = [q for q in ctx.captured_queries if q["sql"].startswith("UPDATE")]
+        # Time slots, their appointments, templates, the doctor's appointments,
+        # the specialization counter and the doctors themselves.
+        self.assertEqual(len(updates), 6)
+
+        self.assertTrue(DoctorProfile.all_objects.get(pk=self.doctor.pk).is_deleted)
+        self.assertFalse(TimeSlot.objects.filter(doctor=self.doctor).exists())
+        self.assertFalse(Appointment.objects.filter(pk=self.pending.pk).exists())
+        self.assertTrue(Appointment.objects.filter(pk=self.completed.pk).exists())
+        self.cardiology.refresh_from_db()
+        self.assertEqual(self.cardiology.doctor_count, 0)
+
+    def test_restore_brings_back_only_cascaded_rows(self):
+        retired = TimeSlot.objects.filter(doctor=self.doctor).latest("start_time")
+        retired.delete()
+        DoctorProfile.objects.filter(pk=self.doctor.pk).delete()
+
+        restored = DoctorProfile.all_objects.filter(pk=self.doctor.pk).restore()
+        self.assertEqual(restored, 1)
+        self.assertEqual(TimeSlot.objects.filter(doctor=self.doctor).count(), 9)
+        self.assertFalse(TimeSlot.objects.filter(pk=retired.pk).exists())
+        self.assertTrue(Appointment.objects.filter(pk=self.pending.pk).exists())
+        self.cardiology.refresh_from_db()
+        self.assertEqual(self.cardiology.doctor_count, 1)
+
+    def test_instance_delete_and_restore_cascade(self):
+        self.doctor.delete()
+        self.assertFalse(TimeSlot.objects.filter(doctor=self.doctor).exists())
+        self.assertFalse(Appointment.objects.filter(pk=self.pending.pk).exists())
+
+        self.doctor.restore()
+        self.assertEqual(TimeSlot.objects.filter(doctor=self.doctor).count(), 10)
+        self.assertTrue(Appointment.objects.filter(pk=self.pending.pk).exists())
+        self.cardiology.refresh_from_db()
+        self.assertEqual(self.cardiology.doctor_count, 1)
+
+    def test_hard_delete_still_available(self):
+        TimeSlot.all_objects.filter(doctor=self.doctor).hard_delete()
+        self.assertFalse(TimeSlot.all_objects.filter(doctor=self.doctor).exists())
+
+
+class ArchiveAppointmentsTests(QueryBudgetTestCase):
+    """
+    Old finished and soft-deleted appointments move to the archive table,
+    which admins can still read.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_admin()
+        cls.patient = create_patient("patient@example.com")
+        cls.doctor = create_doctor("doctor@example.com")
+        old = timezone.now() - timedelta(days=400)
+        recent = timezone.now() - timedelta(days=10)
+
+        def appointment(status, when, **extra):
+            return Appointment.all_objects.create(
+                doctor=cls.doctor,
+                patient=cls.patient,
+                status=status,
+                appointment_date=when,
+                **extra,
+            )
+
+        cls.archivable = [
+            appointment(4, old),
+            appointment(3, old),
+            appointment(2, recent, is_deleted=True, deleted_at=old),
+        ]
+        cls.kept = [
+            appointment(4, recent),
+            appointment(1, old),
+            appointment(2, old, is_deleted=True, deleted_at=recent),
+        ]
+
+    def archive(self, *args):
+        out = StringIO()
+        call_command("archive_appointments", "--days=365", *args, stdout=out)
+        return json.loads(out.getvalue())
+
+    def test_moves_old_rows_in_batches(self):
+        report = self.archive("--batch-size=2")
+        self.assertEqual(report["archived"], 3)
+        self.assertEqual(report["batches"], 2)
+        self.assertEqual(
+            set(ArchivedAppointment.objects.values_list("id", flat=True)),
+            {appointment.id for appointment in self.archivable},
+        )
+        self.assertEqual(
+            set(Appointment.all_objects.values_list("id", flat=True)),
+            {appointment.id for appointment in self.kept},
+        )
+        archived = ArchivedAppointment.objects.get(pk=self.archivable[2].pk)
+        self.assertTrue(archived.is_deleted)
+        self.assertEqual(archived.doctor_id, self.doctor.id)
+
+    def test_dry_run_changes_nothing(self):
+        report = self.archive("--dry-run")
+        self.assertEqual(report["archivable"], 3)
+        self.assertFalse(ArchivedAppointment.objects.exists())
+
+    def test_snapshot(self):
+        with tempfile.TemporaryDirectory() as directory:
+            report = self.archive(f"--snapshot-dir={directory}")
+            self.assertTrue(report["snapshot"].startswith(directory))
+            with gzip.open(Path(report["snapshot"]), "rt") as snapshot:
+                rows = [json.loads(line) for line in snapshot]
+        self.assertEqual(
+            sorted(row["id"] for row in rows),
+            sorted(appointment.id for appointment in self.archivable),
+        )
+        self.assertEqual(rows[0]["patient_id"], self.patient.id)
+
+    def test_admins_read_the_archive(self):
+        self.archive()
+        response = self.assertMaxQueries(
+            2,
+            reverse("appointments-archive"),
+            self.admin,
+            {"patient": self.patient.id},
+        )
+        self.assertEqual(response.data["count"], 3)
+        self.assertEqual(response.data["results"][0]["doctor"], "Doc Tor")
+
+        url = reverse("appointments-archive-detail", args=[self.archivable[0].id])
+        response = self.assertMaxQueries(1, url, self.admin)
+        self.assertEqual(response.data["status"], "Completed")
+
+        self.client.force_authenticate(user=self.patient.user)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+@override_settings(
+    PASSWORD_HASHERS=FAST_HASHERS,
+    REPLICA_DATABASES=["replica"],
+    DATABASE_ROUTERS=["appointment.replicas.ReplicaRouter"],
+    MIDDLEWARE=[
+        "appointment.replicas.ReplicaRoutingMiddleware",
+        *settings.MIDDLEWARE,
+    ],
+)
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Read-only views read from a replica, except for users who just wrote and
+    when the replica is down.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # A second connection to the test database stands in for the replica;
+        # TransactionTestCase commits, so it sees the same rows.
+        patcher = mock.patch.dict(
+            connections.settings,
+            {"replica": dict(connections["default"].settings_dict)},
+        )
+        patcher.start()
+        cls.addClassCleanup(patcher.stop)
+        cls.addClassCleanup(cls.close_replica)
+        cls.databases = cls.databases | {"replica"}
+
+    @classmethod
+    def close_replica(cls):
+        connections["replica"].close()
+        del connections["replica"]
+
+    def setUp(self):
+        replicas._down_until.clear()
+        self.client = APIClient()
+        self.patient = create_patient("patient@example.com")
+        self.doctor = create_doctor("doctor@example.com")
+        # Creating the doctor invalidated the doctor cache just now.
+        reference_cache.get_cache().clear()
+        self.client.force_authenticate(user=self.patient.user)
+
+    def get(self, url):
+        with CaptureQueriesContext(connections["replica"]) as replica_queries:
+            with CaptureQueriesContext(connection) as primary_queries:
+                response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(primary_queries), len(replica_queries)
+
+    def test_read_only_views_use_the_replica(self):
+        primary, replica = self.get(reverse("doctors-list"))
+        self.assertEqual((primary, replica), (0, 2))
+        primary, replica = self.get(reverse("patient-appointments"))
+        self.assertEqual((primary, replica), (0, 2))
+
+    def test_writer_is_pinned_to_the_primary(self):
+        response = self.client.post(
+            reverse("appointments-create"),
+            {
+                "doctor": self.doctor.id,
+                "appointment_date": (timezone.now() + timedelta(days=1)).isoformat(),
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        primary, replica = self.get(reverse("patient-appointments"))
+        self.assertEqual((primary, replica), (2, 0))
+
+        reference_cache.get_cache().delete(replicas._pin_key(self.patient.user.pk))
+        primary, replica = self.get(reverse("patient-appointments"))
+        self.assertEqual((primary, replica), (0, 2))
+
+    def test_unreachable_replica_falls_back_to_the_primary(self):
+        with mock.patch.object(
+            connections["replica"],
+            "ensure_connection",
+            side_effect=OperationalError("connection refused"),
+        ):
+            with self.assertLogs("appointment.replicas", "WARNING"):
+                with CaptureQueriesContext(connection) as primary_queries:
+                    response = self.client.get(reverse("doctors-list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(primary_queries), 2)
+        # Not retried until REPLICA_RETRY_SECONDS have passed.
+        self.assertFalse(replicas.replica_is_healthy("replica"))
+
+    def test_cache_misses_after_an_invalidation_read_the_primary(self):
+        reference_cache.invalidate(reference_cache.DOCTORS)
+        primary, replica = self.get(reverse("doctors-list"))
+        self.assertEqual((primary, replica), (2, 0))
+
+        reference_cache.get_cache().clear()
+        with mock.patch(
+            "appointment.cache.time.time",
+            return_value=time_module.time() - settings.REPLICA_PIN_SECONDS - 1,
+        ):
+            reference_cache.invalidate(reference_cache.DOCTORS)
+        primary, replica = self.get(reverse("doctors-list"))
+        self.assertEqual((primary, replica), (0, 2))
+
+    async def async_reads(self, name):
+        """
+        (model, database) of every read an async endpoint makes.
+        """
+        reads = []
+        db_for_read = replicas.ReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            alias = db_for_read(router, model, **hints)
+            reads.append((model.__name__, alias or "default"))
+            return alias
+
+        access = AccessToken.for_user(self.patient.user)
+        with mock.patch.object(replicas.ReplicaRouter, "db_for_read", record):
+            response = await AsyncClient().get(
+                reverse(name), headers={"Authorization": f"Bearer {access}"}
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        return reads
+
+    async def test_async_views_use_the_replica(self):
+        for name in ("patient-appointments-async", "doctors-list-async"):
+            reads = await self.async_reads(name)
+            # Authentication runs before the view picks the replica.
+            view_reads = [alias for model, alias in reads if model != "User"]
+            self.assertTrue(view_reads, name)
+            self.assertEqual(set(view_reads), {"replica"}, name)
+
+    async def test_async_cache_miss_after_an_invalidation_reads_the_primary(self):
+        reference_cache.invalidate(reference_cache.DOCTORS)
+        reads = await self.async_reads("doctors-list-async")
+        self.assertIn(("DoctorProfile", "default"), reads)
+        self.assertNotIn(("DoctorProfile", "replica"), reads)
+
+    def test_pins_need_a_shared_cache(self):
+        self.assertEqual(
+            [error.id for error in check_replica_pin_cache(None)],
+            ["appointment.E001"],
+        )
+        caches = {
+            "default": {"BACKEND": "django.core.cache.backends.redis.RedisCache"}
+        }
+        with self.settings(CACHES=caches):
+            self.assertEqual(check_replica_pin_cache(None), [])
+        with self.settings(REPLICA_DATABASES=[]):
+            self.assertEqual(check_replica_pin_cache(None), [])
+
+
+class DoctorSearchTests(QueryBudgetTestCase):
+    """
+    Doctor search matches names, specializations and addresses by prefix and
+    with small typos, best matches first.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient = create_patient("patient@example.com")
+        cardiology = Specialization.objects.create(name="Cardiology")
+        dermatology = Specialization.objects.create(name="Dermatology")
+        cls.amina = create_doctor(
+            "amina@example.com", cardiology, first_name="Amina", last_name="Okafor"
+        )
+        cls.ben = create_doctor(
+            "ben@example.com", dermatology, first_name="Ben", last_name="Kamau"
+        )
+        cls.chloe = create_doctor(
+            "chloe@example.com", cardiology, first_name="Chloe", last_name="Mensah"
+        )
+        cls.chloe.address = "14 Harbour Street, Mombasa"
+        cls.chloe.save()
+
+    def search(self, query, max_queries=3):
+        response = self.assertMaxQueries(
+            max_queries, reverse("doctors-search"), self.patient.user, {"q": query}
+        )
+        return [result["id"] for result in response.data["results"]]
+
+    def test_matches_name_specialization_and_address(self):
+        self.assertEqual(self.search("amina okafor"), [self.amina.id])
+        self.assertEqual(self.search("cardiology"), [self.amina.id, self.chloe.id])
+        self.assertEqual(self.search("mombasa"), [self.chloe.id])
+
+    def test_prefix_and_typos(self):
+        self.assertEqual(self.search("derm"), [self.ben.id])
+        self.assertEqual(self.search("kamua"), [self.ben.id])
+        self.assertEqual(self.search("chloe cardiolgy"), [self.chloe.id])
+
+    def test_ranks_better_matches_first(self):
+        # Both are cardiologists; only Chloe also lives on Harbour Street.
+        self.assertEqual(self.search("cardio harbour")[0], self.chloe.id)
+        self.assertEqual(self.search("mensah")[0], self.chloe.id)
+
+    def test_documents_follow_renames_and_soft_deletes(self):
+        self.amina.user.last_name = "Diallo"
+        self.amina.user.save()
+        self.assertEqual(self.search("diallo"), [self.amina.id])
+        self.assertEqual(self.search("okafor"), [])
+
+        specialization = Specialization.objects.get(pk=self.ben.specialization_id)
+        specialization.name = "Skin Care"
+        specialization.save()
+        self.assertEqual(self.search("skin"), [self.ben.id])
+
+        self.ben.delete()
+        self.assertEqual(self.search("skin"), [])
+
+    def test_query_is_required(self):
+        self.client.force_authenticate(user=self.patient.user)
+        response = self.client.get(reverse("doctors-search"), {"q": "a"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_unsearched_changes_skip_the_refresh(self):
+        def search_updates(save):
+            with CaptureQueriesContext(connection) as ctx:
+                save()
+            # refresh_search_documents recomputes the document with subqueries.
+            return [
+                q["sql"]
+                for q in ctx.captured_queries
+                if q["sql"].startswith("UPDATE") and "SELECT" in q["sql"]
+            ]
+
+        doctor = DoctorProfile.objects.get(pk=self.ben.pk)
+        doctor.experience_years = 12
+        self.assertEqual(search_updates(doctor.save), [])
+        doctor.address = "9 Zanzibar Road"
+        self.assertEqual(len(search_updates(doctor.save)), 1)
+        self.assertEqual(self.search("zanzibar"), [self.ben.id])
+
+        specialization = Specialization.objects.get(pk=self.ben.specialization_id)
+        specialization.description = "Skin, hair and nails."
+        self.assertEqual(search_updates(specialization.save), [])
+        specialization.name = "Skin Care"
+        self.assertEqual(len(search_updates(specialization.save)), 1)
+
+    def test_index_triggers_exist(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("the FTS5 index triggers are SQLite only")
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+                "AND name LIKE 'appointment_doctorsearch_%'"
+            )
+            names = {row[0] for row in cursor.fetchall()}
+        self.assertEqual(names, set(FTS_TRIGGERS))
+        self.assertEqual(check_doctor_search_triggers(None, ["default"]), [])
+
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TRIGGER appointment_doctorsearch_update")
+        self.assertEqual(
+            [w.id for w in check_doctor_search_triggers(None, ["default"])],
+            ["appointment.W001"],
+        )
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class SparseFieldsTests(QueryBudgetTestCase):
+    """
+    List endpoints answer from .values() rows exactly as their serializers
+    do from instances, and ``fields`` narrows the output.
+    """
+
+    # URL name -> (serializer, queryset of the listed rows).
+    LISTS = {
+        "appointments-list": (AppointmentSerializer, Appointment.objects),
+        "doctors-list": (DoctorSerializer, DoctorProfile.objects),
+        "patients-list": (PatientSerializer, PatientProfile.objects),
+        "time-slots-list": (TimeSlotSerializer, TimeSlot.objects),
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_admin()
+        specialization = Specialization.objects.create(name="Cardiology")
+        for i in range(3):
+            doctor = create_doctor(f"doctor{i}@example.com", specialization)
+            patient = create_patient(f"patient{i}@example.com", first_name=f"P{i}")
+            TimeSlot.objects.create(
+                doctor=doctor,
+                date=date(2030, 1, 1),
+                start_time=time(9 + i),
+                end_time=time(9 + i, 30),
+            )
+            Appointment.objects.create(
+                doctor=doctor,
+                patient=patient,
+                status=i + 1,
+                appointment_date=timezone.now() + timedelta(days=i + 1),
+            )
+        # Null columns are rendered as null on both paths.
+        User.objects.filter(pk=patient.user_id).update(phone_number=None)
+
+    def test_values_rows_match_instances(self):
+        for name, (serializer_class, queryset) in self.LISTS.items():
+            with self.subTest(name):
+                response = self.assertMaxQueries(2, reverse(name), self.admin)
+                instances = serializer_class(queryset.all(), many=True).data
+                self.assertCountEqual(
+                    [dict(row) for row in response.data["results"]],
+                    [dict(row) for row in instances],
+                )
+
+    def test_fields_narrow_the_output(self):
+        cases = {
+            "appointments-list": "status,doctor",
+            "doctors-list": "email",
+            "patients-list": "id,last_name",
+            "time-slots-list": "start_time,id",
+        }
+        for name, fields in cases.items():
+            with self.subTest(name):
+                response = self.assertMaxQueries(
+                    2, reverse(name), self.admin, {"fields": fields}
+                )
+                for row in response.data["results"]:
+                    self.assertEqual(set(row), set(fields.split(",")))
+
+    def test_fields_select_only_needed_columns(self):
+        self.client.force_authenticate(user=self.admin)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(
+                reverse("appointments-list"), {"fields": "id,status", "count": "false"}
+            )
+        first = Appointment.objects.get(status=1)
+        self.assertEqual(
+            response.data["results"][0], {"id": first.pk, "status": "Pending"}
+        )
+        sql = ctx.captured_queries[0]["sql"]
+        self.assertNotIn("JOIN", sql)
+        self.assertNotIn("reason", sql)
+
+    def test_keyset_pages_with_fields(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(
+            reverse("time-slots-list"), {"fields": "doctor", "cursor": "", "limit": 2}
+        )
+        self.assertEqual(len(response.data["results"]), 2)
+        response = self.client.get(response.data["next"])
+        self.assertEqual(response.data["results"], [{"doctor": "Doc Tor"}])
+
+    def test_fields_apply_to_single_objects(self):
+        time_slot = TimeSlot.objects.first()
+        response = self.assertMaxQueries(
+            3,
+            reverse("time-slot-update", args=[time_slot.pk]),
+            self.admin,
+            {"fields": "id,doctor"},
+        )
+        self.assertEqual(response.data, {"id": time_slot.pk, "doctor": "Doc Tor"})
+
+    def test_unknown_fields(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(
+            reverse("patients-list"), {"fields": "id,password,user"}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("password", str(response.data["fields"]))
+
+    def test_benchmark(self):
+        out = StringIO()
+        call_command("benchmark_serializers", rows=10, repeat=1, stdout=out)
+        results = json.loads(out.getvalue())
+        self.assertEqual(
+            set(results), {"appointments", "doctors", "patients", "time-slots"}
+        )
+        for result in results.values():
+            self.assertEqual(len(result["cpu_ms_per_1000_rows"]), 4)
+            self.assertNotIn("instances (before)", result["speedup"])
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class ConditionalGetTests(QueryBudgetTestCase):
+    """
+    Polled endpoints send an ETag and answer a current If-None-Match with 304
+    after one query; any change to the rows they show moves the ETag.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_admin()
+        cls.doctor = create_doctor("doctor@example.com")
+        cls.patient = create_patient("patient@example.com")
+        cls.slot = TimeSlot.objects.create(
+            doctor=cls.doctor,
+            date=date(2030, 1, 1),
+            start_time=time(9),
+            end_time=time(9, 30),
+        )
+        cls.appointment = Appointment.objects.create(
+            doctor=cls.doctor,
+            patient=cls.patient,
+            status=1,
+            appointment_date=timezone.now() + timedelta(days=1),
+        )
+
+    def get(self, name, user, etag=None, params=None):
+        self.client.force_authenticate(user=user)
+        headers = {"If-None-Match": etag} if etag else {}
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse(name), params or {}, headers=headers)
+        response.queries = len(ctx.captured_queries)
+        return response
+
+    def assertNotModified(self, name, user, params=None):
+        response = self.get(name, user, params=params)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("no-cache", response["Cache-Control"])
+        etag = response["ETag"]
+        response = self.get(name, user, etag, params)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response.queries, 1)
+        return etag
+
+    def assertChanged(self, name, user, etag, params=None):
+        response = self.get(name, user, etag, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_patient_dashboard(self):
+        etag = self.assertNotModified("patient-appointments", self.patient.user)
+        self.client.force_authenticate(user=self.doctor.user)
+        response = self.client.post(
+            reverse("appointments-status"),
+            {"ids": [self.appointment.pk], "status": 2},
+            format="json",
+        )
+        self.assertEqual(response.data["succeeded"], [self.appointment.pk])
+        self.assertChanged("patient-appointments", self.patient.user, etag)
+
+        # The dashboard shows the doctor's name.
+        etag = self.assertNotModified("patient-appointments", self.patient.user)
+        self.doctor.user.last_name = "Renamed"
+        self.doctor.user.save()
+        self.assertChanged("patient-appointments", self.patient.user, etag)
+
+        # Other scopes get other ETags.
+        admin_etag = self.get(
+            "patient-appointments", self.admin, params={"patient_id": self.patient.pk}
+        )["ETag"]
+        self.assertNotEqual(
+            admin_etag, self.get("patient-appointments", self.patient.user)["ETag"]
+        )
+
+    def test_doctor_dashboard(self):
+        etag = self.assertNotModified("doctor-appointments", self.doctor.user)
+        self.patient.user.first_name = "Renamed"
+        self.patient.user.save()
+        self.assertChanged("doctor-appointments", self.doctor.user, etag)
+
+        etag = self.assertNotModified("doctor-appointments", self.doctor.user)
+        self.appointment.delete()
+        self.assertChanged("doctor-appointments", self.doctor.user, etag)
+
+        # Logins do not count as changes.
+        etag = self.assertNotModified("doctor-appointments", self.doctor.user)
+        self.patient.user.save(update_fields=["last_login"])
+        self.assertEqual(
+            self.get("doctor-appointments", self.doctor.user, etag).status_code, 304
+        )
+
+    def test_time_slots_list(self):
+        etag = self.assertNotModified("time-slots-list", self.patient.user)
+        self.client.force_authenticate(user=self.patient.user)
+        response = self.client.post(
+            reverse("appointments-book"), {"time_slot": self.slot.pk}, format="json"
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertChanged("time-slots-list", self.patient.user, etag)
+
+        etag = self.assertNotModified("time-slots-list", self.patient.user)
+        TimeSlot.objects.filter(pk=self.slot.pk).delete()
+        self.assertChanged("time-slots-list", self.patient.user, etag)
+
+        etag = self.assertNotModified("time-slots-list", self.patient.user)
+        self.assertChanged(
+            "time-slots-list", self.patient.user, etag, {"fields": "id"}
+        )
+
+    def test_keyset_pages_have_no_etag(self):
+        response = self.get(
+            "time-slots-list", self.patient.user, params={"cursor": ""}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.queries, 1)
+        self.assertFalse(response.has_header("ETag"))
+
+    async def test_async_variants(self):
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(self.patient.user)}"}
+        for name in ("patient-appointments-async", "time-slots-list-async"):
+            response = await AsyncClient().get(reverse(name), headers=headers)
+            self.assertEqual(response.status_code, 200)
+            response = await AsyncClient().get(
+                reverse(name),
+                headers={**headers, "If-None-Match": response["ETag"]},
+            )
+            self.assertEqual(response.status_code, 304)
+        # A stale ETag gets the full dashboard.
+        response = await AsyncClient().get(
+            reverse("patient-appointments-async"),
+            headers={**headers, "If-None-Match": '"stale"'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["summary"]["pending"], 1)
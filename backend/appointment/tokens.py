@@ -0,0 +1,133 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+from rest_framework_simplejwt.tokens import RefreshToken, Token
+
+
+class BlacklistFilter:
+    """
+    Bounded LRU of jtis this process has seen on the blacklist.
+
+    Only positive answers are kept: a blacklisted token stays blacklisted
+    until it expires, but any worker may blacklist a token at any moment, so
+    a "not blacklisted" answer is never reused and still goes to the database.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._jtis = OrderedDict()
+        self._lock = Lock()
+        self.checks = 0
+        self.hits = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def __contains__(self, jti):
+        with self._lock:
+            if jti not in self._jtis:
+                return False
+            self._jtis.move_to_end(jti)
+            return True
+
+    def __len__(self):
+        return len(self._jtis)
+
+    def add(self, jti):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._jtis[jti] = None
+            self._jtis.move_to_end(jti)
+            while len(self._jtis) > self.max_size:
+                self._jtis.popitem(last=False)
+
+    def record(self, seconds, hit):
+        with self._lock:
+            self.checks += 1
+            self.hits += hit
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+
+    def clear(self):
+        with self._lock:
+            self._jtis.clear()
+            self.checks = self.hits = 0
+            self.total_seconds = self.max_seconds = 0.0
+
+    def get_stats(self):
+        return {
+            "size": len(self),
+            "max_size": self.max_size,
+            "checks": self.checks,
+            "filter_hits": self.hits,
+            "database_checks": self.checks - self.hits,
+            "avg_check_ms": (
+                round(self.total_seconds / self.checks * 1000, 3)
+                if self.checks
+                else None
+            ),
+            "max_check_ms": round(self.max_seconds * 1000, 3),
+        }
+
+
+blacklist_filter = BlacklistFilter(settings.TOKEN_BLACKLIST_FILTER_SIZE)
+
+
+class FilteredRefreshToken(RefreshToken):
+    """
+    Refresh token whose blacklist check consults ``blacklist_filter`` first,
+    so replays of a rotated or logged-out token are refused without a query.
+    """
+
+    def verify(self, *args, **kwargs):
+        # Expired or malformed tokens are rejected before the blacklist lookup.
+        Token.verify(self, *args, **kwargs)
+        self.check_blacklist()
+
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        start = time.perf_counter()
+        hit = jti in blacklist_filter
+        try:
+            if hit:
+                raise TokenError("Token is blacklisted")
+            super().check_blacklist()
+        except TokenError:
+            blacklist_filter.add(jti)
+            raise
+        finally:
+            blacklist_filter.record(time.perf_counter() - start, hit)
+
+    def blacklist(self):
+        result = super().blacklist()
+        blacklist_filter.add(self.payload[api_settings.JTI_CLAIM])
+        return result
+
+
+class FilteredTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = FilteredRefreshToken
+
+
+def get_blacklist_stats():
+    """
+    Row counts of the token_blacklist tables and this process's check
+    latency. The expired rows are what prune_token_blacklist would delete.
+    """
+    return {
+        "outstanding": OutstandingToken.objects.count(),
+        "blacklisted": BlacklistedToken.objects.count(),
+        "expired": OutstandingToken.objects.filter(
+            expires_at__lte=timezone.now()
+        ).count(),
+        "filter": blacklist_filter.get_stats(),
+    }
@@ -1,11 +1,20 @@
+from django.conf import settings
 from django.urls import path
 from .views import *
+from . import async_views
+from .metrics import metrics_view
 
 urlpatterns = [
     ################################## USER API URLS ##################################
     path("login/", UserLogin.as_view(), name="login"),
+    path("login-async/", async_views.user_login, name="login-async"),
     path("logout/", UserLogout.as_view(), name="logout"),
     path("refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path(
+        "token-blacklist-stats/",
+        TokenBlacklistStats.as_view(),
+        name="token-blacklist-stats",
+    ),
     path("patient-register/", PatientRegister.as_view(), name="patient-register"),
     path("patients-list/", PatientList.as_view(), name="patients-list"),
     path("patient-detail/<int:pk>/", PatientDetail.as_view(), name="patient-detail"),
@@ -21,8 +30,17 @@ urlpatterns = [
         PatientAppointments.as_view(),
         name="patient-appointments",
     ),
+    path(
+        "patient-appointments-async/",
+        async_views.patient_appointments,
+        name="patient-appointments-async",
+    ),
     path("doctor-register/", DoctorRegister.as_view(), name="doctor-register"),
     path("doctors-list/", DoctorList.as_view(), name="doctors-list"),
+    path(
+        "doctors-list-async/", async_views.doctor_list, name="doctors-list-async"
+    ),
+    path("doctors-search/", DoctorSearch.as_view(), name="doctors-search"),
     path("doctor-detail/<int:pk>/", DoctorDetail.as_view(), name="doctor-detail"),
     path("doctor-update/<int:pk>/", DoctorDetail.as_view(), name="doctor-update"),
     path("doctor-delete/<int:pk>/", DoctorDetail.as_view(), name="doctor-delete"),
@@ -30,6 +48,12 @@ urlpatterns = [
     path(
         "doctor-appointments/", DoctorAppointments.as_view(), name="doctor-appointments"
     ),
+    path(
+        "doctor-appointments-async/",
+        async_views.doctor_appointments,
+        name="doctor-appointments-async",
+    ),
+    path("cache-stats/", ReferenceCacheStats.as_view(), name="cache-stats"),
     #################################### SPECIALIZATION API URLS ##########################
     path(
         "specialization-create/",
@@ -59,12 +83,38 @@ urlpatterns = [
     ####################################### TIME SLOT API URLS ##########################
     path("time-slots-create/", TimeSlotListCreate.as_view(), name="time-slots-create"),
     path("time-slots-list/", TimeSlotListCreate.as_view(), name="time-slots-list"),
+    path(
+        "time-slots-list-async/",
+        async_views.time_slot_list,
+        name="time-slots-list-async",
+    ),
+    path(
+        "time-slots-available/",
+        NextAvailableTimeSlots.as_view(),
+        name="time-slots-available",
+    ),
     path(
         "time-slot-update/<int:pk>/", TimeSlotDetail.as_view(), name="time-slot-update"
     ),
     path(
         "time-slot-delete/<int:pk>/", TimeSlotDetail.as_view(), name="time-slot-delete"
     ),
+    ################################## SCHEDULE TEMPLATE API URLS ########################
+    path(
+        "schedule-templates-create/",
+        ScheduleTemplateListCreate.as_view(),
+        name="schedule-templates-create",
+    ),
+    path(
+        "schedule-templates-list/",
+        ScheduleTemplateListCreate.as_view(),
+        name="schedule-templates-list",
+    ),
+    path(
+        "schedule-template-generate/<int:pk>/",
+        ScheduleTemplateGenerate.as_view(),
+        name="schedule-template-generate",
+    ),
     ###################################### APPOINTMENT API URLS ##########################
     path(
         "appointments-create/",
@@ -74,9 +124,33 @@ urlpatterns = [
     path(
         "appointments-list/", AppointmentListCreate.as_view(), name="appointments-list"
     ),
+    path("appointments-book/", AppointmentBook.as_view(), name="appointments-book"),
+    path(
+        "appointments-export/",
+        AppointmentExport.as_view(),
+        name="appointments-export",
+    ),
+    path(
+        "appointments-archive/",
+        ArchivedAppointmentList.as_view(),
+        name="appointments-archive",
+    ),
+    path(
+        "appointments-archive/<int:pk>/",
+        ArchivedAppointmentDetail.as_view(),
+        name="appointments-archive-detail",
+    ),
+    path(
+        "appointments-status/",
+        AppointmentStatusTransition.as_view(),
+        name="appointments-status",
+    ),
     path(
         "appointment-update/<int:pk>/",
         AppointmentDetail.as_view(),
         name="appointment-update",
     ),
 ]
+
+if settings.METRICS_ENABLED:
+    urlpatterns.append(path("metrics/", metrics_view, name="metrics"))
@@ -1,9 +1,10 @@
-from datetime import timedelta
+from datetime import datetime, timedelta
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.generics import (
     ListCreateAPIView,
     RetrieveUpdateDestroyAPIView,
+    RetrieveAPIView,
     CreateAPIView,
     ListAPIView,
     GenericAPIView,
@@ -14,12 +15,173 @@ from rest_framework_simplejwt.views import (
 )
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework.exceptions import ValidationError, PermissionDenied
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
 from rest_framework.decorators import action
 from .serializers import *
-from django.db import transaction
-from .permissions import IsSystemAdmin, IsPatient
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Count, Q
+from django.http import StreamingHttpResponse
+from .permissions import IsSystemAdmin, IsPatient, IsDoctor
+from .pagination import AppointmentPagination, KeysetPagination, TimeSlotPagination
+from . import cache
+from .metrics import BOOKING_CONFLICTS
+from .cache import CachedResponseMixin
+from .conditional import (
+    ConditionalListMixin,
+    not_modified,
+    scope_etag,
+    set_validator,
+    version_aggregates,
+)
+from .exports import iter_appointment_rows, stream_csv, stream_ndjson
+from .replicas import ReplicaReadMixin
+from .search import search_doctors
+from .tokens import (
+    FilteredRefreshToken,
+    FilteredTokenRefreshSerializer,
+    get_blacklist_stats,
+)
+
+
+def get_patient_id(user):
+    """
+    Return the user's patient profile id, from the token claim when
+    StatelessJWTAuthentication supplied one.
+    """
+    patient_id = getattr(user, "patient_id", None)
+    if patient_id is not None:
+        return patient_id
+    return PatientProfile.objects.values_list("id", flat=True).get(user_id=user.id)
+
+
+def get_doctor_id(user):
+    """
+    Return the user's doctor profile id, from the token claim when
+    StatelessJWTAuthentication supplied one.
+    """
+    doctor_id = getattr(user, "doctor_id", None)
+    if doctor_id is not None:
+        return doctor_id
+    return DoctorProfile.objects.values_list("id", flat=True).get(user_id=user.id)
+
+
+def get_owner_filter(user, role):
+    """
+    Filter kwargs selecting rows that belong to the user's ``role`` profile
+    ("patient" or "doctor"). Uses the profile id claim when present and
+    otherwise joins through the user, so neither path adds a query.
+    """
+    profile_id = getattr(user, f"{role}_id", None)
+    if profile_id is not None:
+        return {f"{role}_id": profile_id}
+    return {f"{role}__user_id": user.id}
+
+
+STATUS_SUMMARY = {
+    "pending": Count("id", filter=Q(status=1)),
+    "confirmed": Count("id", filter=Q(status=2)),
+    "cancelled": Count("id", filter=Q(status=3)),
+    "completed": Count("id", filter=Q(status=4)),
+}
+
+
+def get_status_summary(appointments, version=None):
+    """
+    Count appointments per status with a single conditional-aggregate query.
+    ``version`` aggregates (see appointment.conditional) are computed by the
+    same query and returned under "version".
+    """
+    summary = appointments.aggregate(**STATUS_SUMMARY, **(version or {}))
+    if version:
+        summary["version"] = {name: summary.pop(name) for name in version}
+    return summary
+
+
+def get_today_bounds():
+    today_start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    return today_start, today_start + timedelta(days=1)
+
+
+def get_doctor_dashboard_queryset(appointments, today_start, today_end):
+    """
+    Upcoming (confirmed) and today's (pending or confirmed) appointments in a
+    single query; get_doctor_dashboard_data splits them in memory.
+    """
+    is_today = Q(
+        appointment_date__gte=today_start,
+        appointment_date__lt=today_end,
+        status__in=[1, 2],
+    )
+    return appointments.filter(Q(status=2) | is_today).select_related("patient__user")
+
+
+def get_doctor_dashboard_data(dashboard_appointments, today_start, today_end):
+    upcoming_appointments = [
+        appointment
+        for appointment in dashboard_appointments
+        if appointment.status == 2
+    ]
+    todays_appointments = [
+        appointment
+        for appointment in dashboard_appointments
+        if today_start <= appointment.appointment_date < today_end
+    ]
+    return {
+        "upcoming_appointments": DoctorAppointmentsSerializer(
+            upcoming_appointments, many=True
+        ).data,
+        "todays_appointments": DoctorAppointmentsSerializer(
+            todays_appointments, many=True
+        ).data,
+    }
+
+
+def not_started_filter():
+    """
+    Q selecting the time slots that have not started yet.
+    """
+    now = timezone.localtime()
+    return Q(date__gt=now.date()) | Q(date=now.date(), start_time__gt=now.time())
+
+
+def free_time_slots(appointment_ids):
+    """
+    Make the time slots of the given (cancelled) appointments bookable again.
+    """
+    return TimeSlot.objects.filter(appointments__id__in=appointment_ids).update(
+        is_available=True, updated_at=timezone.now()
+    )
+
+
+def get_time_slot_queryset(query_params):
+    queryset = TimeSlot.objects.select_related("doctor__user")
+    doctor_id = query_params.get("doctor_id")
+    date = query_params.get("date")
+    if doctor_id:
+        queryset = queryset.filter(doctor_id=doctor_id)
+    if date:
+        queryset = queryset.filter(date=date)
+    return queryset
+
+
+class ValuesListMixin:
+    """
+    Build list responses from a ``.values()`` projection of the columns the
+    requested ``fields`` need, without instantiating models.
+    """
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_serializer()
+        rows = serializer.values_queryset(
+            self.filter_queryset(self.get_queryset()),
+            # Keyset cursors are built from the ordering columns.
+            extra=getattr(self.paginator, "ordering", ()),
+        )
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer.represent_values(page))
+        return Response(serializer.represent_values(rows))
 
 
 ################################ USER API VIEWS ################################
@@ -46,7 +208,7 @@ class UserLogout(APIView):
             refresh_token = request.COOKIES.get("refresh_token") or request.data.get(
                 "refresh_token"
             )
-            token = RefreshToken(refresh_token)
+            token = FilteredRefreshToken(refresh_token)
             token.blacklist()
 
             response = Response(
@@ -70,9 +232,21 @@ class TokenRefreshView(TokenRefreshView):
         JSON object containing a new access token.
     """
 
+    serializer_class = FilteredTokenRefreshSerializer
     permission_classes = [AllowAny]
 
 
+class TokenBlacklistStats(APIView):
+    """
+    Size of the token blacklist tables and latency of the blacklist check.
+    """
+
+    permission_classes = [IsSystemAdmin]
+
+    def get(self, request, *args, **kwargs):
+        return Response(get_blacklist_stats(), status=status.HTTP_200_OK)
+
+
 ################################# PROFILE API VIEWS #################################
 
 
@@ -191,12 +365,12 @@ class PatientRegister(BaseProfileRegister):
     profile_model = PatientProfile
 
 
-class PatientList(ListAPIView):
+class PatientList(ValuesListMixin, ListAPIView):
     """
     List all patient accounts.
     """
 
-    queryset = PatientProfile.objects.all()
+    queryset = PatientProfile.objects.select_related("user")
     serializer_class = PatientSerializer
     permission_classes = [IsSystemAdmin]
 
@@ -221,7 +395,7 @@ class PatientRestore(RestoreProfileView):
     profile_type = "Patient"
 
 
-class PatientAppointments(APIView):
+class PatientAppointments(ReplicaReadMixin, APIView):
     """
     API to get patient appointments summary and upcoming appointments.
     Admins can specify a patient_id as a query parameter.
@@ -251,23 +425,27 @@ class PatientAppointments(APIView):
 
         # If the user is a patient, fetch their own appointments
         elif user.is_patient:
-            appointments = Appointment.objects.filter(patient__user=user)
+            appointments = Appointment.objects.filter(
+                **get_owner_filter(user, "patient")
+            )
         else:
             return Response(
                 {"detail": "You do not have permission to access this endpoint."},
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        # Calculate summary
-        summary = {
-            "pending": appointments.filter(status=1).count(),
-            "confirmed": appointments.filter(status=2).count(),
-            "cancelled": appointments.filter(status=3).count(),
-            "completed": appointments.filter(status=4).count(),
-        }
+        # Calculate summary, with the version pollers revalidate against, so a
+        # 304 for a current If-None-Match costs this one query.
+        summary = get_status_summary(appointments, version_aggregates("doctor"))
+        etag = scope_etag(request, summary.pop("version"))
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
 
         # Get upcoming appointments (confirmed and not yet completed)
-        upcoming_appointments = appointments.filter(status=2)
+        upcoming_appointments = appointments.filter(status=2).select_related(
+            "doctor__user"
+        )
         upcoming_appointments_data = PatientAppointmentsSerializer(
             upcoming_appointments, many=True
         ).data
@@ -278,7 +456,7 @@ class PatientAppointments(APIView):
             "upcoming_appointments": upcoming_appointments_data,
         }
 
-        return Response(response_data, status=status.HTTP_200_OK)
+        return set_validator(Response(response_data, status=status.HTTP_200_OK), etag)
 
 
 #################################### DOCTOR API VIEWS ####################################
@@ -293,21 +471,47 @@ class DoctorRegister(BaseProfileRegister):
     profile_model = DoctorProfile
 
 
-class DoctorList(ListAPIView):
+class DoctorList(
+    ReplicaReadMixin, CachedResponseMixin, ValuesListMixin, ListAPIView
+):
     """
     List all doctor accounts.
     """
 
-    queryset = DoctorProfile.objects.all()
+    cache_namespace = cache.DOCTORS
+    queryset = DoctorProfile.objects.select_related("user")
     serializer_class = DoctorSerializer
     permission_classes = [IsAuthenticated]
+    # Shared with the async doctor_list, so the two are interchangeable.
+    pagination_class = KeysetPagination
+
+
+class DoctorSearch(ReplicaReadMixin, ListAPIView):
+    """
+    Search doctors by name, specialization and address, best matches first.
+    Matches word prefixes and tolerates small typos.
+    """
+
+    queryset = DoctorProfile.objects.select_related("user", "specialization")
+    serializer_class = DoctorSearchResultSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        params = DoctorSearchQuerySerializer(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        return search_doctors(
+            super().get_queryset(),
+            params.validated_data["q"],
+            connections[self.queryset.db],
+        )
 
 
-class DoctorDetail(BaseProfileDetail):
+class DoctorDetail(CachedResponseMixin, BaseProfileDetail):
     """
     Retrieve, update, or delete a doctor account.
     """
 
+    cache_namespace = cache.DOCTORS
     queryset = DoctorProfile.objects.all()
     serializer_class = DoctorSerializer
     profile_type = "Doctor"
@@ -323,7 +527,7 @@ class DoctorRestore(RestoreProfileView):
     profile_type = "Doctor"
 
 
-class DoctorAppointments(APIView):
+class DoctorAppointments(ReplicaReadMixin, APIView):
     """
     API to get doctor appointments summary and upcoming appointments.
     Admins can specify a doctor_id as a query parameter.
@@ -350,89 +554,98 @@ class DoctorAppointments(APIView):
                     )
         # If the user is a doctor, fetch their own appointments
         elif user.is_doctor:
-            appointments = Appointment.objects.filter(doctor__user=user)
+            appointments = Appointment.objects.filter(**get_owner_filter(user, "doctor"))
         else:
             return Response(
                 {"detail": "You do not have permission to access this endpoint."},
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        # Calculate summary
-        summary = {
-            "pending": appointments.filter(status=1).count(),
-            "confirmed": appointments.filter(status=2).count(),
-            "cancelled": appointments.filter(status=3).count(),
-            "completed": appointments.filter(status=4).count(),
-        }
-
-        # Get upcoming appointments (confirmed and not yet completed)
-        upcoming_appointments = appointments.filter(status=2)
-        upcoming_appointments_data = DoctorAppointmentsSerializer(
-            upcoming_appointments, many=True
-        ).data
+        # Calculate summary, with the version pollers revalidate against, so a
+        # 304 for a current If-None-Match costs this one query. Which
+        # appointments are today's also changes at midnight.
+        summary = get_status_summary(appointments, version_aggregates("patient"))
+        today_start, today_end = get_today_bounds()
+        etag = scope_etag(request, summary.pop("version"), today_start)
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
 
-        # Get today's appointments
-        today_start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        today_end = today_start + timedelta(days=1)
-        todays_appointments = appointments.filter(
-            appointment_date__gte=today_start,
-            appointment_date__lt=today_end,
-            status__in=[1,2], # only pending and confirmed appointments
+        # Load upcoming (confirmed) and today's (pending or confirmed) appointments
+        # in a single query and split them in memory.
+        dashboard_appointments = list(
+            get_doctor_dashboard_queryset(appointments, today_start, today_end)
         )
-        todays_appointments_data = DoctorAppointmentsSerializer(
-            todays_appointments, many=True
-        ).data
 
         # Construct the response
         response_data = {
             "summary": summary,
-            "upcoming_appointments": upcoming_appointments_data,
-            "todays_appointments": todays_appointments_data,
+            **get_doctor_dashboard_data(
+                dashboard_appointments, today_start, today_end
+            ),
         }
 
-        return Response(response_data, status=status.HTTP_200_OK)
+        return set_validator(Response(response_data, status=status.HTTP_200_OK), etag)
+
+
+class ReferenceCacheStats(APIView):
+    """
+    Hit and miss counters of the reference data cache, per namespace.
+    """
+
+    permission_classes = [IsSystemAdmin]
+
+    def get(self, request, *args, **kwargs):
+        return Response(cache.get_stats(), status=status.HTTP_200_OK)
 
 
 #################################### SPECIALIZATION API VIEWS ####################################
-class SpecializationListCreate(ListCreateAPIView):
+class SpecializationListCreate(
+    ReplicaReadMixin, CachedResponseMixin, ListCreateAPIView
+):
     """
     List all specializations or create a new specialization.
     """
 
+    cache_namespace = cache.SPECIALIZATIONS
     queryset = Specialization.objects.all()
     serializer_class = SpecializationSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if settings.CACHED_SPECIALIZATION_DOCTOR_COUNT:
+            # Serializer reads the counter column maintained by appointment.signals
+            return queryset
+        return queryset.annotate(
+            active_doctor_count=Count("doctors", filter=Q(doctors__is_deleted=False))
+        )
+
 
-class SpecializationDetail(RetrieveUpdateDestroyAPIView):
+class SpecializationDetail(CachedResponseMixin, RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update, or delete a specialization.
     """
 
+    cache_namespace = cache.SPECIALIZATIONS
     queryset = Specialization.objects.all()
     serializer_class = SpecializationSerializer
     permission_classes = [IsAuthenticated]
 
 
 #################################### TIME SLOT API VIEWS ####################################
-class TimeSlotListCreate(ListCreateAPIView):
+class TimeSlotListCreate(ConditionalListMixin, ValuesListMixin, ListCreateAPIView):
     """
     List all time slots or create a new time slot.
     """
 
-    queryset = TimeSlot.objects.all()
+    version_related = ("doctor",)
     serializer_class = TimeSlotSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = TimeSlotPagination
 
     def get_queryset(self):
-        queryset = super().get_queryset()
-        doctor_id = self.request.query_params.get("doctor_id")
-        date = self.request.query_params.get("date")
-        if doctor_id:
-            queryset = queryset.filter(doctor_id=doctor_id)
-        if date:
-            queryset = queryset.filter(date=date)
-        return queryset
+        return get_time_slot_queryset(self.request.query_params)
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -440,16 +653,54 @@ class TimeSlotListCreate(ListCreateAPIView):
         validated_data = serializer.validated_data
 
         user = request.user
-        print(user.email)
         if not user.is_doctor:
             raise PermissionDenied("Only doctors can create time slots.")
-        doctor = DoctorProfile.objects.get(user=user)
 
-        time_slot = TimeSlot.objects.create(doctor=doctor, **validated_data)
+        time_slot = TimeSlot.objects.create(
+            doctor_id=get_doctor_id(user), **validated_data
+        )
         response_serializer = self.get_serializer(time_slot)
         return Response(response_serializer.data, status=status.HTTP_201_CREATED)
 
 
+class NextAvailableTimeSlots(ListAPIView):
+    """
+    List the earliest available time slots across all doctors, optionally
+    limited to one specialization and a date range.
+    """
+
+    serializer_class = AvailableTimeSlotSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = None
+
+    def get_queryset(self):
+        params = NextAvailableTimeSlotsQuerySerializer(
+            data=self.request.query_params
+        )
+        params.is_valid(raise_exception=True)
+        filters = params.validated_data
+
+        # Walks timeslot_available_idx in (date, start_time) order and stops
+        # after `limit` matching rows. Slots earlier today that have started
+        # are skipped.
+        queryset = TimeSlot.objects.filter(
+            not_started_filter(),
+            is_available=True,
+            date__gte=filters["date_from"],
+            date__lte=filters["date_to"],
+            doctor__is_deleted=False,
+            doctor__availability=True,
+            doctor__user__is_active=True,
+        )
+        if "specialization" in filters:
+            queryset = queryset.filter(
+                doctor__specialization_id=filters["specialization"]
+            )
+        return queryset.select_related("doctor__user").order_by(
+            "date", "start_time", "id"
+        )[: filters["limit"]]
+
+
 class TimeSlotDetail(RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update, or delete a time slot.
@@ -464,8 +715,7 @@ class TimeSlotDetail(RetrieveUpdateDestroyAPIView):
         user = request.user
         if not user.is_doctor:
             raise PermissionDenied("Only doctors can update time slots.")
-        doctor = DoctorProfile.objects.get(user=user)
-        if instance.doctor != doctor:
+        if instance.doctor_id != get_doctor_id(user):
             raise PermissionDenied(
                 "You do not have permission to update this time slots."
             )
@@ -483,8 +733,7 @@ class TimeSlotDetail(RetrieveUpdateDestroyAPIView):
         user = self.request.user
         if not user.is_doctor:
             raise PermissionDenied("Only doctors can delete time slots.")
-        doctor = DoctorProfile.objects.get(user=user)
-        if instance.doctor != doctor:
+        if instance.doctor_id != get_doctor_id(user):
             raise PermissionDenied(
                 "You do not have permission to delete this time slots."
             )
@@ -496,17 +745,80 @@ class TimeSlotDetail(RetrieveUpdateDestroyAPIView):
         )
 
 
+#################################### SCHEDULE TEMPLATE API VIEWS ####################################
+class ScheduleTemplateListCreate(ListCreateAPIView):
+    """
+    List the doctor's schedule templates or create one and generate its time slots.
+    """
+
+    serializer_class = ScheduleTemplateSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.is_staff:
+            return ScheduleTemplate.objects.all()
+        return ScheduleTemplate.objects.filter(**get_owner_filter(user, "doctor"))
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        user = request.user
+        if not user.is_doctor:
+            raise PermissionDenied("Only doctors can create schedule templates.")
+
+        with transaction.atomic():
+            template = serializer.save(doctor_id=get_doctor_id(user))
+            created, skipped = template.generate_time_slots()
+
+        response_data = self.get_serializer(template).data
+        response_data["created_slots"] = created
+        response_data["skipped_slots"] = skipped
+        return Response(response_data, status=status.HTTP_201_CREATED)
+
+
+class ScheduleTemplateGenerate(GenericAPIView):
+    """
+    Re-run a schedule template. Slots that already exist or overlap existing
+    slots are skipped, so repeated calls are safe.
+    """
+
+    queryset = ScheduleTemplate.objects.all()
+    serializer_class = ScheduleTemplateSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        template = self.get_object()
+        user = request.user
+        if not user.is_doctor:
+            raise PermissionDenied("Only doctors can generate time slots.")
+        if template.doctor_id != get_doctor_id(user):
+            raise PermissionDenied(
+                "You do not have permission to use this schedule template."
+            )
+
+        with transaction.atomic():
+            created, skipped = template.generate_time_slots()
+
+        return Response(
+            {"created_slots": created, "skipped_slots": skipped},
+            status=status.HTTP_200_OK,
+        )
+
+
 #################################### APPOINTMENT API VIEWS ####################################
 
 
-class AppointmentListCreate(ListCreateAPIView):
+class AppointmentListCreate(ValuesListMixin, ListCreateAPIView):
     """
     List all appointments or create a new appointment.
     """
 
-    queryset = Appointment.objects.all()
+    queryset = Appointment.objects.select_related("doctor__user", "patient__user")
     serializer_class = AppointmentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = AppointmentPagination
 
     def get_queryset(self):
         user = self.request.user
@@ -514,9 +826,9 @@ class AppointmentListCreate(ListCreateAPIView):
         if user.is_staff:
             return super().get_queryset()
         elif user.is_patient:
-            return super().get_queryset().filter(patient__user=user)
+            return super().get_queryset().filter(**get_owner_filter(user, "patient"))
         elif user.is_doctor:
-            return super().get_queryset().filter(doctor__user=user)
+            return super().get_queryset().filter(**get_owner_filter(user, "doctor"))
         else:
             return super().get_queryset().none()
 
@@ -529,9 +841,7 @@ class AppointmentListCreate(ListCreateAPIView):
                 "You do not have permission to create an appointment."
             )
 
-        # Get patient instance
-        patient = PatientProfile.objects.get(user=user)
-        data["patient"] = patient.id
+        data["patient"] = get_patient_id(user)
 
         serializer = self.get_serializer(data=data)
         serializer.is_valid(raise_exception=True)
@@ -544,12 +854,203 @@ class AppointmentListCreate(ListCreateAPIView):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+class AppointmentBook(CreateAPIView):
+    """
+    Book an appointment by claiming a free time slot.
+
+    The slot is claimed with a conditional UPDATE in the same transaction that
+    creates the appointment, so when two patients race for a slot exactly one
+    wins and the other gets 409 Conflict. Slots that have started can no
+    longer be claimed; a slot that does not exist is 404 Not Found.
+    """
+
+    serializer_class = AppointmentBookingSerializer
+    permission_classes = [IsPatient]
+    conflict_message = "This time slot is no longer available."
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        slot_id = serializer.validated_data["time_slot"]
+
+        patient = PatientProfile.objects.select_related("user").get(
+            pk=get_patient_id(request.user)
+        )
+
+        try:
+            with transaction.atomic():
+                claimed = TimeSlot.objects.filter(
+                    not_started_filter(),
+                    pk=slot_id,
+                    is_available=True,
+                    doctor__is_deleted=False,
+                ).update(is_available=False, updated_at=timezone.now())
+                if not claimed:
+                    # Only slots that exist count as contention.
+                    if not TimeSlot.objects.filter(pk=slot_id).exists():
+                        raise NotFound("Time slot not found.")
+                    BOOKING_CONFLICTS.inc()
+                    return Response(
+                        {"detail": self.conflict_message},
+                        status=status.HTTP_409_CONFLICT,
+                    )
+
+                slot = TimeSlot.objects.select_related("doctor__user").get(pk=slot_id)
+                appointment = Appointment.objects.create(
+                    patient=patient,
+                    doctor=slot.doctor,
+                    time_slot=slot,
+                    appointment_date=timezone.make_aware(
+                        datetime.combine(slot.date, slot.start_time)
+                    ),
+                    reason=serializer.validated_data.get("reason"),
+                )
+        except IntegrityError:
+            # appt_active_time_slot_uniq caught a slot that was reopened by hand.
+            BOOKING_CONFLICTS.inc()
+            return Response(
+                {"detail": self.conflict_message}, status=status.HTTP_409_CONFLICT
+            )
+
+        return Response(
+            AppointmentSerializer(appointment).data, status=status.HTTP_201_CREATED
+        )
+
+
+class AppointmentStatusTransition(GenericAPIView):
+    """
+    Move many appointments to one status in a single call.
+
+    Ownership and the allowed transition are checked by one SELECT and the
+    change is applied with one UPDATE. Ids that are not the doctor's, do not
+    exist or cannot move to the target status are returned as failed.
+    Cancelling frees the appointments' time slots.
+    """
+
+    serializer_class = AppointmentStatusTransitionSerializer
+    permission_classes = [IsDoctor | IsSystemAdmin]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = set(serializer.validated_data["ids"])
+        target = serializer.validated_data["status"]
+
+        appointments = Appointment.objects.filter(
+            id__in=ids, status__in=Appointment.ALLOWED_TRANSITIONS[target]
+        )
+        if not request.user.is_staff:
+            appointments = appointments.filter(
+                **get_owner_filter(request.user, "doctor")
+            )
+
+        with transaction.atomic():
+            succeeded = set(
+                appointments.select_for_update().values_list("id", flat=True)
+            )
+            if succeeded:
+                Appointment.objects.filter(id__in=succeeded).update(
+                    status=target, updated_at=timezone.now()
+                )
+                if target == 3:
+                    free_time_slots(succeeded)
+
+        return Response(
+            {"succeeded": sorted(succeeded), "failed": sorted(ids - succeeded)},
+            status=status.HTTP_200_OK,
+        )
+
+
+class AppointmentExport(APIView):
+    """
+    Stream appointment history as CSV or NDJSON, without pagination or COUNT.
+
+    Query parameters: output (csv or ndjson), date_from, date_to, doctor,
+    patient and status.
+    """
+
+    permission_classes = [IsSystemAdmin]
+    content_types = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+    def get(self, request, *args, **kwargs):
+        params = AppointmentExportQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        filters = params.validated_data
+
+        appointments = Appointment.objects.all()
+        if "date_from" in filters:
+            appointments = appointments.filter(
+                appointment_date__gte=timezone.make_aware(
+                    datetime.combine(filters["date_from"], datetime.min.time())
+                )
+            )
+        if "date_to" in filters:
+            appointments = appointments.filter(
+                appointment_date__lt=timezone.make_aware(
+                    datetime.combine(
+                        filters["date_to"] + timedelta(days=1), datetime.min.time()
+                    )
+                )
+            )
+        if "doctor" in filters:
+            appointments = appointments.filter(doctor_id=filters["doctor"])
+        if "patient" in filters:
+            appointments = appointments.filter(patient_id=filters["patient"])
+        if "status" in filters:
+            appointments = appointments.filter(status=filters["status"])
+
+        output = filters["output"]
+        stream = stream_csv if output == "csv" else stream_ndjson
+        response = StreamingHttpResponse(
+            stream(iter_appointment_rows(appointments)),
+            content_type=self.content_types[output],
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="appointments.{output}"'
+        )
+        return response
+
+
+class ArchivedAppointmentList(ListAPIView):
+    """
+    List archived appointments, optionally filtered by doctor or patient.
+    """
+
+    serializer_class = ArchivedAppointmentSerializer
+    permission_classes = [IsSystemAdmin]
+    pagination_class = AppointmentPagination
+
+    def get_queryset(self):
+        queryset = ArchivedAppointment.objects.select_related(
+            "doctor__user", "patient__user"
+        )
+        for field in ("doctor", "patient"):
+            value = self.request.query_params.get(field)
+            if value is not None:
+                if not value.isdigit():
+                    raise ValidationError({field: "A valid integer is required."})
+                queryset = queryset.filter(**{f"{field}_id": value})
+        return queryset
+
+
+class ArchivedAppointmentDetail(RetrieveAPIView):
+    """
+    Retrieve one archived appointment by its original id.
+    """
+
+    queryset = ArchivedAppointment.objects.select_related(
+        "doctor__user", "patient__user"
+    )
+    serializer_class = ArchivedAppointmentSerializer
+    permission_classes = [IsSystemAdmin]
+
+
 class AppointmentDetail(RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update, or delete an appointment.
     """
 
-    queryset = Appointment.objects.all()
+    queryset = Appointment.objects.select_related("doctor__user", "patient__user")
     serializer_class = AppointmentSerializer
     permission_classes = [IsAuthenticated]
 
@@ -561,17 +1062,15 @@ class AppointmentDetail(RetrieveUpdateDestroyAPIView):
             # Admin can access any appointment
             return appointment
         elif user.is_patient:
-            patient = PatientProfile.objects.get(user=user)
             # Patients can access their own appointments
-            if appointment.patient != patient:
+            if appointment.patient_id != get_patient_id(user):
                 raise PermissionDenied(
                     "You do not have permission to access this appointment."
                 )
             return appointment
         elif user.is_doctor:
-            doctor = DoctorProfile.objects.get(user=user)
             # Doctors can access their own appointments
-            if appointment.doctor != doctor:
+            if appointment.doctor_id != get_doctor_id(user):
                 raise PermissionDenied(
                     "You do not have permission to access this appointment."
                 )
@@ -583,12 +1082,28 @@ class AppointmentDetail(RetrieveUpdateDestroyAPIView):
 
     def update(self, request, *args, **kwargs):
         user = request.user
-        appointment = self.get_object()
+        # get_object has already checked that the appointment is the user's.
+        self.get_object()
 
-        patient = PatientProfile.objects.get(user=user)
-        if not user.is_patient or appointment.patient != patient:
+        if user.is_doctor:
+            if set(request.data) - {"status"}:
+                raise PermissionDenied(
+                    "Doctors can only change the status of an appointment."
+                )
+        elif not user.is_patient:
             raise PermissionDenied(
                 "You don't have permission to update this appointment."
             )
 
         return super().update(request, *args, **kwargs)
+
+    def perform_update(self, serializer):
+        # validate_status has checked the move against ALLOWED_TRANSITIONS.
+        cancelled = (
+            serializer.validated_data.get("status") == 3
+            and serializer.instance.status != 3
+        )
+        with transaction.atomic():
+            appointment = serializer.save()
+            if cancelled:
+                free_time_slots([appointment.id])